@@ -0,0 +1,40 @@
+"""
+Сравнение последовательной проверки выражений столбцов и скомпилированного
+классификатора заголовков на заголовке erot из tests/test_scheme.py
+
+    SCHEMES_PATH=./data python -m benchmarks.bench_matcher
+"""
+import re
+
+import timeit
+
+from src.api.scheme.workbook import WorkbookSchemes
+from src.api.scheme.matcher import HeaderMatcher
+from tests.test_scheme import EROT_HEADERS
+
+
+def legacy_classify(columns, source):
+    return [
+        next((pos for pos, c in enumerate(columns)
+              if re.match(c.document.regex, value)), -1)
+        for value in source
+    ]
+
+
+def main(number: int = 200):
+    scheme = WorkbookSchemes.get('erot')
+    regexes = [c.document.regex for c in scheme.columns]
+    matcher = HeaderMatcher(regexes)
+    assert matcher.classify(EROT_HEADERS) == legacy_classify(scheme.columns, EROT_HEADERS)
+    legacy = timeit.timeit(lambda: legacy_classify(scheme.columns, EROT_HEADERS), number=number)
+    compiled = timeit.timeit(lambda: matcher.classify(EROT_HEADERS), number=number)
+    build = timeit.timeit(lambda: HeaderMatcher(regexes), number=10) / 10
+    print(f'headers: {len(EROT_HEADERS)}, columns: {len(regexes)}')
+    print(f'legacy re.match loop: {legacy / number * 1e3:.3f} ms/call')
+    print(f'compiled matcher:     {compiled / number * 1e3:.3f} ms/call')
+    print(f'matcher build:        {build * 1e3:.3f} ms')
+    print(f'speedup:              {legacy / compiled:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
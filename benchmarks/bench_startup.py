@@ -0,0 +1,52 @@
+"""
+Время подготовки реестра схем при запуске процесса без снимка и со снимком:
+импорт, загрузка схем, компиляция планов и классификатора, первая классификация
+
+    SCHEMES_PATH=./data python -m benchmarks.bench_startup
+"""
+import os
+
+import sys
+
+import json
+
+import subprocess
+
+CHILD = '''
+import time, json
+started = time.perf_counter()
+from src.api.scheme.workbook import WorkbookSchemes
+from tests.test_scheme import EROT_HEADERS
+imported = time.perf_counter()
+WorkbookSchemes.SNAPSHOT_KEY = b'benchmark'
+warm = WorkbookSchemes.warm()
+WorkbookSchemes.classify(EROT_HEADERS)
+warm.update(imported=imported - started, ready=time.perf_counter() - started)
+print(json.dumps(warm))
+'''
+
+
+def run() -> dict:
+    output = subprocess.run([sys.executable, '-c', CHILD], check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main(number: int = 5):
+    from src.api.scheme.workbook import WorkbookSchemes
+
+    filename = WorkbookSchemes.snapshot_filename()
+    for label, cold in (('without snapshot', True), ('with snapshot', False)):
+        results = []
+        for _ in range(number):
+            if cold and os.path.exists(filename):
+                os.remove(filename)
+            results.append(run())
+        best = min(results, key=lambda r: r['ready'])
+        print(f'{label:17} import {best["imported"] * 1e3:7.1f} ms, '
+              f'registry {best["seconds"] * 1e3:7.1f} ms, ready {best["ready"] * 1e3:7.1f} ms '
+              f'(restored {best["restored"]}, parsed {best["parsed"]})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+Генераторы синтетических схем, наборов заголовков и значений ячеек
+
+Схемы повторяют устройство erot.json: выражения столбцов строятся из основ
+русских слов с окончаниями [а-я]* и разделителями \\s*, столбцы содержат
+цепочки TextClear/TextTrim, даты - DateInput, перечни - TextSplit.
+Генерация детерминирована для одинакового seed.
+"""
+from typing import Any, Dict, List, Sequence
+
+import re
+
+import random
+
+WORDS = (
+    'требование', 'обязательное', 'содержание', 'публикация', 'статус', 'уровень',
+    'регулирование', 'реквизиты', 'структурной', 'единицы', 'акта', 'текст', 'срок',
+    'действия', 'объект', 'категории', 'лиц', 'форма', 'оценки', 'соблюдения', 'вид',
+    'государственного', 'контроля', 'надзора', 'орган', 'ответственный', 'внесение',
+    'сведений', 'проверочный', 'вопрос', 'название', 'утвердивший', 'номер', 'гиперссылка',
+    'наименование', 'статья', 'часть', 'субъект', 'ответственности', 'физического',
+    'юридического', 'индивидуального', 'предпринимателя', 'должностного', 'размер',
+    'санкции', 'комментарии', 'сферы', 'общественных', 'отношений', 'перечень', 'документов',
+    'подтверждающих', 'соответствие', 'экономической', 'деятельности', 'затрат', 'руководства',
+    'доклады', 'листы', 'выдачу', 'предоставление', 'власти', 'привлекающие', 'основание',
+    'решения', 'адрес', 'место', 'нахождения', 'телефон', 'почты', 'заявителя', 'количество',
+)
+# слова, отсутствующие в выражениях схем, для несовпадающих заголовков
+NOISE = (
+    'примечание', 'резерв', 'колонка', 'служебная', 'отметка', 'итого', 'сумма', 'показатель',
+    'значение', 'период', 'квартал', 'исполнитель', 'подпись', 'печать',
+)
+SEPARATORS = ['\\s*;\\s*|\\s*,\\s*|\\s*/.s*|\\n']
+CLEAR = ['[\\[\\]"\\\'\\^\\*\\$#/@<>{}`+=~|!?]', ' ']
+TRIM = ['\\s{2,}', ' ']
+DATE = ['(?P<date_fmt>\\d{2,4}.\\d{2,4}.\\d{2,4})|(?P<str_fmt>[А-я]+...+)']
+
+
+def stem(word: str) -> str:
+    return word[:max(3, len(word) - 3)]
+
+
+def column_regex(words: Sequence[str]) -> str:
+    return '(?i)^' + '\\s*'.join(f'{stem(w)}[а-я]*' for w in words) + '$'
+
+
+def make_column(words: Sequence[str], rnd: random.Random, position: int) -> Dict[str, Any]:
+    name = ' '.join(words).capitalize()
+    formats: List[Dict[str, Any]] = [
+        {'formatter': 'TextClear', 'options': CLEAR},
+        {'formatter': 'TextTrim', 'options': TRIM},
+    ]
+    kind = rnd.random()
+    if kind < 0.15:
+        formats.append({'formatter': 'DateInput', 'options': DATE})
+    elif kind < 0.3:
+        formats.append({'formatter': 'TextSplit', 'options': SEPARATORS})
+    return {
+        'name': name,
+        'document': {
+            'regex': column_regex(words),
+            'optional': rnd.random() < 0.3,
+            'format': formats if rnd.random() < 0.9 else None,
+        },
+        'database': {'orm': 'Base', 'params': {f'field_{position}': 'value'}},
+    }
+
+
+def make_scheme(index: int, columns: int, seed: int = 0) -> Dict[str, Any]:
+    """make_scheme
+
+    Схема с columns столбцами, наименования столбцов различны
+    и не совпадают с выражениями предыдущих столбцов
+
+    Args:
+        index (int): номер схемы, входит в наименование
+        columns (int): количество столбцов
+        seed (int, optional): начальное значение генератора. Defaults to 0.
+    """
+    rnd = random.Random(f'{seed}:{index}')
+    result: List[Dict[str, Any]] = []
+    patterns: List[re.Pattern] = []
+    while len(result) < columns:
+        words = rnd.sample(WORDS, rnd.randint(2, 4))
+        column = make_column(words, rnd, len(result))
+        if any(p.match(column['name']) for p in patterns):
+            continue
+        patterns.append(re.compile(column['document']['regex']))
+        result.append(column)
+    return {
+        'title': f'Синтетическая схема {index}',
+        'name': f'synthetic_{index}',
+        'sheet': f'Лист {index}',
+        'header': [{'name': 'Дата и время формирования отчета', 'optional': True}],
+        'columns': result,
+    }
+
+
+def make_headers(scheme: Dict[str, Any], kind: str, seed: int = 0) -> List[str]:
+    """make_headers
+
+    Набор заголовков для схемы: hit - все столбцы схемы, partial - половина
+    столбцов и посторонние заголовки, miss - только посторонние заголовки
+    """
+    rnd = random.Random(f'{seed}:{scheme["name"]}:{kind}')
+    names = [c['name'] for c in scheme['columns']]
+    noise = [' '.join(rnd.sample(NOISE, 2)).capitalize() for _ in range(len(names) // 2 or 1)]
+    if kind == 'hit':
+        return names
+    if kind == 'partial':
+        return names[:len(names) // 2] + noise
+    if kind == 'miss':
+        return noise + [' '.join(rnd.sample(NOISE, 3)) for _ in range(len(names) - len(noise))]
+    raise ValueError(kind)
+
+
+def make_values(rows: int, seed: int = 0) -> List[str]:
+    """make_values
+
+    Значения ячеек: текст с лишними пробелами и служебными символами, даты, перечни
+    """
+    rnd = random.Random(seed)
+    values = []
+    for _ in range(rows):
+        kind = rnd.random()
+        if kind < 0.2:
+            values.append(f' {rnd.randint(1, 28):02d}.{rnd.randint(1, 12):02d}.'
+                          f'{rnd.randint(2000, 2030)} ')
+        elif kind < 0.4:
+            values.append('; '.join(' '.join(rnd.sample(WORDS, 3)) for _ in range(3)))
+        else:
+            words = rnd.sample(WORDS, rnd.randint(4, 12))
+            values.append('  '.join(words) + rnd.choice(['', ' *', ' [1]', '"', ' ?']))
+    return values
@@ -0,0 +1,231 @@
+"""
+Набор измерений загрузки схем, проверки заголовков и форматирования
+на синтетических схемах (benchmarks/generators.py)
+
+Результаты сохраняются в JSON и сравниваются с базовым файлом: измерение,
+превышающее базовое значение более чем на threshold, считается регрессией,
+и процесс завершается с кодом 1. Время приводится к калибровочной нагрузке
+интерпретатора, но разброс между запусками на общих машинах остается заметным,
+поэтому порог по умолчанию - 50%. Базовые значения зависят от машины,
+при смене окружения базовый файл пересоздается с --save.
+
+    python -m benchmarks.suite
+    python -m benchmarks.suite --schemes 20 --columns 60 --threshold 0.3 --repeat 15
+    python -m benchmarks.suite --save
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import os
+
+import re
+
+import sys
+
+import json
+
+import shutil
+
+import argparse
+
+import platform
+
+import tempfile
+
+import timeit
+
+from benchmarks.generators import make_headers, make_scheme, make_values
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+# продолжительность одной серии измерения, сек.
+SERIES_SECONDS = 0.05
+
+
+def measure(function: Callable[[], Any], repeat: int = 9) -> Dict[str, float]:
+    """measure
+
+    Время одного вызова: количество вызовов в серии подбирается по SERIES_SECONDS,
+    результат - наименьшее и медианное время по сериям
+    """
+    timer = timeit.Timer(function)
+    number = 1
+    while timer.timeit(number) < SERIES_SECONDS and number < 1 << 20:
+        number *= 2
+    series = sorted(t / number for t in timer.repeat(repeat, number))
+    return {'seconds': series[0], 'median': series[len(series) // 2], 'number': number}
+
+
+def calibration() -> Any:
+    """calibration
+
+    Постоянная нагрузка интерпретатора: время измерений сравнивается
+    в отношении к ней, что исключает изменение частоты процессора между запусками
+    """
+    data = json.dumps([{'name': f'столбец {i}', 'values': list(range(20))} for i in range(50)],
+                      ensure_ascii=False)
+    return sum(len(item['name']) for item in json.loads(data)) + sum(
+        len(word) for word in re.findall(r'\w+', data))
+
+
+def prepare(path: str, schemes: int, columns: int, seed: int) -> List[Dict[str, Any]]:
+    documents = os.path.join(path, 'documents')
+    os.makedirs(documents, exist_ok=True)
+    generated = [make_scheme(i, columns, seed) for i in range(schemes)]
+    for scheme in generated:
+        with open(os.path.join(documents, f'{scheme["name"]}.json'), 'w', encoding='utf8') as f:
+            json.dump(scheme, f, ensure_ascii=False)
+    return generated
+
+
+def cases(path: str, generated: List[Dict[str, Any]], rows: int,
+          seed: int) -> List[Tuple[str, Callable[[], Any]]]:
+    """cases
+
+    Измерения: наименование и функция без аргументов
+    """
+    # модули схем читают SCHEMES_PATH при импорте
+    os.environ['SCHEMES_PATH'] = path
+    from src.api.registry import SchemeRegistry
+    from src.api.scheme.plan import SchemePlan
+    from src.api.scheme.workbook import WorkbookSchemes
+
+    class SyntheticSchemes(WorkbookSchemes):
+        pass
+
+    def read_cold():
+        SyntheticSchemes.REGISTRY = SchemeRegistry(
+            f'{path}/documents', SyntheticSchemes.MODEL, SyntheticSchemes.GENERATION)
+        SyntheticSchemes.CLASSIFIER = None
+        return SyntheticSchemes.read()
+
+    read_cold()
+    scheme = SyntheticSchemes.get(generated[0]['name'])
+    headers = {kind: make_headers(generated[0], kind, seed) for kind in ('hit', 'partial', 'miss')}
+    verified = scheme.verify_columns(headers['hit'])
+    values = make_values(rows, seed)
+    columns = {c.name: values for c in scheme.columns}
+    SyntheticSchemes.classify(headers['hit'])
+    return [
+        ('handler_load', SyntheticSchemes.load),
+        ('schemes_read_cold', read_cold),
+        ('schemes_read_warm', SyntheticSchemes.read),
+        ('plan_compile', lambda: SchemePlan(scheme)),
+        ('verify_columns_hit', lambda: scheme.verify_columns(headers['hit'])),
+        ('verify_columns_partial', lambda: scheme.verify_columns(headers['partial'])),
+        ('verify_columns_miss', lambda: scheme.verify_columns(headers['miss'])),
+        ('validate_columns', lambda: scheme.validate_columns(*verified)),
+        ('classify_hit', lambda: SyntheticSchemes.classify(headers['hit'])),
+        ('classify_miss', lambda: SyntheticSchemes.classify(headers['miss'])),
+        ('format_chains', lambda: scheme.format_columns(columns, database=True)),
+    ]
+
+
+def run(schemes: int = 10, columns: int = 40, rows: int = 200, seed: int = 0,
+        only: Optional[List[str]] = None, repeat: int = 9) -> Dict[str, Any]:
+    """run
+
+    Выполнение измерений во временной директории схем
+
+    Returns:
+        Dict[str, Any]: параметры запуска и результаты по наименованиям измерений
+    """
+    path = tempfile.mkdtemp(prefix='schemes-bench-')
+    try:
+        generated = prepare(path, schemes, columns, seed)
+        results = {'calibration': measure(calibration, repeat)}
+        for name, function in cases(path, generated, rows, seed):
+            if only and not any(o in name for o in only):
+                continue
+            results[name] = measure(function, repeat)
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'schemes': schemes,
+            'columns': columns,
+            'rows': rows,
+            'seed': seed,
+        },
+        'results': results,
+    }
+
+
+def change_of(current: Dict[str, Any], baseline: Dict[str, Any], name: str) -> float:
+    """change_of
+
+    Относительное изменение времени измерения с поправкой на калибровочную нагрузку
+    """
+    scale = 1.0
+    if 'calibration' in current['results'] and 'calibration' in baseline['results']:
+        scale = (baseline['results']['calibration']['seconds']
+                 / current['results']['calibration']['seconds'])
+    return current['results'][name]['seconds'] * scale / baseline['results'][name]['seconds'] - 1
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any],
+            threshold: float) -> List[Tuple[str, float, float, float]]:
+    """compare
+
+    Сравнение с базовыми значениями в отношении ко времени калибровочной нагрузки.
+    Измерения с другими параметрами запуска не сравниваются.
+
+    Returns:
+        List[Tuple[str, float, float, float]]: регрессии - наименование,
+            базовое и текущее время, относительное изменение
+    """
+    keys = ('schemes', 'columns', 'rows', 'seed')
+    if any(current['meta'].get(k) != baseline['meta'].get(k) for k in keys):
+        return []
+    regressions = []
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if not base or name == 'calibration':
+            continue
+        change = change_of(current, baseline, name)
+        if change > threshold:
+            regressions.append((name, base['seconds'], result['seconds'], change))
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--schemes', type=int, default=10)
+    parser.add_argument('--columns', type=int, default=40)
+    parser.add_argument('--rows', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=9)
+    parser.add_argument('--only', nargs='*', help='измерения, содержащие указанные строки')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--threshold', type=float, default=0.5,
+                        help='допустимое замедление относительно базового значения')
+    parser.add_argument('--output', help='файл для сохранения результатов')
+    parser.add_argument('--save', action='store_true', help='сохранить результаты как базовые')
+    args = parser.parse_args(argv)
+
+    current = run(args.schemes, args.columns, args.rows, args.seed, args.only, args.repeat)
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf8') as f:
+            baseline = json.load(f)
+    for name, result in current['results'].items():
+        base = (baseline or {}).get('results', {}).get(name)
+        change = f'{change_of(current, baseline, name):+7.1%}' if base else ''
+        print(f'{name:24} {result["seconds"] * 1e3:10.3f} ms  '
+              f'(median {result["median"] * 1e3:.3f} ms) {change}')
+    output = args.baseline if args.save else args.output
+    if output:
+        with open(output, 'w', encoding='utf8') as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+    if baseline is None or args.save:
+        return 0
+    regressions = compare(current, baseline, args.threshold)
+    for name, base, result, change in regressions:
+        print(f'regression: {name} {base * 1e3:.3f} ms -> {result * 1e3:.3f} ms ({change:+.1%})',
+              file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,91 @@
+from typing import Any, Dict, Hashable, Optional, Sequence
+
+import re
+
+import hashlib
+
+import threading
+
+from cachetools import LRUCache
+
+SPACES = re.compile(r'\s+')
+
+
+def normalize_headers(headers: Sequence[Any]) -> tuple:
+    """normalize_headers
+
+    Приведение заголовков к виду, в котором они проверяются по схемам:
+    единичные пробелы, без пробелов по краям
+    """
+    return tuple(SPACES.sub(' ', str(h)).strip() for h in headers)
+
+
+def fingerprint(headers: Sequence[str]) -> bytes:
+    """fingerprint
+
+    Отпечаток набора заголовков фиксированного размера, используется как ключ кэша
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for header in headers:
+        digest.update(header.encode('utf8'))
+        digest.update(b'\x1f')
+    return digest.digest()
+
+
+class ResultCache:
+    """
+    Ограниченный LRU кэш результатов, привязанный к версии реестра схем
+
+    При изменении версии (сохранение или изменение схемы) кэш очищается,
+    так как изменение любой схемы может изменить результат для любого набора заголовков.
+    Счетчики попаданий и промахов используются для подбора размера.
+
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self.cache: LRUCache = LRUCache(maxsize=maxsize)
+        self.version: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, version: int) -> Any:
+        """get
+
+        Получение результата для текущей версии реестра
+
+        Returns:
+            Any: сохраненный результат или None
+        """
+        with self._lock:
+            if version != self.version:
+                self.cache.clear()
+                self.version = version
+            value = self.cache.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def put(self, key: Hashable, version: int, value: Any) -> None:
+        with self._lock:
+            if version == self.version:
+                self.cache[key] = value
+
+    def clear(self) -> None:
+        with self._lock:
+            self.cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            'size': len(self.cache),
+            'maxsize': self.cache.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'ratio': self.hits / total if total else 0.0,
+        }
+
+
+__all__ = ['ResultCache', 'normalize_headers', 'fingerprint']
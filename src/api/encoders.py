@@ -0,0 +1,210 @@
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import json
+
+from functools import partial
+
+from src.api.scheme.formatters import FormatPipeline, TextParse, TextSplit
+from src.api.transform import TransformPlan, ndjson_block
+
+# форматы с необязательными зависимостями доступны при установленных пакетах
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+NDJSON = 'application/x-ndjson'
+MSGPACK = 'application/x-msgpack'
+ARROW = 'application/vnd.apache.arrow.stream'
+# варианты типов в заголовке Accept
+MEDIA_TYPES = {
+    NDJSON: NDJSON,
+    'application/ndjson': NDJSON,
+    'application/jsonlines': NDJSON,
+    MSGPACK: MSGPACK,
+    'application/msgpack': MSGPACK,
+    'application/vnd.msgpack': MSGPACK,
+    ARROW: ARROW,
+}
+# признак окончания потока Arrow IPC
+ARROW_EOS = b'\xff\xff\xff\xff\x00\x00\x00\x00'
+
+
+class StreamEncoder(NamedTuple):
+    """
+    Кодирование результата преобразования документа: начало потока,
+    функция кодирования блока строк (передается в пул процессов) и окончание потока
+    """
+    media_type: str
+    header: bytes
+    block: Callable[[TransformPlan, List[int], List[Sequence[Any]]], bytes]
+    footer: bytes
+
+
+def available(media_type: str) -> bool:
+    if media_type == MSGPACK:
+        return msgpack is not None
+    if media_type == ARROW:
+        return pyarrow is not None
+    return media_type == NDJSON
+
+
+def negotiate(accept: Optional[str]) -> Optional[str]:
+    """negotiate
+
+    Выбор формата результата по заголовку Accept с учетом весов q
+    и установленных пакетов. Без заголовка и для */* - NDJSON.
+
+    Args:
+        accept (Optional[str]): значение заголовка Accept
+
+    Returns:
+        Optional[str]: тип содержимого или None, если ни один тип не поддерживается
+    """
+    if not accept:
+        return NDJSON
+    ranked: List[Tuple[float, int, str]] = []
+    for position, item in enumerate(accept.split(',')):
+        media_type, *params = [p.strip() for p in item.split(';')]
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality <= 0:
+            continue
+        media_type = media_type.lower()
+        if media_type in ('*/*', 'application/*'):
+            media_type = NDJSON
+        media_type = MEDIA_TYPES.get(media_type, '')
+        if media_type and available(media_type):
+            ranked.append((-quality, position, media_type))
+    return min(ranked)[2] if ranked else None
+
+
+def msgpack_block(plan: TransformPlan, numbers: List[int],
+                  block: List[Sequence[Any]]) -> bytes:
+    """msgpack_block
+
+    Преобразование блока строк с кодированием в MessagePack
+
+    Returns:
+        bytes: массивы [номер строки, [значения в порядке столбцов схемы]]
+    """
+    pack = msgpack.Packer(use_bin_type=True).pack
+    return b''.join(pack([number, list(values)])
+                    for number, values in zip(numbers, zip(*plan.columns(block))))
+
+
+def msgpack_header(workbook: Any, plan: TransformPlan) -> bytes:
+    return msgpack.packb({'scheme': workbook.name, 'columns': list(plan.names)},
+                         use_bin_type=True)
+
+
+def arrow_type(pipeline: FormatPipeline) -> Any:
+    """arrow_type
+
+    Тип столбца Arrow по цепочке форматирования: TextSplit дает список,
+    TextParse - структуру из атрибутов output, прочие значения - строки
+    """
+    result = pyarrow.string()
+    nested = False
+    for stage in pipeline.stages:
+        if isinstance(stage, TextParse):
+            result = pyarrow.struct([(attr, pyarrow.string()) for attr in stage.output])
+        elif isinstance(stage, TextSplit):
+            nested = True
+    return pyarrow.list_(result) if nested else result
+
+
+def arrow_schema(workbook: Any, plan: TransformPlan) -> Any:
+    """arrow_schema
+
+    Схема Arrow: номер строки и столбцы схемы, сгруппированные по Database.orm
+    в порядке первого упоминания модели, внутри группы - в порядке столбцов схемы.
+    Модель и параметры столбца передаются в метаданных поля, состав групп -
+    в метаданных схемы.
+    """
+    groups: Dict[str, List[int]] = {}
+    for position, column in enumerate(workbook.columns):
+        orm = column.database.orm if column.database else ''
+        groups.setdefault(orm, []).append(position)
+    fields = [pyarrow.field('row', pyarrow.int64(), nullable=False)]
+    for orm, positions in groups.items():
+        for position in positions:
+            column = workbook.columns[position]
+            metadata = {'orm': orm}
+            if column.database and column.database.params:
+                metadata['params'] = json.dumps(column.database.params, ensure_ascii=False)
+            fields.append(pyarrow.field(plan.names[position], arrow_type(plan.pipelines[position]),
+                                        metadata=metadata))
+    return pyarrow.schema(fields, metadata={
+        'scheme': workbook.name,
+        'groups': json.dumps({orm: [plan.names[p] for p in positions]
+                              for orm, positions in groups.items()}, ensure_ascii=False),
+    })
+
+
+def scalar(value: Any) -> Any:
+    # значения ячеек без форматирования (числа xlsx) передаются строками
+    return value if value is None or value.__class__ is str else str(value)
+
+
+def arrow_block(schema: Any, plan: TransformPlan, numbers: List[int],
+                block: List[Sequence[Any]]) -> bytes:
+    """arrow_block
+
+    Преобразование блока строк в пакет записей Arrow IPC по схеме arrow_schema
+
+    Returns:
+        bytes: сообщение Arrow IPC с пакетом записей
+    """
+    columns = dict(zip(plan.names, plan.columns(block)))
+    arrays = [pyarrow.array(numbers, type=pyarrow.int64())]
+    for field in list(schema)[1:]:
+        values = columns[field.name]
+        if field.type == pyarrow.string():
+            values = [scalar(v) for v in values]
+        arrays.append(pyarrow.array(values, type=field.type))
+    return pyarrow.record_batch(arrays, schema=schema).serialize().to_pybytes()
+
+
+def counted(func: Callable[[TransformPlan, List[int], List[Sequence[Any]]], bytes],
+            plan: TransformPlan, numbers: List[int],
+            block: List[Sequence[Any]]) -> Tuple[int, bytes]:
+    """counted
+
+    Кодирование блока функцией func с количеством строк блока
+    """
+    return len(numbers), func(plan, numbers, block)
+
+
+def stream_encoder(media_type: str, workbook: Any, plan: TransformPlan) -> StreamEncoder:
+    """stream_encoder
+
+    Кодирование результата преобразования документа по схеме workbook
+
+    Args:
+        media_type (str): тип содержимого, выбранный negotiate
+        workbook (Workbook): схема документа
+        plan (TransformPlan): план преобразования
+    """
+    if media_type == MSGPACK:
+        return StreamEncoder(MSGPACK, msgpack_header(workbook, plan), msgpack_block, b'')
+    if media_type == ARROW:
+        schema = arrow_schema(workbook, plan)
+        return StreamEncoder(ARROW, schema.serialize().to_pybytes(),
+                             partial(arrow_block, schema), ARROW_EOS)
+    return StreamEncoder(NDJSON, b'', ndjson_block, b'')
+
+
+__all__ = ['ARROW', 'MSGPACK', 'NDJSON', 'StreamEncoder', 'available', 'counted', 'negotiate',
+           'stream_encoder']
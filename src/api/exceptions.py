@@ -5,3 +5,15 @@ class SchemeNotLoaded(Exception):
 
 class SchemeNotFound(Exception):
     pass
+
+
+class SchemeVersionConflict(Exception):
+    pass
+
+
+class SchemeRegexRejected(ValueError):
+    pass
+
+
+class SchemeNameMismatch(ValueError):
+    pass
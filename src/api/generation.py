@@ -0,0 +1,128 @@
+import os
+
+import mmap
+
+import time
+
+import struct
+
+from typing import Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - блокировка недоступна вне POSIX
+    fcntl = None
+
+COUNTER = struct.Struct('<Q')
+# интервал принудительной сверки директории, сек.: изменения файлов на месте,
+# выполненные без API сервиса, учитываются не позже чем через этот интервал
+RESCAN_INTERVAL = 30.0
+
+
+class Generation:
+    """
+    Счетчик поколений схем, разделяемый процессами через отображаемый в память файл
+
+    Каждое сохранение схемы увеличивает счетчик. Процесс сравнивает значение
+    со значением при последней сверке реестра и обращается к директории схем
+    только при изменении счетчика. Чтение счетчика не требует системных вызовов.
+
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self._map: Optional[mmap.mmap] = None
+        self._fd: Optional[int] = None
+
+    def _open(self) -> Optional[mmap.mmap]:
+        if self._map is None:
+            try:
+                fd = os.open(self.filename, os.O_RDWR | os.O_CREAT, 0o644)
+            except OSError:
+                return None
+            if os.fstat(fd).st_size < COUNTER.size:
+                self._lock(fd)
+                try:
+                    if os.fstat(fd).st_size < COUNTER.size:
+                        os.ftruncate(fd, COUNTER.size)
+                finally:
+                    self._unlock(fd)
+            self._fd = fd
+            self._map = mmap.mmap(fd, COUNTER.size)
+        return self._map
+
+    @staticmethod
+    def _lock(fd: int) -> None:
+        if fcntl:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+
+    @staticmethod
+    def _unlock(fd: int) -> None:
+        if fcntl:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def value(self) -> Optional[int]:
+        """value
+
+        Текущее значение счетчика
+
+        Returns:
+            Optional[int]: None, если файл счетчика недоступен
+        """
+        counter = self._open()
+        if counter is None:
+            return None
+        return COUNTER.unpack_from(counter, 0)[0]
+
+    def bump(self) -> Optional[int]:
+        """bump
+
+        Увеличение счетчика под блокировкой файла
+
+        Returns:
+            Optional[int]: новое значение или None, если файл счетчика недоступен
+        """
+        counter = self._open()
+        if counter is None:
+            return None
+        self._lock(self._fd)
+        try:
+            value = COUNTER.unpack_from(counter, 0)[0] + 1
+            COUNTER.pack_into(counter, 0, value)
+        finally:
+            self._unlock(self._fd)
+        return value
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            os.close(self._fd)
+            self._map = self._fd = None
+
+
+def checkpoint(generation: Optional[Generation], pathname: str,
+               interval: float = RESCAN_INTERVAL) -> Optional[Tuple[int, int, int]]:
+    """checkpoint
+
+    Состояние, при неизменности которого сверка директории не требуется:
+    значение счетчика поколений, mtime директории (добавление, удаление
+    и замена файлов, в том числе при развертывании) и номер интервала interval
+
+    Args:
+        generation (Optional[Generation]): счетчик поколений
+        pathname (str): директория файлов
+        interval (float, optional): интервал принудительной сверки. Defaults to RESCAN_INTERVAL.
+
+    Returns:
+        Optional[Tuple[int, int, int]]: None - сверка выполняется при каждом обращении
+    """
+    if generation is None:
+        return None
+    value = generation.value()
+    if value is None:
+        return None
+    try:
+        mtime = os.stat(pathname).st_mtime_ns
+    except OSError:
+        mtime = 0
+    return value, mtime, int(time.monotonic() // interval) if interval > 0 else 0
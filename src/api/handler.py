@@ -3,9 +3,13 @@ import os
 
 import json
 
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Callable, Optional, Tuple
 
-import json
+from src.api.generation import Generation
+from src.api.index import SchemeIndex
+from src.api.registry import SchemeRegistry
+from src.api.storage import VersionLock, atomic_write, etag_matches, read_version
+from src.api.exceptions import SchemeVersionConflict
 
 
 class SchemeHandler(type):
@@ -19,8 +23,27 @@ class SchemeHandler(type):
 
     SOURCE:str 
 
+    MODEL:Callable[..., Any]
+
+    REGISTRY:SchemeRegistry
+
+    # индекс метаданных схем для списков без чтения моделей
+    INDEX:SchemeIndex
+
+    # счетчик изменений схем, общий для процессов приложения
+    GENERATION:Generation
+
+    # файлы изменяются только через dump: реестр сверяется с директорией
+    # после изменения счетчика поколений, иначе - при каждом обращении по mtime файлов
+    WRITABLE:bool = True
+
     def __init_subclass__(cls) -> None:
         cls.PATH  = f'{os.environ["SCHEMES_PATH"]}'
+        cls.GENERATION = Generation(f'{cls.PATH}/.generation')
+        generation = cls.GENERATION if cls.WRITABLE else None
+        cls.REGISTRY = SchemeRegistry(f'{cls.PATH}/{cls.SOURCE}', cls.MODEL, generation)
+        cls.INDEX = SchemeIndex(f'{cls.PATH}/{cls.SOURCE}', f'{cls.PATH}/.{cls.SOURCE}.index',
+                                generation)
         super().__init_subclass__()
 
     @classmethod
@@ -41,14 +64,17 @@ class SchemeHandler(type):
                 with open(f'{pathname}/{filename}', 'r', encoding='utf8') as f:
                     schemes.append(json.loads(f.read(-1)))
         return schemes
-        
-    
+
     @classmethod
-    def dump(cls, scheme:str, data:dict, ensure_exists=True) -> None:
+    def dump(cls, scheme:str, data:dict, ensure_exists=True,
+             expected: Optional[str] = None) -> Tuple[str, int]:
         """dump 
 
         Загрузка данных в файл *.json в соответствие
 
+        Запись выполняется во временный файл с заменой целевого (os.replace),
+        проверка условия и запись выполняются под блокировкой файла версии схемы.
+
         Args:
             source (str): тип данных documents/database/...
             scheme (str): наименование схемы -> имя файла
@@ -56,15 +82,48 @@ class SchemeHandler(type):
             ensure_exists (bool, optional): если записывается новая схема, то проверка не производится, 
                                             если идет обновление существующей, то проверка осуществляется. 
                                             Defaults to True.
+            expected (Optional[str], optional): значение заголовка If-Match, сравнивается
+                                            с хэшем текущего содержимого. Defaults to None.
+        Returns:
+            Tuple[str, int]: записанное содержимое и новый номер версии схемы
+
         Raises:
-            FileNotFoundError: [description]
+            FileNotFoundError: схема не найдена
+            SchemeVersionConflict: текущее содержимое не соответствует If-Match
         """
         filename = f'{cls.PATH}/{cls.SOURCE}/{scheme}.json'
-        if ensure_exists:
-            if not os.path.isfile(filename):
+        with VersionLock(cls.version_filename(scheme)) as lock:
+            exists = os.path.isfile(filename)
+            if ensure_exists and not exists:
                 raise FileNotFoundError
-        with open(filename, 'w', encoding='utf8') as f:
-            f.write(json.dumps(data, ensure_ascii=False, indent=4, sort_keys=True))
+            if expected is not None:
+                current = None
+                if exists:
+                    with open(filename, 'rb') as f:
+                        current = cls.REGISTRY.digest(f.read(-1))
+                if not etag_matches(expected, current):
+                    raise SchemeVersionConflict(scheme)
+            content = json.dumps(data, ensure_ascii=False, indent=4, sort_keys=True)
+            atomic_write(filename, content)
+            version = lock.bump()
+        # остальные процессы сверят реестр при следующем обращении
+        cls.GENERATION.bump()
+        return content, version
+
+    @classmethod
+    def version_filename(cls, scheme: str) -> str:
+        """
+        Файл с номером версии схемы, хранится рядом с файлом схемы
+        """
+        return f'{cls.PATH}/{cls.SOURCE}/{scheme}.version'
+
+    @classmethod
+    def scheme_version(cls, scheme: str) -> int:
+        """scheme_version
+
+        Номер версии схемы, увеличивается при каждой записи, 0 - схема не изменялась
+        """
+        return read_version(cls.version_filename(scheme))
 
     @classmethod
     def read(cls, *args, **kwargs):
@@ -83,4 +142,16 @@ class SchemeHandler(type):
 
     @classmethod
     def write(cls, *args, **kwargs):
+        raise NotImplementedError
+
+    @classmethod
+    async def aread(cls, *args, **kwargs):
+        raise NotImplementedError
+
+    @classmethod
+    async def aupdate(cls, *args, **kwargs):
+        raise NotImplementedError
+
+    @classmethod
+    async def awrite(cls, *args, **kwargs):
         raise NotImplementedError
\ No newline at end of file
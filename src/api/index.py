@@ -0,0 +1,258 @@
+import os
+
+import json
+
+import base64
+
+import bisect
+
+import hashlib
+
+import threading
+
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from src.api.generation import RESCAN_INTERVAL, Generation, checkpoint
+from src.api.storage import atomic_write, read_version
+
+# формат файла индекса, индекс другого формата строится заново
+INDEX_FORMAT = 1
+# атрибуты записи индекса в порядке вывода
+FIELDS = ('name', 'title', 'sheet', 'columns', 'required', 'version', 'hash', 'modified')
+
+
+def summarize(data: Dict[str, Any]) -> Dict[str, Any]:
+    """summarize
+
+    Атрибуты записи индекса из содержимого файла схемы без построения модели:
+    наименование, заголовок, лист, количество столбцов и обязательных столбцов
+    """
+    columns = data.get('columns') or []
+    return {
+        'name': data.get('name'),
+        'title': data.get('title'),
+        'sheet': data.get('sheet'),
+        'columns': len(columns),
+        'required': sum(1 for c in columns
+                        if not (c.get('document') or {}).get('optional', False)),
+    }
+
+
+def encode_cursor(name: str) -> str:
+    return base64.urlsafe_b64encode(name.encode('utf8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> str:
+    """decode_cursor
+
+    Raises:
+        ValueError: некорректное значение курсора
+    """
+    try:
+        return base64.b64decode(cursor + '=' * (-len(cursor) % 4), altchars=b'-_',
+                                validate=True).decode('utf8')
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Некорректное значение cursor')
+
+
+class SchemeIndex:
+    """
+    Индекс метаданных схем: наименование, заголовок, лист, количество столбцов,
+    номер версии и хэш содержимого
+
+    Индекс сохраняется в файл рядом с директорией схем и сверяется с директорией
+    по mtime и размеру файлов при тех же условиях, что и реестр схем. Изменившиеся
+    файлы разбираются как JSON без построения моделей, после сохранения схемы
+    запись обновляется без чтения файла. Для списков схем модели реестра не требуются.
+
+    """
+
+    def __init__(self, pathname: str, filename: str,
+                 generation: Optional[Generation] = None, rescan: float = RESCAN_INTERVAL):
+        self.pathname = pathname
+        self.filename = filename
+        self.generation = generation
+        self.rescan = rescan
+        self._generation: Optional[Tuple[int, int, int]] = None
+        self._loaded = False
+        # записи по имени файла: mtime, размер и атрибуты FIELDS
+        self._items: Dict[str, Dict[str, Any]] = {}
+        # записи в порядке наименований схем
+        self._names: List[str] = []
+        self._sorted: List[Dict[str, Any]] = []
+        self._lock = threading.RLock()
+        # количество файлов, разобранных при сверке
+        self.summarized = 0
+        self.version = 0
+
+    def refresh(self) -> None:
+        """refresh
+
+        Сверка индекса с файлами в директории схем, файлы с неизменными mtime
+        и размером не открываются, номер версии перечитывается при изменении
+        mtime файла версии. Измененный индекс сохраняется в файл.
+        """
+        generation = checkpoint(self.generation, self.pathname, self.rescan)
+        if generation is not None and generation == self._generation:
+            return
+        with self._lock:
+            changed = self._load() if not self._loaded else False
+            seen: Set[str] = set()
+            try:
+                items = list(os.scandir(self.pathname))
+            except FileNotFoundError:
+                items = []
+            for item in items:
+                _, tail = os.path.splitext(item.name)
+                if tail != '.json' or not item.is_file():
+                    continue
+                seen.add(item.name)
+                stat = item.stat()
+                current = self._items.get(item.name)
+                if current and current['mtime'] == stat.st_mtime_ns and current['size'] == stat.st_size:
+                    # номер версии записывается после файла схемы и сверяется отдельно
+                    vmtime = self._vmtime(item.name)
+                    if current.get('vmtime') != vmtime:
+                        current['version'] = self._version(item.name)
+                        current['vmtime'] = vmtime
+                        changed = True
+                    continue
+                with open(item.path, 'rb') as f:
+                    content = f.read(-1)
+                digest = hashlib.sha1(content).hexdigest()
+                if current and current['hash'] == digest:
+                    # файл перезаписан тем же содержимым, номер версии мог измениться
+                    summary = {k: current[k] for k in ('name', 'title', 'sheet', 'columns',
+                                                       'required')}
+                else:
+                    try:
+                        summary = summarize(json.loads(content))
+                    except (ValueError, AttributeError):
+                        # файл, который не является схемой, в индекс не включается
+                        continue
+                    self.summarized += 1
+                self._items[item.name] = self._item(item.name, stat, digest, summary)
+                changed = True
+            for filename in set(self._items) - seen:
+                del self._items[filename]
+                changed = True
+            if changed:
+                self._reindex()
+                self._persist()
+            self._generation = generation
+
+    def update(self, filename: str, content: bytes, data: Dict[str, Any]) -> None:
+        """update
+
+        Обновление записи после сохранения файла схемы
+
+        Args:
+            filename (str): имя файла в директории схем
+            content (bytes): записанное содержимое
+            data (Dict[str, Any]): записанные данные схемы
+        """
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            stat = os.stat(os.path.join(self.pathname, filename))
+            self._items[filename] = self._item(filename, stat, hashlib.sha1(content).hexdigest(),
+                                               summarize(data))
+            self._reindex()
+            self._persist()
+
+    def discard(self, filename: str) -> None:
+        with self._lock:
+            if self._items.pop(filename, None):
+                self._reindex()
+                self._persist()
+
+    def page(self, fields: Optional[Sequence[str]] = None, cursor: Optional[str] = None,
+             limit: int = 100) -> Tuple[List[Dict[str, Any]], Optional[str], int]:
+        """page
+
+        Часть списка схем в порядке наименований
+
+        Args:
+            fields (Optional[Sequence[str]], optional): выводимые атрибуты. Defaults to None - все.
+            cursor (Optional[str], optional): курсор, полученный с предыдущей частью. Defaults to None.
+            limit (int, optional): количество записей. Defaults to 100.
+
+        Raises:
+            ValueError: неизвестный атрибут или некорректный курсор
+
+        Returns:
+            Tuple[List[Dict[str, Any]], Optional[str], int]: записи, курсор следующей части
+                или None и общее количество схем
+        """
+        fields = tuple(fields or FIELDS)
+        unknown = [f for f in fields if f not in FIELDS]
+        if unknown:
+            raise ValueError(f'Неизвестные атрибуты: {", ".join(unknown)}')
+        with self._lock:
+            names, items = self._names, self._sorted
+        start = bisect.bisect_right(names, decode_cursor(cursor)) if cursor else 0
+        chunk = items[start:start + limit]
+        following = encode_cursor(chunk[-1]['name']) if start + limit < len(items) else None
+        return [{f: item[f] for f in fields} for item in chunk], following, len(items)
+
+    def _item(self, filename: str, stat: os.stat_result, digest: str,
+              summary: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            **summary,
+            'version': self._version(filename),
+            'hash': digest,
+            'modified': stat.st_mtime_ns / 1e9,
+            'mtime': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'vmtime': self._vmtime(filename),
+        }
+
+    def _version_filename(self, filename: str) -> str:
+        stem, _ = os.path.splitext(filename)
+        return os.path.join(self.pathname, f'{stem}.version')
+
+    def _version(self, filename: str) -> int:
+        return read_version(self._version_filename(filename))
+
+    def _vmtime(self, filename: str) -> Optional[int]:
+        try:
+            return os.stat(self._version_filename(filename)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _load(self) -> bool:
+        """_load
+
+        Чтение сохраненного индекса, записи сверяются с директорией при refresh
+
+        Returns:
+            bool: сохраненный индекс отсутствует или не может быть использован
+        """
+        self._loaded = True
+        try:
+            with open(self.filename, 'rb') as f:
+                stored = json.loads(f.read(-1))
+        except (OSError, ValueError):
+            return True
+        if not isinstance(stored, dict) or stored.get('format') != INDEX_FORMAT:
+            return True
+        self._items = dict(stored.get('items') or {})
+        self._reindex()
+        return False
+
+    def _persist(self) -> None:
+        try:
+            atomic_write(self.filename, json.dumps({'format': INDEX_FORMAT, 'items': self._items},
+                                                   ensure_ascii=False))
+        except OSError:
+            # индекс восстанавливается сверкой с директорией
+            pass
+
+    def _reindex(self) -> None:
+        self.version += 1
+        self._sorted = sorted((i for i in self._items.values() if isinstance(i.get('name'), str)),
+                              key=lambda i: i['name'])
+        self._names = [i['name'] for i in self._sorted]
+
+
+__all__ = ['FIELDS', 'SchemeIndex', 'summarize']
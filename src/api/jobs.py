@@ -0,0 +1,402 @@
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import os
+
+import glob
+
+import time
+
+import uuid
+
+import sqlite3
+
+import logging
+
+import threading
+
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# состояния задания
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    params TEXT NOT NULL,
+    size INTEGER NOT NULL DEFAULT 0,
+    scheme TEXT,
+    rows INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created REAL NOT NULL,
+    started REAL,
+    updated REAL,
+    finished REAL,
+    lease TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, created);
+'''
+COLUMNS = ('id', 'state', 'params', 'size', 'scheme', 'rows', 'error',
+           'created', 'started', 'updated', 'finished', 'lease')
+
+
+class LeaseLost(Exception):
+    """
+    Задание возвращено в очередь и выбрано другим исполнителем
+    """
+
+
+class Job:
+    """
+    Задание фоновой обработки документа
+
+    Документ задания хранится в директории очереди в файле {id}.upload,
+    результат - в файле {id}.result. Результат записывается в файл part,
+    отдельный для каждой выдачи задания исполнителю (lease).
+
+    """
+    __slots__ = COLUMNS + ('path',)
+
+    def __init__(self, path: str, **values: Any):
+        self.path = path
+        for name in COLUMNS:
+            setattr(self, name, values.get(name))
+
+    @property
+    def upload(self) -> str:
+        return os.path.join(self.path, f'{self.id}.upload')
+
+    @property
+    def result(self) -> str:
+        return os.path.join(self.path, f'{self.id}.result')
+
+    @property
+    def part(self) -> str:
+        return os.path.join(self.path, f'{self.id}.{self.lease}.part')
+
+    @property
+    def seconds(self) -> Optional[float]:
+        if self.started is None:
+            return None
+        return (self.finished or self.updated or self.started) - self.started
+
+    @property
+    def throughput(self) -> Optional[float]:
+        seconds = self.seconds
+        return self.rows / seconds if seconds else None
+
+    def dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'state': self.state,
+            'scheme': self.scheme,
+            'size': self.size,
+            'rows': self.rows,
+            'seconds': self.seconds,
+            'throughput': self.throughput,
+            'error': self.error,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+        }
+
+
+class JobQueue:
+    """
+    Очередь заданий в базе SQLite в директории path
+
+    Очередь разделяется процессами сервиса: задание выбирается одним исполнителем
+    в транзакции BEGIN IMMEDIATE и получает метку выдачи lease. Задания, выполнявшиеся
+    при остановке процесса, возвращаются в очередь методом recover; изменения
+    исполнителя с прежней меткой после этого отклоняются (LeaseLost).
+
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.filename = os.path.join(path, 'jobs.sqlite')
+        os.makedirs(path, exist_ok=True)
+        with self.connect() as db:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.executescript(SCHEMA)
+            # очередь, созданная до появления меток выдачи
+            if 'lease' not in {row[1] for row in db.execute('PRAGMA table_info(jobs)')}:
+                db.execute('ALTER TABLE jobs ADD COLUMN lease TEXT')
+
+    @contextmanager
+    def connect(self) -> Iterator[sqlite3.Connection]:
+        db = sqlite3.connect(self.filename, timeout=30, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def job(self, row: Optional[tuple]) -> Optional[Job]:
+        return Job(self.path, **dict(zip(COLUMNS, row))) if row else None
+
+    def new(self, params: str) -> Job:
+        """new
+
+        Задание с параметрами обработки params в формате JSON, в очередь добавляется
+        методом submit после записи документа в файл Job.upload
+        """
+        return Job(self.path, id=uuid.uuid4().hex, state=QUEUED, params=params,
+                   size=0, rows=0, created=time.time())
+
+    def submit(self, job: Job) -> Job:
+        job.size = os.path.getsize(job.upload)
+        with self.connect() as db:
+            db.execute('INSERT INTO jobs (id, state, params, size, created) VALUES (?, ?, ?, ?, ?)',
+                       (job.id, job.state, job.params, job.size, job.created))
+        return job
+
+    def get(self, id: str) -> Optional[Job]:
+        with self.connect() as db:
+            return self.job(db.execute(
+                f'SELECT {", ".join(COLUMNS)} FROM jobs WHERE id = ?', (id,)).fetchone())
+
+    def claim(self) -> Optional[Job]:
+        """claim
+
+        Выбор самого раннего задания из очереди для выполнения
+
+        Returns:
+            Optional[Job]: задание или None, если очередь пуста
+        """
+        with self.connect() as db:
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                job = self.job(db.execute(
+                    f'SELECT {", ".join(COLUMNS)} FROM jobs WHERE state = ? '
+                    'ORDER BY created LIMIT 1', (QUEUED,)).fetchone())
+                if job is not None:
+                    job.state, job.started, job.lease = RUNNING, time.time(), uuid.uuid4().hex
+                    db.execute('UPDATE jobs SET state = ?, started = ?, updated = ?, lease = ? '
+                               'WHERE id = ?', (job.state, job.started, job.started, job.lease,
+                                                job.id))
+                db.execute('COMMIT')
+            except BaseException:
+                db.execute('ROLLBACK')
+                raise
+        return job
+
+    def progress(self, job: Job, rows: Optional[int] = None, scheme: Optional[str] = None) -> None:
+        """progress
+
+        Учет обработанных строк, без rows - только отметка о выполнении задания
+
+        Raises:
+            LeaseLost: задание возвращено в очередь
+        """
+        job.updated = time.time()
+        if rows is not None:
+            job.rows = rows
+        if scheme is not None:
+            job.scheme = scheme
+        with self.connect() as db:
+            if not db.execute('UPDATE jobs SET rows = ?, scheme = ?, updated = ? '
+                              'WHERE id = ? AND lease = ?',
+                              (job.rows, job.scheme, job.updated, job.id, job.lease)).rowcount:
+                raise LeaseLost(job.id)
+
+    def finish(self, job: Job, error: Optional[str] = None) -> bool:
+        """finish
+
+        Завершение задания. При успешном выполнении файл part заменяет файл результата
+        в той же транзакции, в которой проверяется метка выдачи.
+
+        Returns:
+            bool: False, если задание возвращено в очередь и выбрано другим исполнителем
+        """
+        state = FAILED if error else DONE
+        finished = time.time()
+        with self.connect() as db:
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                owned = db.execute('SELECT 1 FROM jobs WHERE id = ? AND lease = ?',
+                                   (job.id, job.lease)).fetchone()
+                if owned:
+                    if state == DONE and os.path.exists(job.part):
+                        os.replace(job.part, job.result)
+                    db.execute('UPDATE jobs SET state = ?, error = ?, finished = ?, updated = ? '
+                               'WHERE id = ?', (state, error, finished, finished, job.id))
+                db.execute('COMMIT')
+            except BaseException:
+                db.execute('ROLLBACK')
+                raise
+        if owned:
+            job.state, job.error, job.finished = state, error, finished
+        return bool(owned)
+
+    def recover(self, stale: float = 0) -> int:
+        """recover
+
+        Возврат в очередь заданий, выполнение которых прервано: состояние задания
+        не обновлялось больше stale секунд
+
+        Returns:
+            int: количество заданий
+        """
+        with self.connect() as db:
+            return db.execute(
+                'UPDATE jobs SET state = ?, rows = 0, scheme = NULL, started = NULL, lease = NULL '
+                'WHERE state = ? AND updated < ?', (QUEUED, RUNNING, time.time() - stale)).rowcount
+
+    def purge(self, retention: float) -> int:
+        """purge
+
+        Удаление завершенных заданий старше retention секунд вместе с файлами
+
+        Returns:
+            int: количество удаленных заданий
+        """
+        with self.connect() as db:
+            rows = db.execute(
+                f'SELECT {", ".join(COLUMNS)} FROM jobs WHERE state IN (?, ?) AND finished < ?',
+                (DONE, FAILED, time.time() - retention)).fetchall()
+            for job in map(self.job, rows):
+                self.remove(job)
+                db.execute('DELETE FROM jobs WHERE id = ?', (job.id,))
+        return len(rows)
+
+    def remove(self, job: Job) -> None:
+        for filename in (job.upload, job.result):
+            try:
+                os.unlink(filename)
+            except FileNotFoundError:
+                pass
+        for filename in glob.glob(os.path.join(glob.escape(self.path), f'{job.id}.*.part')):
+            try:
+                os.unlink(filename)
+            except FileNotFoundError:
+                pass
+
+
+class JobRunner:
+    """
+    Исполнение заданий очереди ограниченным числом потоков
+
+    Функция execute получает задание и функцию учета обработанных строк
+    progress(rows, scheme) и записывает результат в файл Job.part. Исключение ValueError
+    завершает задание с ошибкой, текст которой передается клиенту, прочие исключения
+    записываются в журнал. Потоки ожидают новые задания не дольше poll секунд: задания,
+    добавленные другими процессами, выбираются при очередной проверке. Пока задание
+    выполняется, его состояние обновляется не реже stale / 3 секунд. Задания, состояние
+    которых не обновлялось больше stale секунд (процесс исполнителя остановлен),
+    возвращаются в очередь; проверка и удаление заданий старше retention
+    выполняются одним потоком процесса не чаще раза в stale / 2 секунд.
+
+    """
+
+    def __init__(self, queue: JobQueue, execute: Callable[[Job, Callable[..., None]], None],
+                 workers: int = 1, poll: float = 1.0, stale: float = 300,
+                 retention: float = 86400):
+        self.queue = queue
+        self.execute = execute
+        self.workers = workers
+        self.poll = poll
+        self.stale = stale
+        self.retention = retention
+        self.threads: List[threading.Thread] = []
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._maintained = 0.0
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        if self.threads:
+            return
+        self._stopped.clear()
+        self._maintained = 0.0
+        for i in range(self.workers):
+            thread = threading.Thread(target=self.loop, name=f'jobs-{i}', daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stopped.set()
+        self._wakeup.set()
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads = []
+
+    def notify(self) -> None:
+        self._wakeup.set()
+
+    def maintain(self) -> None:
+        """maintain
+
+        Возврат в очередь прерванных заданий и удаление устаревших,
+        выполняется одним потоком не чаще раза в stale / 2 секунд
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._maintained and now - self._maintained < self.stale / 2:
+                return
+            self._maintained = now
+        recovered = self.queue.recover(self.stale)
+        if recovered:
+            logger.warning('interrupted jobs requeued: %d', recovered)
+        self.queue.purge(self.retention)
+
+    def loop(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self.maintain()
+                job = self.queue.claim()
+            except sqlite3.Error:
+                logger.exception('jobs queue is not available')
+                job = None
+            if job is None:
+                self._wakeup.wait(self.poll)
+                self._wakeup.clear()
+                continue
+            self.run(job)
+
+    def heartbeat(self, job: Job, done: threading.Event) -> None:
+        while not done.wait(self.stale / 3):
+            try:
+                self.queue.progress(job)
+            except LeaseLost:
+                return
+            except sqlite3.Error:
+                logger.exception('jobs queue is not available')
+
+    def run(self, job: Job) -> None:
+        def progress(rows: int, scheme: Optional[str] = None) -> None:
+            self.queue.progress(job, rows, scheme)
+
+        done = threading.Event()
+        beat = threading.Thread(target=self.heartbeat, args=(job, done),
+                                name=f'jobs-heartbeat-{job.id}', daemon=True)
+        beat.start()
+        error = None
+        try:
+            self.execute(job, progress)
+        except LeaseLost:
+            error = LeaseLost
+        except ValueError as e:
+            error = str(e)
+        except Exception:
+            logger.exception('job %s failed', job.id)
+            error = 'Ошибка обработки документа'
+        finally:
+            done.set()
+            beat.join()
+        owned = error is not LeaseLost and self.queue.finish(job, error)
+        if not owned:
+            logger.warning('job %s was requeued while running', job.id)
+        # документ нужен исполнителю, выбравшему задание повторно
+        for filename in ((job.upload, job.part) if owned else (job.part,)):
+            try:
+                os.unlink(filename)
+            except FileNotFoundError:
+                pass
+
+
+__all__ = ['DONE', 'FAILED', 'QUEUED', 'RUNNING', 'Job', 'JobQueue', 'JobRunner', 'LeaseLost']
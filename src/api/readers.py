@@ -0,0 +1,310 @@
+from typing import IO, Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import io
+
+import csv
+
+import re
+
+import zipfile
+
+import posixpath
+
+from datetime import date, timedelta
+
+from xml.etree.ElementTree import parse
+from xml.parsers import expat
+
+NS_MAIN = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+NS_REL = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+NS_PKG_REL = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+# наименования элементов при разборе expat с разделителем пространства имен ' '
+ROW, C, V, T = (f'{NS_MAIN[1:-1]} {tag}' for tag in ('row', 'c', 'v', 't'))
+SI, RPH = (f'{NS_MAIN[1:-1]} {tag}' for tag in ('si', 'rPh'))
+
+XLSX_SIGNATURE = b'PK\x03\x04'
+# встроенные форматы дат Excel
+DATE_FORMAT_IDS = frozenset(list(range(14, 23)) + [45, 46, 47])
+DATE_FORMAT_CODE = re.compile(r'(?<!\\)[dmy]', re.I)
+EXCEL_EPOCH = date(1899, 12, 30)
+FORMAT_LITERALS = re.compile(r'"[^"]*"|\[[^\]]*\]')
+CELL_REFERENCE = re.compile(r'^([A-Z]+)')
+
+
+def column_number(reference: str) -> int:
+    """column_number
+
+    Номер столбца (с 0) по ссылке на ячейку, например C5 -> 2
+    """
+    m = CELL_REFERENCE.match(reference)
+    number = 0
+    for char in m.group(1) if m else '':
+        number = number * 26 + ord(char) - 64
+    return number - 1
+
+
+def detect_format(head: bytes) -> str:
+    """detect_format
+
+    Определение формата документа по первым байтам
+
+    Returns:
+        str: xlsx или csv
+    """
+    return 'xlsx' if head.startswith(XLSX_SIGNATURE) else 'csv'
+
+
+def feed(source: IO[bytes], handler: Any, size: int = 65536) -> Iterator[List[Any]]:
+    """feed
+
+    Разбор XML из потока частями фиксированного размера парсером expat
+
+    Args:
+        source (IO[bytes]): поток XML
+        handler (Any): обработчик событий с методами start, end, data и буфером ready
+        size (int, optional): размер части. Defaults to 65536.
+
+    Yields:
+        List[Any]: объекты, подготовленные обработчиком после разбора очередной части
+    """
+    parser = expat.ParserCreate(namespace_separator=' ')
+    parser.buffer_text = True
+    parser.StartElementHandler = handler.start
+    parser.EndElementHandler = handler.end
+    parser.CharacterDataHandler = handler.data
+    while True:
+        chunk = source.read(size)
+        parser.Parse(chunk, not chunk)
+        if handler.ready:
+            yield handler.ready
+            handler.ready = []
+        if not chunk:
+            break
+
+
+class SharedStringsHandler:
+    """
+    Обработчик общей таблицы строк sharedStrings.xml
+    """
+
+    def __init__(self, strings: List[str]):
+        self.strings = strings
+        self.ready: List[Any] = []
+        self.text: List[str] = []
+        self.collect = False
+        self.phonetic = False
+
+    def start(self, name: str, attrs: Dict[str, str]) -> None:
+        if name == SI:
+            self.text = []
+        elif name == T and not self.phonetic:
+            self.collect = True
+        elif name == RPH:
+            self.phonetic = True
+
+    def end(self, name: str) -> None:
+        if name == T:
+            self.collect = False
+        elif name == RPH:
+            self.phonetic = False
+        elif name == SI:
+            self.strings.append(''.join(self.text))
+
+    def data(self, text: str) -> None:
+        if self.collect:
+            self.text.append(text)
+
+
+class SheetHandler:
+    """
+    Обработчик XML листа: собирает значения ячеек в строки
+    """
+
+    def __init__(self, strings: List[str], date_styles: List[bool]):
+        self.strings = strings
+        self.date_styles = date_styles
+        self.ready: List[Tuple[int, List[Any]]] = []
+        self.row: List[Any] = []
+        self.number = 0
+        self.cell: Optional[str] = None
+        self.kind: Optional[str] = None
+        self.style: Optional[str] = None
+        self.text: List[str] = []
+        self.collect = False
+
+    def start(self, name: str, attrs: Dict[str, str]) -> None:
+        if name == C:
+            self.cell = attrs.get('r')
+            self.kind = attrs.get('t')
+            self.style = attrs.get('s')
+            self.text = []
+        elif name == V or name == T:
+            self.collect = True
+        elif name == ROW:
+            self.row = []
+            self.number = int(attrs.get('r', 0))
+
+    def end(self, name: str) -> None:
+        if name == V or name == T:
+            self.collect = False
+        elif name == C:
+            row = self.row
+            if self.cell:
+                position = column_number(self.cell)
+                if position > len(row):
+                    row.extend([None] * (position - len(row)))
+            row.append(self.value(''.join(self.text)) if self.text else None)
+        elif name == ROW:
+            self.ready.append((self.number, self.row))
+
+    def data(self, text: str) -> None:
+        if self.collect:
+            self.text.append(text)
+
+    def value(self, text: str) -> Any:
+        kind = self.kind
+        if kind == 's':
+            return self.strings[int(text)]
+        if kind in ('inlineStr', 'str', 'e'):
+            return text
+        if kind == 'b':
+            return text == '1'
+        number = float(text)
+        if self.style is not None:
+            idx = int(self.style)
+            if idx < len(self.date_styles) and self.date_styles[idx]:
+                try:
+                    return (EXCEL_EPOCH + timedelta(days=int(number))).strftime('%d.%m.%Y')
+                except (ValueError, OverflowError):
+                    return text
+        return int(number) if number.is_integer() else number
+
+
+class XlsxReader:
+    """
+    Потоковое чтение листов xlsx
+
+    XML листа разбирается инкрементально из архива частями фиксированного размера,
+    поэтому в памяти находятся только общая таблица строк и строки текущей части.
+
+    """
+
+    def __init__(self, file: IO[bytes]):
+        self.archive = zipfile.ZipFile(file)
+        self.sheets = self._sheets()
+        self._strings: Optional[List[str]] = None
+        self._date_styles: Optional[List[bool]] = None
+
+    def _sheets(self) -> Dict[str, str]:
+        rels = parse(self.archive.open('xl/_rels/workbook.xml.rels')).getroot()
+        targets = {
+            rel.get('Id'): rel.get('Target')
+            for rel in rels.iter(f'{NS_PKG_REL}Relationship')
+        }
+        workbook = parse(self.archive.open('xl/workbook.xml')).getroot()
+        sheets = {}
+        for sheet in workbook.iter(f'{NS_MAIN}sheet'):
+            target = targets.get(sheet.get(f'{NS_REL}id'), '')
+            if target.startswith('/'):
+                target = target[1:]
+            else:
+                target = posixpath.normpath(posixpath.join('xl', target))
+            sheets[sheet.get('name')] = target
+        return sheets
+
+    @property
+    def strings(self) -> List[str]:
+        if self._strings is None:
+            self._strings = []
+            try:
+                source = self.archive.open('xl/sharedStrings.xml')
+            except KeyError:
+                return self._strings
+            for _ in feed(source, SharedStringsHandler(self._strings)):
+                pass
+        return self._strings
+
+    @property
+    def date_styles(self) -> List[bool]:
+        """
+        Признак формата даты для каждого стиля ячеек (cellXfs)
+        """
+        if self._date_styles is None:
+            self._date_styles = []
+            try:
+                styles = parse(self.archive.open('xl/styles.xml')).getroot()
+            except KeyError:
+                return self._date_styles
+            # в пользовательском формате не учитываются литералы в кавычках и [секции]
+            custom = {
+                int(f.get('numFmtId')): bool(DATE_FORMAT_CODE.search(
+                    FORMAT_LITERALS.sub('', f.get('formatCode', ''))))
+                for f in styles.iter(f'{NS_MAIN}numFmt')
+            }
+            xfs = styles.find(f'{NS_MAIN}cellXfs')
+            for xf in xfs if xfs is not None else ():
+                fmt = int(xf.get('numFmtId', 0))
+                self._date_styles.append(fmt in DATE_FORMAT_IDS or custom.get(fmt, False))
+        return self._date_styles
+
+    def rows(self, sheet: str) -> Iterator[List[Any]]:
+        """rows
+
+        Построчное чтение листа
+
+        Args:
+            sheet (str): наименование листа
+
+        Raises:
+            KeyError: лист не найден
+
+        Yields:
+            List[Any]: значения ячеек строки, пропущенные ячейки заполняются None
+        """
+        source = self.archive.open(self.sheets[sheet])
+        handler = SheetHandler(self.strings, self.date_styles)
+        expected = 1
+        for rows in feed(source, handler):
+            for number, row in rows:
+                number = number or expected
+                # пропущенные в XML пустые строки
+                for _ in range(expected, number):
+                    yield []
+                expected = number + 1
+                yield row
+
+    def close(self) -> None:
+        self.archive.close()
+
+
+def read_csv(file: IO[bytes], encoding: str = 'utf-8-sig',
+             delimiter: Optional[str] = None) -> Iterator[List[str]]:
+    """read_csv
+
+    Потоковое чтение CSV. Разделитель определяется по началу документа, если не указан
+
+    Args:
+        file (IO[bytes]): двоичный поток
+        encoding (str, optional): кодировка. Defaults to 'utf-8-sig'.
+        delimiter (Optional[str], optional): разделитель. Defaults to None.
+
+    Yields:
+        List[str]: значения ячеек строки
+    """
+    text = io.TextIOWrapper(file, encoding=encoding, newline='')
+    if delimiter is None:
+        sample = text.read(65536)
+        text.seek(0)
+        try:
+            delimiter = csv.Sniffer().sniff(sample, delimiters=';,\t|').delimiter
+        except csv.Error:
+            delimiter = ';'
+    try:
+        yield from csv.reader(text, delimiter=delimiter)
+    finally:
+        text.detach()
+
+
+def is_empty(row: Sequence[Any]) -> bool:
+    return all(v is None or v == '' for v in row)
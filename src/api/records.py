@@ -0,0 +1,330 @@
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import json
+
+import sqlite3
+
+from src.api.scheme.formatters import FormatPipeline
+from src.api.transform import TransformPlan, chunks
+
+# значение параметра Database.params, подставляющее наименование столбца
+PARAM_NAME = 'name'
+# поле с номером строки документа, связывающее записи разных моделей ORM
+ROW_FIELD = 'row'
+
+
+class RecordGroup:
+    """
+    Проекция строки документа в одну запись модели ORM
+
+    Содержит для каждого поля записи позицию столбца в плане преобразования
+    (или постоянное значение для параметра name) и цепочки Database.format.
+    Результат TextParse объединяется с записью, результат прочих форматтеров
+    заменяет значение поля.
+
+    """
+    __slots__ = ('orm', 'fields', 'sources', 'constants', 'parsers')
+
+    def __init__(self, orm: str):
+        self.orm = orm
+        self.fields: List[str] = []
+        # (поле, позиция столбца в плане)
+        self.sources: List[Tuple[str, int]] = []
+        self.constants: Dict[str, Any] = {}
+        # (поле, цепочка Database.format, поля результата TextParse)
+        self.parsers: List[Tuple[str, FormatPipeline, Tuple[str, ...]]] = []
+
+    @staticmethod
+    def keys(params: Dict[str, str], pipeline: FormatPipeline) -> List[str]:
+        """keys
+
+        Поля записи, заполняемые столбцом: параметры и поля результата TextParse
+        """
+        keys = list(params)
+        for stage in pipeline.stages:
+            keys.extend(getattr(stage, 'output', None) or ())
+        return keys
+
+    def accepts(self, params: Dict[str, str], pipeline: FormatPipeline) -> bool:
+        return not set(self.keys(params, pipeline)) & set(self.fields)
+
+    def add(self, position: int, name: str, params: Dict[str, str],
+            pipeline: FormatPipeline) -> None:
+        values = []
+        for field, param in params.items():
+            self.fields.append(field)
+            if param == PARAM_NAME:
+                self.constants[field] = name
+            else:
+                self.sources.append((field, position))
+                values.append(field)
+        if pipeline and values:
+            attribute = next((s.attribute for s in pipeline.stages if s.attribute), None)
+            outputs = tuple(self.keys({}, pipeline))
+            self.parsers.append((attribute if attribute in values else values[0],
+                                 pipeline, outputs))
+            self.fields.extend(outputs)
+
+    def project(self, numbers: Sequence[int], columns: Sequence[Sequence[Any]],
+                fields: Sequence[str]) -> Optional[List[List[Any]]]:
+        """project
+
+        Значения записей по полям для блока строк.
+        Строки, в которых все поля со значениями ячеек пусты, пропускаются.
+
+        Args:
+            numbers (Sequence[int]): номера строк документа
+            columns (Sequence[Sequence[Any]]): значения столбцов плана преобразования
+            fields (Sequence[str]): поля пакета, отсутствующие в записи заполняются None
+
+        Returns:
+            Optional[List[List[Any]]]: номера строк и значения полей или None, если записей нет
+        """
+        size = len(numbers)
+        values: Dict[str, List[Any]] = {}
+        for field, position in self.sources:
+            values[field] = columns[position] if position >= 0 else [None] * size
+        keep = [i for i in range(size)
+                if any(not empty(values[f][i]) for f, _ in self.sources)]
+        if not keep:
+            return None
+        for field, pipeline, outputs in self.parsers:
+            parsed = pipeline.batch(values[field])
+            if outputs:
+                for output in outputs:
+                    values[output] = [merged(p, output) for p in parsed]
+            else:
+                values[field] = parsed
+        result: List[List[Any]] = [[numbers[i] for i in keep]]
+        for field in fields:
+            if field in self.constants:
+                result.append([self.constants[field]] * len(keep))
+            elif field in values:
+                column = values[field]
+                result.append([column[i] for i in keep])
+            else:
+                result.append([None] * len(keep))
+        return result
+
+    def __getstate__(self):
+        return self.orm, self.fields, self.sources, self.constants, self.parsers
+
+    def __setstate__(self, state):
+        self.orm, self.fields, self.sources, self.constants, self.parsers = state
+
+
+def empty(value: Any) -> bool:
+    return value is None or value == '' or value == []
+
+
+def merged(parsed: Any, field: str) -> Any:
+    """merged
+
+    Значение поля из результата TextParse: для списка значений ячейки
+    (после TextSplit) возвращается список значений поля
+    """
+    if parsed is None:
+        return None
+    if parsed.__class__ is list:
+        return [p.get(field) if p else None for p in parsed]
+    return parsed.get(field)
+
+
+class RecordBatch:
+    """
+    Пакет записей одной модели ORM в виде столбцов
+
+    Значения хранятся по полям, что позволяет передавать пакет
+    в executemany или в потоковую загрузку (COPY) без преобразования по ячейкам.
+
+    """
+    __slots__ = ('orm', 'fields', 'columns')
+
+    def __init__(self, orm: str, fields: Sequence[str], columns: List[List[Any]]):
+        self.orm = orm
+        self.fields: Tuple[str, ...] = tuple(fields)
+        self.columns = columns
+
+    def __len__(self) -> int:
+        return len(self.columns[0]) if self.columns else 0
+
+    def rows(self) -> Iterator[Tuple[Any, ...]]:
+        return zip(*self.columns)
+
+    def extend(self, columns: Sequence[Sequence[Any]]) -> None:
+        for column, values in zip(self.columns, columns):
+            column.extend(values)
+
+    def __getstate__(self):
+        return self.orm, self.fields, self.columns
+
+    def __setstate__(self, state):
+        self.orm, self.fields, self.columns = state
+
+
+class RecordPlan:
+    """
+    Скомпилированная проекция строк документа в записи моделей ORM по описаниям Database
+
+    Столбцы с одинаковой моделью объединяются в одну запись, пока наименования полей
+    не повторяются. Повторяющееся поле начинает следующую запись той же модели,
+    например группы столбцов Sanction для разных категорий лиц. Записи одной модели
+    выдаются одним пакетом с объединенным набором полей.
+
+    """
+    __slots__ = ('transform', 'groups', 'tables')
+
+    def __init__(self, transform: TransformPlan, groups: Sequence[RecordGroup]):
+        self.transform = transform
+        self.groups: Tuple[RecordGroup, ...] = tuple(groups)
+        tables: Dict[str, List[str]] = {}
+        for group in self.groups:
+            fields = tables.setdefault(group.orm, [])
+            fields.extend(f for f in group.fields if f not in fields)
+        self.tables: Dict[str, Tuple[str, ...]] = {
+            orm: tuple(fields) for orm, fields in tables.items()
+        }
+
+    @classmethod
+    def build(cls, workbook: Any, transform: TransformPlan) -> 'RecordPlan':
+        """build
+
+        Построение проекции для схемы и плана преобразования документа
+
+        Args:
+            workbook (Workbook): схема документа
+            transform (TransformPlan): план преобразования без Database.format
+        """
+        positions = {name: pos for pos, name in enumerate(transform.names)}
+        groups: List[RecordGroup] = []
+        current: Dict[str, RecordGroup] = {}
+        for column in workbook.columns:
+            database = column.database
+            if not database or not database.params:
+                continue
+            _, pipeline = workbook.formatters[column.name]
+            group = current.get(database.orm)
+            if group is None or not group.accepts(database.params, pipeline):
+                group = current[database.orm] = RecordGroup(database.orm)
+                groups.append(group)
+            group.add(positions.get(column.name, -1), column.name, database.params, pipeline)
+        return cls(transform, groups)
+
+    def records(self, numbers: Sequence[int],
+                block: Sequence[Sequence[Any]]) -> List['RecordBatch']:
+        """records
+
+        Преобразование блока строк в пакеты записей, по одному на модель ORM
+
+        Returns:
+            List[RecordBatch]: пакеты записей в порядке первого появления модели в схеме
+        """
+        columns = self.transform.columns(block)
+        batches: Dict[str, RecordBatch] = {}
+        for group in self.groups:
+            fields = self.tables[group.orm]
+            values = group.project(numbers, columns, fields)
+            if values is None:
+                continue
+            if group.orm in batches:
+                batches[group.orm].extend(values)
+            else:
+                batches[group.orm] = RecordBatch(group.orm, (ROW_FIELD, *fields), values)
+        return list(batches.values())
+
+    def __getstate__(self):
+        return self.transform, self.groups, self.tables
+
+    def __setstate__(self, state):
+        self.transform, self.groups, self.tables = state
+
+
+def records_block(plan: RecordPlan, numbers: List[int],
+                  block: List[Sequence[Any]]) -> List[RecordBatch]:
+    """records_block
+
+    Преобразование блока строк в пакеты записей, функция для process
+    """
+    return plan.records(numbers, block)
+
+
+class SQLiteSink:
+    """
+    Загрузка пакетов записей в SQLite
+
+    Таблица создается по наименованию модели ORM при первом пакете,
+    каждый пакет записывается одним вызовом executemany.
+    Списки и словари сохраняются в виде JSON.
+
+    """
+
+    def __init__(self, database: str = ':memory:'):
+        self.connection = sqlite3.connect(database)
+        self.tables: Dict[str, Tuple[str, ...]] = {}
+
+    @staticmethod
+    def quote(name: str) -> str:
+        return '"' + name.replace('"', '""') + '"'
+
+    def table(self, batch: RecordBatch) -> str:
+        fields = self.tables.get(batch.orm)
+        quote = self.quote
+        if fields is None:
+            self.connection.execute(
+                f'CREATE TABLE IF NOT EXISTS {quote(batch.orm)} '
+                f'({", ".join(quote(f) for f in batch.fields)})')
+            fields = self.tables[batch.orm] = tuple(
+                row[1] for row in self.connection.execute(f'PRAGMA table_info({quote(batch.orm)})'))
+        for field in batch.fields:
+            if field not in fields:
+                self.connection.execute(
+                    f'ALTER TABLE {quote(batch.orm)} ADD COLUMN {quote(field)}')
+                fields = self.tables[batch.orm] = fields + (field,)
+        return (f'INSERT INTO {quote(batch.orm)} ({", ".join(quote(f) for f in batch.fields)}) '
+                f'VALUES ({", ".join("?" * len(batch.fields))})')
+
+    def write(self, batches: Sequence[RecordBatch]) -> int:
+        """write
+
+        Запись пакетов в одной транзакции
+
+        Returns:
+            int: количество записанных записей
+        """
+        count = 0
+        with self.connection:
+            for batch in batches:
+                columns = [
+                    [json.dumps(v, ensure_ascii=False) if v.__class__ in (list, dict) else v
+                     for v in column]
+                    for column in batch.columns
+                ]
+                self.connection.executemany(self.table(batch), zip(*columns))
+                count += len(batch)
+        return count
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+def load(plan: RecordPlan, rows: Iterator[Sequence[Any]], start: int,
+         sink: SQLiteSink, size: int = 1000) -> int:
+    """load
+
+    Загрузка строк документа в хранилище пакетами
+
+    Args:
+        plan (RecordPlan): проекция строк в записи
+        rows (Iterator): строки документа после заголовка
+        start (int): номер первой строки
+        sink (SQLiteSink): хранилище
+        size (int, optional): размер блока. Defaults to 1000.
+
+    Returns:
+        int: количество записанных записей
+    """
+    return sum(sink.write(plan.records(numbers, block))
+               for numbers, block in chunks(rows, start, size))
+
+
+__all__ = ['RecordGroup', 'RecordBatch', 'RecordPlan', 'SQLiteSink', 'records_block', 'load']
@@ -0,0 +1,347 @@
+import os
+
+import json
+
+import hashlib
+
+import hmac
+
+import gzip
+
+import asyncio
+
+import pickle
+
+import time
+
+import threading
+
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+import aiofiles
+
+from src.api.exceptions import SchemeNotFound
+from src.api.generation import RESCAN_INTERVAL, Generation, checkpoint
+from src.api.storage import atomic_write
+
+import pydantic
+
+# формат снимка реестра, снимок другого формата не используется
+SNAPSHOT_FORMAT = ('schemes-snapshot', 2, pydantic.VERSION)
+SIGNATURE_SIZE = hashlib.sha256().digest_size
+
+
+def sign(key: bytes, payload: bytes) -> bytes:
+    return hmac.new(key, payload, hashlib.sha256).digest()
+
+
+class Encoded:
+    """
+    Сериализованное представление схемы для ответов HTTP
+
+    Содержит байты JSON, хэш содержимого для ETag и время изменения.
+    Сжатое gzip представление строится при первом обращении.
+
+    """
+    __slots__ = ('body', 'etag', 'modified', '_compressed')
+
+    def __init__(self, body: bytes, etag: str, modified: float):
+        self.body = body
+        self.etag = etag
+        self.modified = modified
+        self._compressed: Optional[bytes] = None
+
+    @property
+    def compressed(self) -> bytes:
+        if self._compressed is None:
+            # mtime=0 - одинаковое содержимое сжимается в одинаковые байты
+            self._compressed = gzip.compress(self.body, mtime=0)
+        return self._compressed
+
+    @classmethod
+    def collection(cls, items: Sequence['Encoded']) -> 'Encoded':
+        """collection
+
+        Представление списка схем из представлений отдельных схем без повторной сериализации
+        """
+        return cls(b'[' + b','.join(i.body for i in items) + b']',
+                   hashlib.sha1(''.join(i.etag for i in items).encode()).hexdigest(),
+                   max((i.modified for i in items), default=0.0))
+
+
+class SchemeEntry:
+    """
+    Запись реестра: разобранная модель схемы и признаки состояния исходного файла
+    """
+    __slots__ = ('filename', 'mtime', 'size', 'digest', 'model', '_encoded')
+
+    def __init__(self, filename: str, mtime: int, size: int, digest: str,
+                 model: Any):
+        self.filename = filename
+        self.mtime = mtime
+        self.size = size
+        self.digest = digest
+        self.model = model
+        self._encoded: Optional[Encoded] = None
+
+    @property
+    def encoded(self) -> Encoded:
+        """
+        Сериализованная модель, ETag соответствует хэшу содержимого файла
+        """
+        if self._encoded is None:
+            self._encoded = Encoded(
+                self.model.json(exclude_unset=True, ensure_ascii=False).encode('utf8'),
+                self.digest, self.mtime / 1e9)
+        return self._encoded
+
+
+class SchemeRegistry:
+    """
+    Реестр схем в памяти процесса
+
+    Хранит разобранные и провалидированные модели, проиндексированные по атрибуту name.
+    При обновлении перечитываются только файлы, у которых изменились mtime, размер
+    или хэш содержимого. Если задан счетчик поколений, директория сверяется
+    после его изменения другим процессом, после изменения mtime директории
+    (файлы добавлены, удалены или заменены без API сервиса) и не реже раза в rescan секунд.
+
+    """
+
+    def __init__(self, pathname: str, factory: Callable[..., Any],
+                 generation: Optional[Generation] = None, rescan: float = RESCAN_INTERVAL):
+        self.pathname = pathname
+        self.factory = factory
+        self.generation = generation
+        self.rescan = rescan
+        # значение счетчика, mtime директории и интервал при последней сверке
+        self._generation: Optional[Tuple[int, int, int]] = None
+        self._entries: Dict[str, SchemeEntry] = {}
+        self._names: Dict[str, str] = {}
+        self._lock = threading.RLock()
+        self._encoded: Optional[Encoded] = None
+        # модели из снимка реестра по имени файла: (хэш содержимого, модель)
+        self._snapshot: Dict[str, Tuple[str, Any]] = {}
+        # количество файлов, разобранных и восстановленных из снимка
+        self.parsed = 0
+        self.restored = 0
+        # суммарное время разбора файлов и количество обходов директории
+        self.parse_seconds = 0.0
+        self.scans = 0
+        # увеличивается при каждом изменении состава реестра
+        self.version = 0
+
+    @staticmethod
+    def digest(content: bytes) -> str:
+        return hashlib.sha1(content).hexdigest()
+
+    def refresh(self) -> None:
+        """refresh
+
+        Сверка состояния реестра с файлами в директории.
+        Файлы, у которых mtime и размер не изменились, не открываются.
+        Отсутствующая директория соответствует пустому реестру.
+        """
+        generation = checkpoint(self.generation, self.pathname, self.rescan)
+        if generation is not None and generation == self._generation:
+            return
+        with self._lock:
+            seen, pending = self._scan()
+            loaded = []
+            for filename, path, stat in pending:
+                with open(path, 'rb') as f:
+                    loaded.append((filename, stat, f.read(-1)))
+            self._apply(seen, loaded, generation)
+
+    async def arefresh(self) -> None:
+        """arefresh
+
+        Сверка состояния реестра без блокировки цикла событий: обход директории
+        и разбор выполняются в потоке, измененные файлы читаются одновременно
+        """
+        generation = checkpoint(self.generation, self.pathname, self.rescan)
+        if generation is not None and generation == self._generation:
+            return
+        seen, pending = await asyncio.to_thread(self._scan)
+
+        async def read(filename: str, path: str, stat: os.stat_result):
+            async with aiofiles.open(path, 'rb') as f:
+                return filename, stat, await f.read()
+
+        loaded = await asyncio.gather(*(read(*item) for item in pending))
+        await asyncio.to_thread(self._apply, seen, loaded, generation)
+
+    def _scan(self) -> Tuple[Set[str], List[Tuple[str, str, os.stat_result]]]:
+        """_scan
+
+        Обход директории: имена файлов схем и файлы, у которых изменились mtime или размер
+        """
+        seen = set()
+        pending = []
+        self.scans += 1
+        try:
+            items = list(os.scandir(self.pathname))
+        except FileNotFoundError:
+            items = []
+        for item in items:
+            _, tail = os.path.splitext(item.name)
+            if tail != '.json' or not item.is_file():
+                continue
+            seen.add(item.name)
+            stat = item.stat()
+            entry = self._entries.get(item.name)
+            if entry and entry.mtime == stat.st_mtime_ns and entry.size == stat.st_size:
+                continue
+            pending.append((item.name, item.path, stat))
+        return seen, pending
+
+    def _apply(self, seen: Set[str], loaded: Sequence[Tuple[str, os.stat_result, bytes]],
+               generation: Optional[Tuple[int, int, int]]) -> None:
+        """_apply
+
+        Обновление записей по прочитанному содержимому измененных файлов
+        """
+        with self._lock:
+            changed = False
+            for filename, stat, content in loaded:
+                entry = self._entries.get(filename)
+                digest = self.digest(content)
+                if entry and entry.digest == digest:
+                    # файл перезаписан тем же содержимым
+                    entry.mtime, entry.size = stat.st_mtime_ns, stat.st_size
+                    continue
+                cached = self._snapshot.pop(filename, None)
+                if cached and cached[0] == digest:
+                    model = cached[1]
+                    self.restored += 1
+                else:
+                    started = time.perf_counter()
+                    model = self.factory(**json.loads(content))
+                    self.parse_seconds += time.perf_counter() - started
+                    self.parsed += 1
+                self._entries[filename] = SchemeEntry(
+                    filename, stat.st_mtime_ns, stat.st_size, digest, model)
+                changed = True
+            for filename in set(self._entries) - seen:
+                del self._entries[filename]
+                changed = True
+            if changed:
+                self._reindex()
+            # счетчик прочитан до сверки, изменения после чтения будут учтены следующей сверкой
+            self._generation = generation
+
+    def restore(self, filename: str, key: Optional[bytes]) -> bool:
+        """restore
+
+        Загрузка снимка реестра. Модели из снимка используются при сверке
+        для файлов с совпадающим хэшем содержимого, остальные файлы разбираются.
+        Снимок хранится в директории данных, поэтому перед распаковкой pickle
+        проверяется подпись HMAC-SHA256: без ключа снимок не используется.
+
+        Args:
+            filename (str): путь к файлу снимка
+            key (Optional[bytes]): ключ подписи снимка
+
+        Returns:
+            bool: снимок загружен
+        """
+        if not key:
+            return False
+        try:
+            with open(filename, 'rb') as f:
+                content = f.read(-1)
+        except OSError:
+            return False
+        signature, payload = content[:SIGNATURE_SIZE], content[SIGNATURE_SIZE:]
+        if not hmac.compare_digest(signature, sign(key, payload)):
+            return False
+        try:
+            snapshot = pickle.loads(payload)
+        except Exception:
+            # отсутствующий, поврежденный или несовместимый снимок не используется
+            return False
+        if not isinstance(snapshot, dict) or snapshot.get('format') != SNAPSHOT_FORMAT:
+            return False
+        with self._lock:
+            self._snapshot = {
+                name: (digest, model) for name, digest, model in snapshot['entries']
+            }
+            # сверка директории обязательна после загрузки снимка
+            self._generation = None
+        return True
+
+    def snapshot(self, filename: str, key: bytes) -> None:
+        """snapshot
+
+        Сохранение разобранных моделей реестра с хэшами содержимого файлов,
+        снимок подписывается ключом key
+
+        Args:
+            filename (str): путь к файлу снимка
+            key (bytes): ключ подписи снимка
+        """
+        with self._lock:
+            entries = [(e.filename, e.digest, e.model) for e in self._entries.values()]
+        payload = pickle.dumps({'format': SNAPSHOT_FORMAT, 'entries': entries},
+                               protocol=pickle.HIGHEST_PROTOCOL)
+        atomic_write(filename, sign(key, payload) + payload)
+
+    def store(self, filename: str, content: bytes, model: Any) -> None:
+        """store
+
+        Обновление записи после сохранения файла без повторного чтения и разбора
+
+        Args:
+            filename (str): имя файла в директории реестра
+            content (bytes): записанное содержимое
+            model (Any): модель, соответствующая содержимому
+        """
+        with self._lock:
+            stat = os.stat(f'{self.pathname}/{filename}')
+            self._entries[filename] = SchemeEntry(filename, stat.st_mtime_ns,
+                                                  stat.st_size,
+                                                  self.digest(content), model)
+            self._reindex()
+
+    def discard(self, filename: str) -> None:
+        with self._lock:
+            if self._entries.pop(filename, None):
+                self._reindex()
+
+    def entry(self, name: str) -> SchemeEntry:
+        """entry
+
+        Получение записи реестра по наименованию схемы
+
+        Raises:
+            SchemeNotFound: схема с таким наименованием отсутствует
+        """
+        try:
+            return self._entries[self._names[name]]
+        except KeyError:
+            raise SchemeNotFound(name)
+
+    def get(self, name: str) -> Any:
+        return self.entry(name).model
+
+    def all(self) -> List[Any]:
+        return [self._entries[f].model for f in sorted(self._entries)]
+
+    def encoded(self) -> Encoded:
+        """encoded
+
+        Сериализованный список всех схем, строится заново после изменения реестра
+        """
+        with self._lock:
+            if self._encoded is None:
+                self._encoded = Encoded.collection(
+                    [self._entries[f].encoded for f in sorted(self._entries)])
+            return self._encoded
+
+    def _reindex(self) -> None:
+        self.version += 1
+        self._encoded = None
+        self._names = {
+            self._entries[f].model.name: f
+            for f in sorted(self._entries)
+        }
@@ -0,0 +1,242 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import re
+
+import threading
+
+from cachetools import LRUCache
+from pydantic import BaseModel, PrivateAttr
+
+from src.api.handler import SchemeHandler
+
+# размер кэша результатов сопоставления для одной пары (link, output)
+RESOLVER_CACHE_SIZE = 8192
+MISSING = object()
+SPACES = re.compile(r'\s+')
+EDGES = ' .,;:"\'«»'
+
+
+def normalize(value: Any) -> str:
+    """normalize
+
+    Приведение значения к ключу поиска: нижний регистр, ё -> е,
+    единичные пробелы, без кавычек и знаков препинания по краям
+    """
+    return SPACES.sub(' ', str(value).casefold().replace('ё', 'е')).strip(EDGES)
+
+
+class Catalogue(BaseModel):
+    """
+    Справочник: набор записей, доступный по ссылке link, например /references/organizations
+    """
+    name: str
+    link: str
+    title: Optional[str]
+    items: List[Dict[str, Any]]
+
+    _indexes: Dict[str, Dict[str, Dict[str, Any]]] = PrivateAttr(default_factory=dict)
+
+    def index(self, field: str) -> Dict[str, Dict[str, Any]]:
+        """index
+
+        Хэш-индекс записей по нормализованному значению поля, строится при первом обращении
+
+        Args:
+            field (str): наименование поля записи
+
+        Returns:
+            Dict[str, Dict[str, Any]]: записи по ключу
+        """
+        index = self._indexes.get(field)
+        if index is None:
+            index = {}
+            for item in self.items:
+                value = item.get(field)
+                if value is not None:
+                    index.setdefault(normalize(value), item)
+            self._indexes[field] = index
+        return index
+
+
+class CatalogueResolver:
+    """
+    Сопоставление значений ячеек записям справочника по одному полю
+
+    Результаты, в том числе отсутствие записи, сохраняются в ограниченном LRU кэше
+    по исходному значению, поэтому повторяющиеся значения не нормализуются повторно.
+    Объект разделяется запросами, выполняемыми в потоках: обращения к кэшу
+    и счетчикам выполняются под блокировкой, поиск в индексе - без нее.
+
+    """
+    __slots__ = ('index', 'output', 'cache', 'hits', 'misses', '_lock')
+
+    def __init__(self, index: Dict[str, Dict[str, Any]], output: str,
+                 maxsize: int = RESOLVER_CACHE_SIZE):
+        self.index = index
+        self.output = output
+        self.cache: LRUCache = LRUCache(maxsize=maxsize)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, value: Any) -> Any:
+        item = self.index.get(normalize(value))
+        return item.get(self.output) if item else None
+
+    def one(self, value: Any) -> Any:
+        return self.batch([value])[0]
+
+    def batch(self, values: Sequence[Any]) -> List[Any]:
+        """batch
+
+        Сопоставление значений столбца: значения, отсутствующие в кэше,
+        ищутся в индексе один раз
+
+        Args:
+            values (Sequence[Any]): значения ячеек, в том числе списки значений
+
+        Returns:
+            List[Any]: значения поля output найденных записей или None
+        """
+        flat = []
+        for value in values:
+            if value.__class__ is list:
+                flat.extend(v for v in value if v is not None)
+            elif value is not None:
+                flat.append(value)
+        found: Dict[Any, Any] = {}
+        missing = []
+        with self._lock:
+            get = self.cache.get
+            for value in flat:
+                if value in found:
+                    continue
+                result = get(value, MISSING)
+                if result is MISSING:
+                    missing.append(value)
+                    found[value] = MISSING
+                else:
+                    found[value] = result
+        stored = [(value, self.lookup(value)) for value in missing]
+        found.update(stored)
+        with self._lock:
+            for value, result in stored:
+                self.cache[value] = result
+            self.misses += len(missing)
+            self.hits += len(flat) - len(missing)
+
+        def resolved(value: Any) -> Any:
+            if value is None:
+                return None
+            if value.__class__ is list:
+                return [resolved(v) for v in value]
+            return found[value]
+
+        return [resolved(v) for v in values]
+
+
+class CatalogueSet:
+    """
+    Справочники, проиндексированные по ссылке link
+    """
+
+    def __init__(self, catalogues: Sequence[Catalogue], version: int = 0):
+        self.version = version
+        self.links = {c.link.rstrip('/'): c for c in catalogues}
+        self.resolvers: Dict[Tuple[str, str], Optional[CatalogueResolver]] = {}
+        self._lock = threading.Lock()
+
+    def resolver(self, link: str, output: str) -> Optional[CatalogueResolver]:
+        """resolver
+
+        Получение объекта сопоставления по ссылке вида /references/organizations/title
+
+        Args:
+            link (str): ссылка на справочник и поле поиска
+            output (str): поле записи, возвращаемое в результате
+
+        Returns:
+            Optional[CatalogueResolver]: None, если справочник не найден
+        """
+        key = (link, output)
+        with self._lock:
+            if key not in self.resolvers:
+                prefix, _, field = link.rstrip('/').rpartition('/')
+                catalogue = self.links.get(prefix)
+                self.resolvers[key] = CatalogueResolver(catalogue.index(field), output) \
+                    if catalogue else None
+            return self.resolvers[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """stats
+
+        Суммарная статистика кэшей сопоставления
+        """
+        resolvers = [r for r in list(self.resolvers.values()) if r is not None]
+        hits = sum(r.hits for r in resolvers)
+        misses = sum(r.misses for r in resolvers)
+        return {
+            'size': sum(len(r.cache) for r in resolvers),
+            'maxsize': sum(r.cache.maxsize for r in resolvers),
+            'hits': hits,
+            'misses': misses,
+            'ratio': hits / (hits + misses) if hits + misses else 0.0,
+        }
+
+    def resolve(self, mapping: Any, values: Sequence[Any], name: Optional[str] = None) -> List[Any]:
+        """resolve
+
+        Сопоставление значений столбца по описанию Mapping
+
+        Args:
+            mapping (Mapping): описание сопоставления
+            values (Sequence[Any]): значения ячеек столбца
+            name (Optional[str], optional): наименование столбца, используется
+                при input = name. Defaults to None.
+
+        Returns:
+            List[Any]: результат сопоставления для каждой ячейки
+        """
+        resolver = self.resolver(mapping.link, mapping.output)
+        if resolver is None:
+            return [None] * len(values)
+        if mapping.input == 'name':
+            return [resolver.one(name)] * len(values)
+        return resolver.batch(values)
+
+
+class Catalogues(SchemeHandler):
+    """
+    Справочники не имеют API записи и изменяются в директории напрямую,
+    поэтому реестр сверяется с файлами по mtime и размеру при каждом обращении
+    без учета счетчика поколений
+    """
+
+    SOURCE = 'catalogues'
+
+    MODEL = Catalogue
+
+    WRITABLE = False
+
+    CATALOGUES: Optional[CatalogueSet] = None
+
+    @classmethod
+    def read(cls) -> List[Catalogue]:
+        cls.REGISTRY.refresh()
+        return cls.REGISTRY.all()
+
+    @classmethod
+    def current(cls) -> CatalogueSet:
+        """current
+
+        Набор справочников, соответствующий текущему состоянию реестра.
+        Индексы и кэши сопоставления сохраняются, пока справочники не изменились.
+        """
+        cls.REGISTRY.refresh()
+        catalogues = cls.CATALOGUES
+        if catalogues is None or catalogues.version != cls.REGISTRY.version:
+            catalogues = cls.CATALOGUES = CatalogueSet(cls.REGISTRY.all(), cls.REGISTRY.version)
+        return catalogues
+
+
+__all__ = ['Catalogue', 'CatalogueSet', 'CatalogueResolver', 'Catalogues']
@@ -0,0 +1,262 @@
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from functools import lru_cache
+
+import re
+
+from src.api.scheme.matcher import GLOBAL_FLAGS
+from src.api.scheme.plan import MatchResult
+
+# минимальная длина литерала, используемого для индексации
+TOKEN_MIN_LENGTH = 3
+# экранированные последовательности, после которых начинается новое слово
+WORD_BREAKS = frozenset('sWb')
+# символы выражения, после которых начинается новое слово
+ALIGNERS = frozenset('^(| ,;:-/')
+QUANTIFIERS = frozenset('*?{')
+WORDS = re.compile(r'\w+')
+
+
+@lru_cache(maxsize=4096)
+def extract_tokens(regex: str) -> Tuple[str, ...]:
+    """extract_tokens
+
+    Извлечение обязательных литералов из регулярного выражения столбца.
+    Учитываются только последовательности букв, начинающиеся с начала слова,
+    так как поиск по индексу выполняется по префиксам слов заголовка.
+
+    Args:
+        regex (str): регулярное выражение
+
+    Returns:
+        Tuple[str, ...]: литералы в нижнем регистре
+    """
+    m = GLOBAL_FLAGS.match(regex)
+    if m:
+        regex = regex[m.end():]
+    tokens = []
+    run = ''
+    aligned = True
+    i = 0
+
+    def close(optional: bool = False):
+        nonlocal run
+        token = run[:-1] if optional else run
+        if len(token) >= TOKEN_MIN_LENGTH:
+            tokens.append(token.casefold())
+        run = ''
+
+    while i < len(regex):
+        char = regex[i]
+        if char.isalpha():
+            if run or aligned:
+                run += char
+            aligned = False
+            i += 1
+            if i < len(regex) and regex[i] in QUANTIFIERS:
+                close(optional=True)
+            elif i < len(regex) and regex[i] == '+':
+                close()
+            continue
+        close()
+        if char == '\\' and i + 1 < len(regex):
+            escaped = regex[i + 1]
+            aligned = escaped in WORD_BREAKS or not escaped.isalnum()
+            i += 2
+        elif char in '+*?':
+            # квантификатор не меняет признак начала слова
+            i += 1
+        elif char == '{':
+            end = regex.find('}', i)
+            i = end + 1 if end > 0 else len(regex)
+        elif char == '[':
+            # символьный класс не является литералом
+            end = regex.find(']', i + 2)
+            i = end + 1 if end > 0 else len(regex)
+            aligned = False
+        else:
+            aligned = char in ALIGNERS
+            i += 1
+    close()
+    return tuple(dict.fromkeys(tokens))
+
+
+def sheet_key(sheet: Optional[str]) -> str:
+    """sheet_key
+
+    Наименование листа для сравнения: без учета регистра и повторяющихся пробелов
+    """
+    return ' '.join(str(sheet or '').split()).casefold()
+
+
+class Candidate(NamedTuple):
+    """
+    Кандидат классификации: схема, оценка предварительного отбора и результат проверки
+    """
+    workbook: Any
+    score: float
+    verified: Optional[MatchResult] = None
+
+    @property
+    def matched(self) -> int:
+        return self.verified.matched if self.verified else 0
+
+    @property
+    def complete(self) -> bool:
+        return self.verified is not None and self.verified.complete
+
+
+class SchemeClassifier:
+    """
+    Ранжирование известных схем для набора заголовков
+
+    Строит инвертированный индекс литералов, извлеченных из выражений столбцов.
+    Для заголовков подбираются кандидаты по совпадению префиксов слов с литералами,
+    полная проверка выражениями выполняется только для лучших кандидатов.
+
+    """
+
+    def __init__(self, workbooks: Sequence[Any], version: int = 0):
+        self.version = version
+        self.workbooks = list(workbooks)
+        self.index: Dict[str, Set[int]] = {}
+        self.unindexed: Set[int] = set()
+        for sid, workbook in enumerate(self.workbooks):
+            indexed = False
+            for column in workbook.columns:
+                for token in extract_tokens(column.document.regex):
+                    self.index.setdefault(token, set()).add(sid)
+                    indexed = True
+            if not indexed:
+                self.unindexed.add(sid)
+        # схемы по наименованию листа
+        self.sheets: Dict[str, Set[int]] = {}
+        for sid, workbook in enumerate(self.workbooks):
+            self.sheets.setdefault(sheet_key(workbook.sheet), set()).add(sid)
+        # литералы, сгруппированные по начальным символам, для поиска по префиксам слов
+        self.prefixes: Dict[str, List[Tuple[str, Set[int]]]] = {}
+        for token, sids in self.index.items():
+            self.prefixes.setdefault(token[:TOKEN_MIN_LENGTH], []).append((token, sids))
+
+    def scores(self, source: Sequence[Any],
+               words: Optional[Dict[str, Set[int]]] = None) -> Dict[int, float]:
+        """scores
+
+        Оценка схем по доле заголовков, в которых найдены литералы столбцов схемы
+
+        Args:
+            source (Sequence[Any]): заголовки
+            words (Optional[Dict[str, Set[int]]], optional): схемы по словам заголовков,
+                разделяется при классификации нескольких наборов. Defaults to None.
+
+        Returns:
+            Dict[int, float]: оценка для каждой схемы-кандидата
+        """
+        hits: Dict[int, int] = {}
+        if words is None:
+            words = {}
+        for value in source:
+            found: Set[int] = set()
+            for word in WORDS.findall(str(value).casefold()):
+                sids = words.get(word)
+                if sids is None:
+                    sids = words[word] = set()
+                    for token, token_sids in self.prefixes.get(word[:TOKEN_MIN_LENGTH], ()):
+                        if word.startswith(token):
+                            sids |= token_sids
+                found |= sids
+            for sid in found:
+                hits[sid] = hits.get(sid, 0) + 1
+        total = len(source) or 1
+        result = {sid: count / total for sid, count in hits.items()}
+        for sid in self.unindexed:
+            result.setdefault(sid, 0.0)
+        return result
+
+    def classify(self, source: Sequence[Any], limit: int = 3, sheet: Optional[str] = None,
+                 words: Optional[Dict[str, Set[int]]] = None) -> List[Candidate]:
+        """classify
+
+        Ранжирование схем для заголовков. Кандидаты проверяются выражениями
+        в порядке оценки до первого полного совпадения, остальные возвращаются
+        только с оценкой предварительного отбора. Схемы, у которых наименование
+        листа совпадает с sheet, проверяются первыми. Если ни один из limit лучших
+        кандидатов не совпал полностью, проверяются остальные схемы, в том числе
+        не отобранные по литералам: предварительный отбор не должен приводить
+        к пропуску совпадающей схемы.
+
+        Args:
+            source (Sequence[Any]): заголовки
+            limit (int, optional): количество кандидатов для полной проверки. Defaults to 3.
+            sheet (Optional[str], optional): наименование листа документа. Defaults to None.
+            words (Optional[Dict[str, Set[int]]], optional): схемы по словам заголовков,
+                разделяется при классификации нескольких наборов. Defaults to None.
+
+        Returns:
+            List[Candidate]: кандидаты, лучший - первый
+        """
+        source = tuple(source)
+        scores = self.scores(source, words)
+        sheets = self.sheets.get(sheet_key(sheet), ()) if sheet is not None else ()
+        for sid in sheets:
+            scores.setdefault(sid, 0.0)
+        ranked = sorted(scores.items(), key=lambda i: (i[0] not in sheets, -i[1], i[0]))
+        candidates = []
+        complete = False
+        for sid, score in ranked[:limit]:
+            workbook = self.workbooks[sid]
+            if complete:
+                candidates.append(Candidate(workbook, score))
+                continue
+            candidate = Candidate(workbook, score, workbook.verify(source))
+            complete = candidate.complete
+            candidates.append(candidate)
+        if not complete:
+            checked = {sid for sid, _ in ranked[:limit]}
+            remaining = [sid for sid, _ in ranked[limit:]]
+            remaining += [sid for sid in range(len(self.workbooks)) if sid not in scores]
+            for sid in remaining:
+                if sid in checked:
+                    continue
+                workbook = self.workbooks[sid]
+                verified = workbook.verify(source)
+                if verified.complete:
+                    candidates.append(Candidate(workbook, scores.get(sid, 0.0), verified))
+                    break
+        candidates.sort(key=lambda c: (not c.complete, c.verified is None, -c.matched,
+                                       len(c.verified.missing_required) if c.verified else 0,
+                                       -c.score))
+        return candidates
+
+    def classify_batch(self, items: Sequence[Tuple[Sequence[Any], Optional[str]]],
+                       limit: int = 3) -> List[List[Candidate]]:
+        """classify_batch
+
+        Ранжирование схем для нескольких наборов заголовков за один проход:
+        совпадающие наборы классифицируются один раз, схемы по словам заголовков
+        определяются один раз для всех наборов
+
+        Args:
+            items (Sequence[Tuple[Sequence[Any], Optional[str]]]): заголовки
+                и наименование листа
+            limit (int, optional): количество кандидатов для полной проверки. Defaults to 3.
+
+        Returns:
+            List[List[Candidate]]: кандидаты для каждого набора в исходном порядке
+        """
+        words: Dict[str, Set[int]] = {}
+        results: Dict[Tuple[Tuple[Any, ...], Optional[str]], List[Candidate]] = {}
+        output = []
+        for source, sheet in items:
+            key = (tuple(source), sheet)
+            candidates = results.get(key)
+            if candidates is None:
+                candidates = results[key] = self.classify(key[0], limit, sheet, words)
+            output.append(candidates)
+        return output
+
+    def best(self, source: Sequence[Any], limit: int = 3) -> Optional[Candidate]:
+        candidates = self.classify(source, limit)
+        if candidates and candidates[0].complete:
+            return candidates[0]
+        return None
@@ -0,0 +1,147 @@
+from typing import Any, Dict, Optional
+
+import re
+
+from datetime import date
+
+from functools import lru_cache
+
+from dateutil import parser as date_parser
+
+# формы наименований месяцев: именительный (винительный), родительный, дательный,
+# творительный, предложный падежи и сокращения
+MONTH_FORMS = {
+    1: ('январь', 'января', 'январю', 'январём', 'январем', 'январе', 'янв'),
+    2: ('февраль', 'февраля', 'февралю', 'февралём', 'февралем', 'феврале', 'фев', 'февр'),
+    3: ('март', 'марта', 'марту', 'мартом', 'марте', 'мар'),
+    4: ('апрель', 'апреля', 'апрелю', 'апрелем', 'апреле', 'апр'),
+    5: ('май', 'мая', 'маю', 'маем', 'мае'),
+    6: ('июнь', 'июня', 'июню', 'июнем', 'июне', 'июн'),
+    7: ('июль', 'июля', 'июлю', 'июлем', 'июле', 'июл'),
+    8: ('август', 'августа', 'августу', 'августом', 'августе', 'авг'),
+    9: ('сентябрь', 'сентября', 'сентябрю', 'сентябрём', 'сентябрем', 'сентябре', 'сен', 'сент'),
+    10: ('октябрь', 'октября', 'октябрю', 'октябрём', 'октябрем', 'октябре', 'окт'),
+    11: ('ноябрь', 'ноября', 'ноябрю', 'ноябрём', 'ноябрем', 'ноябре', 'ноя', 'нояб'),
+    12: ('декабрь', 'декабря', 'декабрю', 'декабрём', 'декабрем', 'декабре', 'дек'),
+}
+MONTHS: Dict[str, int] = {form: month for month, forms in MONTH_FORMS.items() for form in forms}
+
+SEPARATORS = frozenset('.-/ ')
+# числовая дата: день, месяц и год через одинаковый разделитель
+NUMERIC = re.compile(r'^\s*(\d{1,4})([./\- ])(\d{1,2})\2(\d{1,4})\s*$')
+# дата с наименованием месяца: "5 марта 2021 г.", "«05» марта 2021", "март 2021"
+TEXTUAL = re.compile(r'(?:(\d{1,2})\D{0,3}?\s*)?\b([а-яё]+)\.?,?\s+(\d{4}|\d{2})(?!\d)',
+                     re.IGNORECASE)
+# количество разобранных значений в кэше
+CACHE_SIZE = 65536
+# значение не соответствует разбираемому виду даты
+UNPARSED = object()
+
+
+def full_year(year: int, digits: int) -> int:
+    """full_year
+
+    Год из двух цифр относится к столетию, ближайшему к текущему году, как в dateutil
+    """
+    if digits > 2:
+        return year
+    current = date.today().year
+    year += current // 100 * 100
+    if year >= current + 50:
+        year -= 100
+    elif year < current - 50:
+        year += 100
+    return year
+
+
+def iso(year: int, month: int, day: int) -> Optional[str]:
+    try:
+        return date(year, month, day).isoformat()
+    except ValueError:
+        return None
+
+
+def numeric(text: str) -> Any:
+    """numeric
+
+    Разбор числовой даты: dd.mm.yyyy (в том числе dd.mm.yy) или yyyy.mm.dd.
+    Строки длиной 10 символов разбираются срезами по позициям разделителей
+    без регулярного выражения. Месяц больше 12 меняется местами с днем.
+
+    Returns:
+        Any: дата ISO 8601, None для несуществующей даты или UNPARSED, если строка
+            не является числовой датой
+    """
+    if len(text) == 10:
+        if text[2] in SEPARATORS and text[5] == text[2]:
+            day, month, year = text[:2], text[3:5], text[6:]
+            if day.isdigit() and month.isdigit() and year.isdigit():
+                return dmy(int(day), int(month), int(year))
+        elif text[4] in SEPARATORS and text[7] == text[4]:
+            year, month, day = text[:4], text[5:7], text[8:]
+            if day.isdigit() and month.isdigit() and year.isdigit():
+                return iso(int(year), int(month), int(day))
+    m = NUMERIC.match(text)
+    if m is None:
+        return UNPARSED
+    first, _, month, last = m.groups()
+    if len(first) == 4:
+        return iso(int(first), int(month), int(last))
+    if len(first) > 2 or len(last) not in (2, 4):
+        return UNPARSED
+    return dmy(int(first), int(month), full_year(int(last), len(last)))
+
+
+def dmy(day: int, month: int, year: int) -> Optional[str]:
+    if month > 12 >= day:
+        day, month = month, day
+    return iso(year, month, day)
+
+
+def textual(text: str) -> Any:
+    """textual
+
+    Разбор даты с наименованием месяца на русском языке в любом падеже
+    или сокращением; без указания дня - первое число месяца
+
+    Returns:
+        Any: дата ISO 8601, None для несуществующей даты или UNPARSED, если месяц не найден
+    """
+    for m in TEXTUAL.finditer(text):
+        month = MONTHS.get(m.group(2).lower())
+        if month is None:
+            continue
+        day, year = m.group(1), m.group(3)
+        return iso(full_year(int(year), len(year)), month, int(day) if day else 1)
+    return UNPARSED
+
+
+def fallback(text: str) -> Optional[str]:
+    try:
+        return date_parser.parse(text, dayfirst=True).date().isoformat()
+    except (ValueError, OverflowError):
+        return None
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_date(text: str) -> Optional[str]:
+    """parse_date
+
+    Разбор даты: числовые даты, даты с наименованием месяца на русском языке,
+    остальные значения - dateutil. Результаты сохраняются в кэше по значению.
+
+    Args:
+        text (str): значение с датой
+
+    Returns:
+        Optional[str]: дата в формате ISO 8601 или None
+    """
+    result = numeric(text)
+    if result is UNPARSED:
+        result = textual(text)
+    if result is UNPARSED:
+        result = fallback(text)
+    return result
+
+
+__all__ = ['MONTHS', 'parse_date']
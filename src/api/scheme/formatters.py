@@ -0,0 +1,408 @@
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+import re
+
+import sys
+
+import threading
+
+from time import perf_counter
+
+from cachetools import LRUCache
+
+from src.api.scheme.dates import parse_date
+from src.api.scheme.guard import costs
+
+
+class Formatter:
+    """
+    Базовый форматтер значения ячейки
+
+    Наследники реализуют метод one для одного строкового значения.
+    Значения None не обрабатываются, к элементам списков (результат TextSplit)
+    форматтер применяется поэлементно, прочие типы приводятся к строке.
+
+    """
+    __slots__ = ('options', 'attribute')
+
+    NAME: str = ''
+
+    def __init__(self, options: Sequence[str], attribute: Optional[str] = None):
+        self.options = tuple(options)
+        self.attribute = attribute
+
+    def one(self, value: str) -> Any:
+        raise NotImplementedError
+
+    def __call__(self, value: Any) -> Any:
+        if value is None:
+            return None
+        if value.__class__ is list:
+            return [self.one(v) for v in value if v is not None]
+        if value.__class__ is not str:
+            value = str(value)
+        return self.one(value)
+
+    def batch(self, values: Sequence[Any]) -> List[Any]:
+        """batch
+
+        Применение форматтера к значениям столбца
+
+        Args:
+            values (Sequence[Any]): значения ячеек
+
+        Returns:
+            List[Any]: результат форматирования в том же порядке
+        """
+        one = self.one
+        apply = self.__call__
+        return [one(v) if v.__class__ is str else apply(v) for v in values]
+
+    def __getstate__(self):
+        return self.options, self.attribute
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}({self.options!r})'
+
+
+class TextClear(Formatter):
+    """
+    Замена символов по выражению: options = [выражение, замена]
+    """
+    __slots__ = ('pattern', 'repl')
+
+    NAME = 'TextClear'
+
+    def __init__(self, options: Sequence[str], attribute: Optional[str] = None):
+        super().__init__(options, attribute)
+        self.pattern = re.compile(options[0])
+        self.repl = options[1] if len(options) > 1 else ''
+
+    def one(self, value: str) -> str:
+        return self.pattern.sub(self.repl, value)
+
+    def batch(self, values: Sequence[Any]) -> List[Any]:
+        sub = self.pattern.sub
+        repl = self.repl
+        apply = self.__call__
+        return [sub(repl, v) if v.__class__ is str else apply(v) for v in values]
+
+
+class TextTrim(Formatter):
+    """
+    Замена повторяющихся пробельных символов и удаление пробелов по краям:
+    options = [выражение, замена]
+    """
+    __slots__ = ('pattern', 'repl')
+
+    NAME = 'TextTrim'
+
+    def __init__(self, options: Sequence[str], attribute: Optional[str] = None):
+        super().__init__(options, attribute)
+        self.pattern = re.compile(options[0])
+        self.repl = options[1] if len(options) > 1 else ' '
+
+    def one(self, value: str) -> str:
+        return self.pattern.sub(self.repl, value).strip()
+
+    def batch(self, values: Sequence[Any]) -> List[Any]:
+        sub = self.pattern.sub
+        repl = self.repl
+        apply = self.__call__
+        return [sub(repl, v).strip() if v.__class__ is str else apply(v) for v in values]
+
+
+class TextSplit(Formatter):
+    """
+    Разделение значения на список по выражению: options = [выражение]
+    """
+    __slots__ = ('pattern',)
+
+    NAME = 'TextSplit'
+
+    def __init__(self, options: Sequence[str], attribute: Optional[str] = None):
+        super().__init__(options, attribute)
+        self.pattern = re.compile(options[0])
+
+    def one(self, value: str) -> List[str]:
+        return [p for p in (s.strip() for s in self.pattern.split(value) if s) if p]
+
+
+class DateInput(Formatter):
+    """
+    Преобразование даты в формат ISO 8601: options = [выражение с группами date_fmt и str_fmt]
+
+    Найденная выражением дата разбирается parse_date: числовые даты - по позициям символов,
+    наименования месяцев - по таблице падежных форм, прочие значения - dateutil.
+    Для группы str_fmt разбирается значение целиком, чтобы учесть день перед наименованием месяца.
+    """
+    __slots__ = ('pattern',)
+
+    NAME = 'DateInput'
+
+    def __init__(self, options: Sequence[str], attribute: Optional[str] = None):
+        super().__init__(options, attribute)
+        self.pattern = re.compile(options[0])
+
+    def one(self, value: str) -> Optional[str]:
+        m = self.pattern.search(value)
+        if not m:
+            return None
+        if m.lastgroup == 'str_fmt':
+            return parse_date(value.strip())
+        return parse_date(m.group(0))
+
+    def batch(self, values: Sequence[Any]) -> List[Any]:
+        # повторяющиеся значения столбца разбираются один раз
+        one = self.one
+        parsed = {v: one(v) for v in dict.fromkeys(v for v in values if v.__class__ is str)}
+        apply = self.__call__
+        return [parsed[v] if v.__class__ is str else apply(v) for v in values]
+
+
+class TextParse(Formatter):
+    """
+    Разбор значения на атрибуты по именованным группам выражения:
+    options = [выражение], output = {атрибут: группа}
+    """
+    __slots__ = ('pattern', 'output')
+
+    NAME = 'TextParse'
+
+    def __init__(self, options: Sequence[str], attribute: Optional[str] = None,
+                 output: Optional[Dict[str, str]] = None):
+        super().__init__(options, attribute)
+        self.pattern = re.compile(options[0])
+        self.output = dict(output or {})
+
+    def one(self, value: str) -> Dict[str, Any]:
+        groups: Dict[str, Any] = {}
+        # выражение может состоять из альтернатив, значения групп собираются по всем совпадениям
+        for m in self.pattern.finditer(value):
+            for group, found in m.groupdict().items():
+                if found is not None and group not in groups:
+                    groups[group] = found
+        return {attr: groups.get(group) for attr, group in self.output.items()}
+
+    def __getstate__(self):
+        return self.options, self.attribute, self.output
+
+
+FORMATTERS: Dict[str, Callable[..., Formatter]] = {
+    f.NAME: f for f in (TextClear, TextTrim, TextSplit, DateInput, TextParse)
+}
+
+
+# отсутствующее в кэше значение
+MISSING = object()
+
+
+def interned(value: Any) -> Any:
+    """interned
+
+    Результат форматирования с интернированными строками: одинаковые значения
+    разных ячеек ссылаются на один объект
+    """
+    if value.__class__ is str:
+        return sys.intern(value)
+    if value.__class__ is list:
+        return [sys.intern(v) if v.__class__ is str else v for v in value]
+    if value.__class__ is dict:
+        return {k: sys.intern(v) if v.__class__ is str else v for k, v in value.items()}
+    return value
+
+
+def shared(value: Any) -> Any:
+    # списки и словари из кэша передаются копиями, чтобы изменение результата не изменяло кэш
+    return value.copy() if value.__class__ is list or value.__class__ is dict else value
+
+
+class ValueMemo:
+    """
+    Ограниченный LRU кэш результата цепочки форматирования столбца по исходному значению ячейки
+
+    Кэшируются только строковые значения, повторы значения в одном наборе
+    форматируются один раз. Если после PROBE обращений доля попаданий ниже MIN_RATIO
+    (столбец с уникальными значениями), кэш отключается и цепочка применяется напрямую.
+    Размер и исключаемые столбцы задаются атрибутами класса до компиляции схем.
+
+    """
+    __slots__ = ('name', 'cache', 'hits', 'misses', 'enabled', '_lock')
+
+    # количество значений в кэше столбца, 0 - кэширование отключено
+    SIZE: int = 4096
+    # наименования столбцов, для которых кэширование отключено
+    EXCLUDE: FrozenSet[str] = frozenset()
+    PROBE: int = 10000
+    MIN_RATIO: float = 0.05
+
+    def __init__(self, name: str, size: Optional[int] = None):
+        self.name = name
+        self.cache: LRUCache = LRUCache(maxsize=size or self.SIZE)
+        self.hits = 0
+        self.misses = 0
+        self.enabled = True
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(cls, name: str) -> Optional['ValueMemo']:
+        if cls.SIZE <= 0 or name in cls.EXCLUDE:
+            return None
+        return cls(name)
+
+    def batch(self, compute: Callable[[List[Any]], List[Any]],
+              values: Sequence[Any]) -> List[Any]:
+        """batch
+
+        Форматирование значений с использованием кэша: функция compute
+        вызывается один раз для отсутствующих в кэше значений
+
+        Args:
+            compute (Callable[[List[Any]], List[Any]]): форматирование набора значений
+            values (Sequence[Any]): значения ячеек
+
+        Returns:
+            List[Any]: результат форматирования в том же порядке
+        """
+        if not self.enabled:
+            return compute(values)
+        result: List[Any] = [None] * len(values)
+        missing: Dict[str, List[int]] = {}
+        others: List[int] = []
+        with self._lock:
+            get = self.cache.get
+            for idx, value in enumerate(values):
+                if value.__class__ is not str:
+                    others.append(idx)
+                    continue
+                found = get(value, MISSING)
+                if found is MISSING:
+                    missing.setdefault(value, []).append(idx)
+                else:
+                    result[idx] = shared(found)
+        stored = []
+        if missing or others:
+            keys = list(missing)
+            output = compute(keys + [values[idx] for idx in others])
+            for idx, value in zip(others, output[len(keys):]):
+                result[idx] = value
+            for key, value in zip(keys, output):
+                value = interned(value)
+                stored.append((key, value))
+                for idx in missing[key]:
+                    result[idx] = shared(value)
+        with self._lock:
+            for key, value in stored:
+                self.cache[key] = value
+            self.misses += len(missing)
+            self.hits += len(values) - len(others) - len(missing)
+            total = self.hits + self.misses
+            if total >= self.PROBE and self.hits < self.MIN_RATIO * total:
+                self.enabled = False
+                self.cache.clear()
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {'column': self.name, 'hits': self.hits, 'misses': self.misses,
+                'size': len(self.cache), 'ratio': self.hits / total if total else 0.0,
+                'enabled': self.enabled}
+
+
+class FormatPipeline:
+    """
+    Цепочка форматтеров столбца, применяемая к значениям целиком
+    """
+    __slots__ = ('stages', 'memo')
+
+    def __init__(self, stages: Sequence[Formatter] = (), memo: Optional[ValueMemo] = None):
+        self.stages: Tuple[Formatter, ...] = tuple(stages)
+        self.memo = memo
+
+    def __bool__(self) -> bool:
+        return bool(self.stages)
+
+    def __call__(self, value: Any) -> Any:
+        for stage in self.stages:
+            value = stage(value)
+        return value
+
+    def memoized(self, name: str) -> 'FormatPipeline':
+        """memoized
+
+        Цепочка с кэшем результата по значению ячейки для столбца name
+        """
+        if not self.stages:
+            return self
+        return FormatPipeline(self.stages, ValueMemo.create(name))
+
+    def batch(self, values: Sequence[Any]) -> List[Any]:
+        """batch
+
+        Применение цепочки к значениям столбца: каждый форматтер обрабатывает
+        весь набор значений за один вызов, при наличии кэша - только значения,
+        отсутствующие в кэше
+
+        Args:
+            values (Sequence[Any]): значения ячеек
+
+        Returns:
+            List[Any]: результат форматирования в том же порядке
+        """
+        if self.memo is not None:
+            return self.memo.batch(self.compute, values)
+        return self.compute(values)
+
+    def compute(self, values: Sequence[Any]) -> List[Any]:
+        values = list(values)
+        record = costs.record
+        for stage in self.stages:
+            started = perf_counter()
+            values = stage.batch(values)
+            # время форматтера учитывается по выражению из options
+            record((stage.NAME, stage.options[0]), len(values), perf_counter() - started)
+        return values
+
+    def __getstate__(self):
+        # содержимое кэша не передается, в другом процессе кэш создается заново
+        return self.stages, self.memo.name if self.memo is not None else None
+
+    def __setstate__(self, state):
+        self.stages, name = state
+        self.memo = ValueMemo.create(name) if name is not None else None
+
+    def __repr__(self) -> str:
+        return f'FormatPipeline({list(self.stages)!r})'
+
+
+def compile_formats(formats: Optional[Sequence[Any]]) -> FormatPipeline:
+    """compile_formats
+
+    Компиляция описаний Format в цепочку форматтеров
+
+    Args:
+        formats (Optional[Sequence[Format]]): описания форматирования из схемы
+
+    Raises:
+        ValueError: неизвестный форматтер или некорректное выражение
+
+    Returns:
+        FormatPipeline: цепочка форматтеров
+    """
+    stages = []
+    for fmt in formats or ():
+        try:
+            factory = FORMATTERS[fmt.formatter]
+        except KeyError:
+            raise ValueError(f'Неизвестный форматтер {fmt.formatter}')
+        try:
+            if factory is TextParse:
+                stages.append(TextParse(fmt.options, fmt.attribute, fmt.output))
+            else:
+                stages.append(factory(fmt.options, fmt.attribute))
+        except (re.error, IndexError) as e:
+            raise ValueError(f'Ошибка в параметрах форматтера {fmt.formatter}: {e}')
+    return FormatPipeline(stages)
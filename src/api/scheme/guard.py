@@ -0,0 +1,511 @@
+from typing import Any, Callable, Dict, Hashable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import re
+
+import sys
+
+import time
+
+import threading
+
+from functools import lru_cache
+
+from cachetools import LRUCache
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # pragma: no cover - Python < 3.11
+    import sre_parse
+
+(ANY, ASSERT, ASSERT_NOT, AT, BRANCH, CATEGORY, IN, LITERAL, MAX_REPEAT, MAXREPEAT,
+ MIN_REPEAT, NEGATE, NOT_LITERAL, RANGE, SUBPATTERN, SRE_FLAG_IGNORECASE) = (
+    getattr(sre_parse, name) for name in (
+        'ANY', 'ASSERT', 'ASSERT_NOT', 'AT', 'BRANCH', 'CATEGORY', 'IN', 'LITERAL', 'MAX_REPEAT',
+        'MAXREPEAT', 'MIN_REPEAT', 'NEGATE', 'NOT_LITERAL', 'RANGE', 'SUBPATTERN',
+        'SRE_FLAG_IGNORECASE'))
+
+# конструкции Python 3.11, исключающие возврат внутри группы
+POSSESSIVE_REPEAT = getattr(sre_parse, 'POSSESSIVE_REPEAT', None)
+ATOMIC_GROUP = getattr(sre_parse, 'ATOMIC_GROUP', None)
+REPEATS = tuple(op for op in (MAX_REPEAT, MIN_REPEAT, POSSESSIVE_REPEAT) if op is not None)
+
+# способ применения выражения: match - классификация заголовков,
+# scan - форматтеры (sub, split, search, finditer просматривают всю строку)
+MATCH = 'match'
+SCAN = 'scan'
+
+# длины строк, на которых измеряется время выполнения выражения
+PROBE_SIZES = (16, 64, 256, 1024)
+# окончания строк, на которых выражение не находит совпадения
+PROBE_SUFFIXES = ('\x00', '\n')
+# количество повторных измерений, подтверждающих превышение времени выполнения
+CONFIRM_REPEAT = 3
+# типичное значение ячейки документа
+REPRESENTATIVE = ('Требования к содержанию обязательных требований, '
+                  'установленных нормативными правовыми актами; 01.02.2021')
+
+# наборы символов, по которым выбирается представитель класса
+PREFERRED = 'аa 1.'
+
+Intervals = Tuple[Tuple[int, int], ...]
+
+FULL: Intervals = ((0, sys.maxunicode),)
+EMPTY: Intervals = ()
+
+
+def merge(intervals: Sequence[Tuple[int, int]]) -> Intervals:
+    result: List[List[int]] = []
+    for lo, hi in sorted(intervals):
+        if result and lo <= result[-1][1] + 1:
+            result[-1][1] = max(result[-1][1], hi)
+        else:
+            result.append([lo, hi])
+    return tuple((lo, hi) for lo, hi in result)
+
+
+def complement(intervals: Intervals) -> Intervals:
+    result = []
+    start = 0
+    for lo, hi in intervals:
+        if lo > start:
+            result.append((start, lo - 1))
+        start = hi + 1
+    if start <= sys.maxunicode:
+        result.append((start, sys.maxunicode))
+    return tuple(result)
+
+
+def overlaps(a: Intervals, b: Intervals) -> bool:
+    i = j = 0
+    while i < len(a) and j < len(b):
+        if a[i][1] < b[j][0]:
+            i += 1
+        elif b[j][1] < a[i][0]:
+            j += 1
+        else:
+            return True
+    return False
+
+
+def folded(intervals: Intervals) -> Intervals:
+    """folded
+
+    Дополнение набора символов символами другого регистра (флаг IGNORECASE).
+    Широкие наборы не дополняются, они уже содержат оба регистра.
+    """
+    if sum(hi - lo + 1 for lo, hi in intervals) > 4096:
+        return intervals
+    extra = []
+    for lo, hi in intervals:
+        for code in range(lo, hi + 1):
+            char = chr(code)
+            extra.extend((ord(c), ord(c)) for c in (char.lower(), char.upper()) if len(c) == 1)
+    return merge(list(intervals) + extra)
+
+
+@lru_cache(maxsize=None)
+def category(name: Any) -> Intervals:
+    """category
+
+    Символы класса \\d, \\s, \\w и их отрицаний, вычисляются по базовой плоскости Unicode
+    """
+    negate = 'NOT_' in str(name)
+    base = {'DIGIT': r'\d', 'SPACE': r'\s', 'WORD': r'\w', 'LINEBREAK': r'\n'}
+    escape = next((v for k, v in base.items() if k in str(name)), None)
+    if escape is None:
+        return FULL
+    plane = ''.join(chr(c) for c in range(0x10000) if not 0xD800 <= c <= 0xDFFF)
+    codes = sorted(ord(c) for c in re.findall(escape, plane))
+    intervals = merge([(c, c) for c in codes])
+    if escape == r'\w':
+        # символы вне базовой плоскости считаются буквенными
+        intervals = merge(list(intervals) + [(0x10000, sys.maxunicode)])
+    return complement(intervals) if negate else intervals
+
+
+def charset(items: Sequence[Tuple[Any, Any]], flags: int) -> Intervals:
+    negate = False
+    intervals: List[Tuple[int, int]] = []
+    for op, av in items:
+        if op is NEGATE:
+            negate = True
+        elif op is LITERAL:
+            intervals.append((av, av))
+        elif op is RANGE:
+            intervals.append(av)
+        elif op is CATEGORY:
+            intervals.extend(category(av))
+        else:
+            intervals.extend(FULL)
+    result = merge(intervals)
+    if flags & SRE_FLAG_IGNORECASE:
+        result = folded(result)
+    return complement(result) if negate else result
+
+
+def first(items: Sequence[Tuple[Any, Any]], flags: int) -> Tuple[Intervals, bool]:
+    """first
+
+    Символы, с которых может начинаться совпадение последовательности,
+    и признак совпадения с пустой строкой
+
+    Returns:
+        Tuple[Intervals, bool]: интервалы кодов символов, признак пустого совпадения
+    """
+    found: List[Tuple[int, int]] = []
+    for op, av in items:
+        chars, nullable = first_item(op, av, flags)
+        found.extend(chars)
+        if not nullable:
+            return merge(found), False
+    return merge(found), True
+
+
+def first_item(op: Any, av: Any, flags: int) -> Tuple[Intervals, bool]:
+    if op is LITERAL:
+        chars = ((av, av),)
+        return (folded(chars) if flags & SRE_FLAG_IGNORECASE else chars), False
+    if op is NOT_LITERAL:
+        return complement(((av, av),)), False
+    if op is ANY:
+        return FULL, False
+    if op is IN:
+        return charset(av, flags), False
+    if op in (AT, ASSERT, ASSERT_NOT):
+        return EMPTY, True
+    if op is BRANCH:
+        found: List[Tuple[int, int]] = []
+        nullable = False
+        for branch in av[1]:
+            chars, empty = first(branch, flags)
+            found.extend(chars)
+            nullable = nullable or empty
+        return merge(found), nullable
+    if op is SUBPATTERN:
+        return first(av[-1], (flags | av[1]) & ~av[2])
+    if op is ATOMIC_GROUP:
+        return first(av, flags)
+    if op in REPEATS:
+        chars, nullable = first(av[2], flags)
+        return chars, nullable or av[0] == 0
+    # ссылки на группы и условные конструкции оцениваются по наихудшему случаю
+    return FULL, True
+
+
+def variable_repeat(items: Sequence[Tuple[Any, Any]]) -> bool:
+    """variable_repeat
+
+    Последовательность содержит квантификатор переменной длины с возвратом
+    """
+    for op, av in items:
+        if op in (MAX_REPEAT, MIN_REPEAT):
+            if av[1] > av[0] and av[1] > 1:
+                return True
+            if variable_repeat(av[2]):
+                return True
+        elif op is BRANCH:
+            if any(variable_repeat(b) for b in av[1]):
+                return True
+        elif op is SUBPATTERN:
+            if variable_repeat(av[-1]):
+                return True
+    return False
+
+
+def ambiguous_branch(items: Sequence[Tuple[Any, Any]], flags: int) -> bool:
+    """ambiguous_branch
+
+    Последовательность содержит альтернативу, ветви которой начинаются с общих символов
+    """
+    for op, av in items:
+        if op is BRANCH:
+            starts = [first(b, flags)[0] for b in av[1]]
+            for i, a in enumerate(starts):
+                if any(overlaps(a, b) for b in starts[i + 1:]):
+                    return True
+            if any(ambiguous_branch(b, flags) for b in av[1]):
+                return True
+        elif op is SUBPATTERN:
+            if ambiguous_branch(av[-1], (flags | av[1]) & ~av[2]):
+                return True
+        elif op in (MAX_REPEAT, MIN_REPEAT):
+            if ambiguous_branch(av[2], flags):
+                return True
+    return False
+
+
+def hazards(items: Sequence[Tuple[Any, Any]], flags: int) -> Iterator[str]:
+    """hazards
+
+    Поиск конструкций с экспоненциальным возвратом: повторяемые группы
+    с вложенными квантификаторами или неоднозначными альтернативами
+    """
+    for op, av in items:
+        if op in (MAX_REPEAT, MIN_REPEAT):
+            body = av[2]
+            if av[1] > 1:
+                if variable_repeat(body):
+                    yield ('вложенные квантификаторы: повторяемая группа '
+                           'содержит квантификатор переменной длины')
+                    continue
+                if ambiguous_branch(body, flags):
+                    yield ('неоднозначная альтернатива в повторяемой группе: '
+                           'альтернативы начинаются с общих символов')
+                    continue
+            yield from hazards(body, flags)
+        elif op is BRANCH:
+            for branch in av[1]:
+                yield from hazards(branch, flags)
+        elif op is SUBPATTERN:
+            yield from hazards(av[-1], (flags | av[1]) & ~av[2])
+        # атомарные группы и захватывающие квантификаторы не допускают возврата
+
+
+def representative(intervals: Intervals) -> str:
+    for char in PREFERRED:
+        if overlaps(intervals, ((ord(char), ord(char)),)):
+            return char
+    for lo, hi in intervals:
+        if not 0xD800 <= lo <= 0xDFFF:
+            return chr(lo)
+    return 'а'
+
+
+def sample(items: Sequence[Tuple[Any, Any]], flags: int, size: int,
+           pumps: List[str]) -> str:
+    """sample
+
+    Строка, проходящая по выражению: квантификаторы верхнего уровня повторяются
+    size раз (при size=0 - минимальное количество раз), символы повторяемых
+    групп собираются в pumps
+    """
+    parts = []
+    for op, av in items:
+        if op in (LITERAL, NOT_LITERAL, ANY, IN):
+            parts.append(representative(first_item(op, av, flags)[0]))
+        elif op is BRANCH:
+            parts.append(sample(av[1][0], flags, size, pumps))
+        elif op is SUBPATTERN:
+            parts.append(sample(av[-1], (flags | av[1]) & ~av[2], size, pumps))
+        elif op is ATOMIC_GROUP:
+            parts.append(sample(av, flags, size, pumps))
+        elif op in REPEATS:
+            low, high, body = av
+            count = low
+            if size and high > 1:
+                count = max(low, min(size, high if high != MAXREPEAT else size))
+                pumps.append(representative(first(body, flags)[0]))
+            parts.append(sample(body, flags, 0, pumps) * count)
+    return ''.join(parts)
+
+
+def prefix(items: Sequence[Tuple[Any, Any]], flags: int) -> str:
+    """prefix
+
+    Минимальная строка до первого повторяемого элемента верхнего уровня
+    """
+    for pos, (op, av) in enumerate(items):
+        if op in REPEATS and av[1] > 1:
+            return sample(items[:pos], flags, 0, [])
+    return ''
+
+
+def probes(regex: str, size: int, samples: Sequence[str] = ()) -> List[str]:
+    """probes
+
+    Строки для измерения времени выполнения выражения: типичные значения
+    и строки, на которых выражение ищет совпадение с возвратом и не находит его
+
+    Args:
+        regex (str): регулярное выражение
+        size (int): длина повторяемой части
+        samples (Sequence[str], optional): типичные значения. Defaults to ().
+    """
+    parsed = sre_parse.parse(regex)
+    flags = parsed.state.flags
+    pumps: List[str] = []
+    pumped = sample(parsed, flags, size, pumps)
+    start = prefix(parsed, flags)
+    result = [REPRESENTATIVE, sample(parsed, flags, 0, []), *samples]
+    for suffix in PROBE_SUFFIXES:
+        result.append(pumped + suffix)
+        for char in dict.fromkeys(pumps):
+            result.append(char * size + suffix)
+            if start:
+                result.append(start + char * size + suffix)
+    return result
+
+
+def evaluator(pattern: re.Pattern, mode: str):
+    if mode == MATCH:
+        return pattern.match
+    finditer = pattern.finditer
+    return lambda value: sum(1 for _ in finditer(value))
+
+
+class RegexReport(NamedTuple):
+    """
+    Результат проверки выражения: найденные проблемы, наибольшее время
+    выполнения и длина строки, на которой оно получено
+    """
+    regex: str
+    issues: Tuple[str, ...]
+    seconds: float
+    length: int
+
+    @property
+    def accepted(self) -> bool:
+        return not self.issues
+
+
+@lru_cache(maxsize=2048)
+def structure(regex: str) -> Tuple[str, ...]:
+    """structure
+
+    Проверка выражения без выполнения: ошибки компиляции, вложенные квантификаторы
+    и неоднозначные альтернативы в повторяемых группах. Результат не зависит
+    от времени выполнения и сохраняется в кэше.
+
+    Returns:
+        Tuple[str, ...]: найденные проблемы
+    """
+    try:
+        re.compile(regex)
+        parsed = sre_parse.parse(regex)
+    except re.error as e:
+        return (f'некорректное выражение: {e}',)
+    return tuple(dict.fromkeys(hazards(parsed, parsed.state.flags)))
+
+
+def elapsed(evaluate: Callable[[str], Any], probe: str, repeat: int = 1) -> float:
+    """elapsed
+
+    Наименьшее из repeat измерений времени выполнения выражения на строке
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        evaluate(probe)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def inspect(regex: str, mode: str = MATCH, budget: float = 0.05,
+            samples: Tuple[str, ...] = ()) -> RegexReport:
+    """inspect
+
+    Проверка выражения перед сохранением схемы. Выражения с вложенными
+    квантификаторами и неоднозначными альтернативами в повторяемых группах
+    не выполняются. Остальные выполняются на строках возрастающей длины,
+    пока время одного вызова не превысит budget. Превышение подтверждается
+    повторными измерениями, чтобы пауза сборщика мусора или соседнего процесса
+    не отклонила выражение; время выполнения не кэшируется.
+
+    Args:
+        regex (str): регулярное выражение
+        mode (str, optional): способ применения, match или scan. Defaults to match.
+        budget (float, optional): допустимое время одного вызова, сек. Defaults to 0.05.
+        samples (Tuple[str, ...], optional): типичные значения. Defaults to ().
+
+    Returns:
+        RegexReport: результат проверки
+    """
+    issues = structure(regex)
+    if issues:
+        return RegexReport(regex, issues, 0.0, 0)
+    evaluate = evaluator(re.compile(regex), mode)
+    worst, length = 0.0, 0
+    for size in PROBE_SIZES:
+        for probe in probes(regex, size, samples):
+            seconds = elapsed(evaluate, probe)
+            if seconds > budget:
+                seconds = elapsed(evaluate, probe, CONFIRM_REPEAT)
+            if seconds > worst:
+                worst, length = seconds, len(probe)
+            if worst > budget:
+                # строки большей длины не проверяются
+                return RegexReport(regex, (
+                    f'время выполнения {worst * 1e3:.1f} мс на строке длиной {length} '
+                    f'превышает {budget * 1e3:.1f} мс',), worst, length)
+    return RegexReport(regex, (), worst, length)
+
+
+# границы гистограммы времени выполнения выражения на одно значение, сек.
+COST_BUCKETS = (1e-6, 1e-5, 1e-4, 1e-3, 1e-2, 1e-1)
+
+
+class RegexCost:
+    """
+    Накопленное время выполнения выражения: количество вызовов и значений,
+    суммарное и наибольшее время на значение, гистограмма времени на значение
+    """
+    __slots__ = ('calls', 'values', 'seconds', 'worst', 'buckets')
+
+    def __init__(self):
+        self.calls = 0
+        self.values = 0
+        self.seconds = 0.0
+        self.worst = 0.0
+        self.buckets = [0] * (len(COST_BUCKETS) + 1)
+
+    def add(self, values: int, seconds: float) -> None:
+        self.calls += 1
+        self.values += values
+        self.seconds += seconds
+        each = seconds / values if values else seconds
+        if each > self.worst:
+            self.worst = each
+        self.buckets[next((i for i, b in enumerate(COST_BUCKETS) if each <= b),
+                          len(COST_BUCKETS))] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'calls': self.calls,
+            'values': self.values,
+            'seconds': self.seconds,
+            'mean': self.seconds / self.values if self.values else 0.0,
+            'worst': self.worst,
+            'buckets': dict(zip([*map(str, COST_BUCKETS), '+Inf'], self.buckets)),
+        }
+
+
+class RegexCosts:
+    """
+    Учет времени выполнения выражений схем во время работы сервиса
+
+    Ключ - наименование схемы для классификатора заголовков
+    или пара (форматтер, выражение) для форматтеров. Количество ключей ограничено:
+    выражения задаются пользователями, давно не выполнявшиеся вытесняются.
+
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self.costs: LRUCache = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    def record(self, key: Hashable, values: int, seconds: float) -> None:
+        with self._lock:
+            cost = self.costs.get(key)
+            if cost is None:
+                cost = self.costs[key] = RegexCost()
+            cost.add(values, seconds)
+
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            cost = self.costs.get(key)
+            return cost.stats() if cost else None
+
+    def items(self) -> List[Tuple[Hashable, Dict[str, Any]]]:
+        with self._lock:
+            return [(key, cost.stats()) for key, cost in self.costs.items()]
+
+    def clear(self) -> None:
+        with self._lock:
+            self.costs.clear()
+
+
+# время выполнения выражений в текущем процессе
+costs = RegexCosts()
+
+
+__all__ = ['MATCH', 'SCAN', 'RegexReport', 'RegexCosts', 'inspect', 'structure', 'costs']
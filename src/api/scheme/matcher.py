@@ -0,0 +1,96 @@
+from typing import Any, Dict, List, Optional, Pattern, Sequence, Tuple
+
+import re
+
+# глобальные флаги в начале выражения, например (?i)
+GLOBAL_FLAGS = re.compile(r'^\(\?([aiLmsux]+)\)')
+# конструкции, зависящие от нумерации групп, не допускают объединения выражений
+GROUP_REFERENCES = re.compile(r'\\[1-9]|\(\?P=|\(\?\(')
+
+
+def scoped(regex: str) -> str:
+    """scoped
+
+    Перенос глобальных флагов выражения в локальную группу (?flags:...),
+    чтобы выражение можно было использовать как альтернативу в составе другого
+
+    Args:
+        regex (str): регулярное выражение
+
+    Returns:
+        str: выражение с флагами, действующими только внутри группы
+    """
+    flags = ''
+    while True:
+        m = GLOBAL_FLAGS.match(regex)
+        if not m:
+            break
+        flags += m.group(1)
+        regex = regex[m.end():]
+    if flags:
+        return f'(?{flags}:{regex})'
+    return f'(?:{regex})'
+
+
+class HeaderMatcher:
+    """
+    Скомпилированный классификатор заголовков столбцов
+
+    Выражения столбцов объединяются в одну альтернативу с именованными группами,
+    поэтому каждый заголовок классифицируется одним вызовом match. Порядок альтернатив
+    совпадает с порядком столбцов, что сохраняет правило "первый подходящий столбец".
+    Если выражения нельзя объединить, используется последовательная проверка
+    предварительно скомпилированных выражений.
+
+    """
+    __slots__ = ('patterns', 'combined', 'groups')
+
+    def __init__(self, regexes: Sequence[str]):
+        self.patterns: Tuple[Pattern, ...] = tuple(re.compile(r) for r in regexes)
+        self.combined: Optional[Pattern] = None
+        self.groups: Dict[int, int] = {}
+        if self.patterns and not any(GROUP_REFERENCES.search(r) for r in regexes):
+            try:
+                combined = re.compile('|'.join(
+                    f'(?P<c{pos}>{scoped(r)})' for pos, r in enumerate(regexes)))
+            except re.error:
+                pass
+            else:
+                self.combined = combined
+                self.groups = {
+                    combined.groupindex[f'c{pos}']: pos
+                    for pos in range(len(regexes))
+                }
+
+    def match(self, value: Any) -> int:
+        """match
+
+        Поиск столбца, которому соответствует заголовок
+
+        Args:
+            value (Any): значение ячейки заголовка
+
+        Returns:
+            int: позиция столбца в схеме или -1, если совпадение не найдено
+        """
+        if self.combined is not None:
+            m = self.combined.match(value)
+            return self.groups[m.lastindex] if m else -1
+        for pos, pattern in enumerate(self.patterns):
+            if pattern.match(value):
+                return pos
+        return -1
+
+    def classify(self, source: Sequence[Any]) -> List[int]:
+        """classify
+
+        Классификация строки заголовка за один проход
+
+        Args:
+            source (Sequence[Any]): ячейки строки заголовка
+
+        Returns:
+            List[int]: позиции столбцов схемы для каждой ячейки (-1 при отсутствии совпадения)
+        """
+        match = self.match
+        return [match(value) for value in source]
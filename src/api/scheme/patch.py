@@ -0,0 +1,135 @@
+from typing import Any, Dict, List, Sequence, Tuple
+
+import copy
+
+OPERATIONS = ('add', 'remove', 'replace', 'move', 'copy', 'test')
+
+
+def pointer(path: str) -> List[str]:
+    """pointer
+
+    Разбор указателя JSON Pointer (RFC 6901) на сегменты
+
+    Raises:
+        ValueError: некорректный указатель
+    """
+    if path == '':
+        return []
+    if not path.startswith('/'):
+        raise ValueError(f'Некорректный путь {path}')
+    return [p.replace('~1', '/').replace('~0', '~') for p in path[1:].split('/')]
+
+
+def resolve(document: Any, path: str) -> Tuple[Any, Any]:
+    """resolve
+
+    Поиск родительского элемента и ключа для указателя
+
+    Raises:
+        ValueError: путь не найден
+
+    Returns:
+        Tuple[Any, Any]: родительский словарь или список и ключ (индекс) в нем
+    """
+    parts = pointer(path)
+    if not parts:
+        raise ValueError('Операция над корнем элемента не поддерживается')
+    parent = document
+    for part in parts[:-1]:
+        parent = child(parent, part)
+    key: Any = parts[-1]
+    if isinstance(parent, list):
+        if key != '-':
+            key = index(parent, key, extend=True)
+    elif not isinstance(parent, dict):
+        raise ValueError(f'Путь {path} не найден')
+    return parent, key
+
+
+def index(items: List[Any], key: str, extend: bool = False) -> int:
+    try:
+        idx = int(key)
+    except ValueError:
+        raise ValueError(f'Некорректный индекс {key}')
+    if idx < 0 or idx > len(items) or (idx == len(items) and not extend):
+        raise ValueError(f'Индекс {key} вне массива')
+    return idx
+
+
+def child(parent: Any, part: str) -> Any:
+    if isinstance(parent, dict):
+        if part not in parent:
+            raise ValueError(f'Атрибут {part} не найден')
+        return parent[part]
+    if isinstance(parent, list):
+        return parent[index(parent, part)]
+    raise ValueError(f'Атрибут {part} не найден')
+
+
+def get(document: Any, path: str) -> Any:
+    value = document
+    for part in pointer(path):
+        value = child(value, part)
+    return value
+
+
+def add(document: Any, path: str, value: Any) -> None:
+    parent, key = resolve(document, path)
+    if isinstance(parent, list):
+        parent.insert(len(parent) if key == '-' else key, value)
+    else:
+        parent[key] = value
+
+
+def remove(document: Any, path: str) -> Any:
+    parent, key = resolve(document, path)
+    if isinstance(parent, list):
+        if key == '-' or key >= len(parent):
+            raise ValueError(f'Путь {path} не найден')
+        return parent.pop(key)
+    if key not in parent:
+        raise ValueError(f'Путь {path} не найден')
+    return parent.pop(key)
+
+
+def apply_patch(document: Dict[str, Any], operations: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """apply_patch
+
+    Применение операций JSON Patch (RFC 6902) к копии документа.
+    Операции применяются последовательно, при ошибке документ не изменяется.
+
+    Args:
+        document (Dict[str, Any]): исходный документ
+        operations (Sequence[Dict[str, Any]]): операции op/path/value/from
+
+    Raises:
+        ValueError: неизвестная операция, путь не найден или не выполнено условие test
+
+    Returns:
+        Dict[str, Any]: измененный документ
+    """
+    document = copy.deepcopy(document)
+    for operation in operations:
+        op, path = operation.get('op'), operation.get('path')
+        if op not in OPERATIONS or path is None:
+            raise ValueError(f'Некорректная операция {operation}')
+        if op == 'add':
+            add(document, path, copy.deepcopy(operation.get('value')))
+        elif op == 'remove':
+            remove(document, path)
+        elif op == 'replace':
+            remove(document, path)
+            add(document, path, copy.deepcopy(operation.get('value')))
+        elif op in ('move', 'copy'):
+            source = operation.get('from')
+            if source is None:
+                raise ValueError(f'Не указан атрибут from операции {op}')
+            value = remove(document, source) if op == 'move' else copy.deepcopy(get(document, source))
+            add(document, path, value)
+        elif op == 'test':
+            if get(document, path) != operation.get('value'):
+                raise ValueError(f'Значение {path} не соответствует условию')
+    return document
+
+
+__all__ = ['apply_patch']
@@ -0,0 +1,168 @@
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from collections import Counter
+
+from time import perf_counter
+
+from src.api.scheme.matcher import HeaderMatcher
+from src.api.scheme.formatters import FormatPipeline, compile_formats
+from src.api.scheme.guard import MATCH, costs
+
+
+class ColumnPlan:
+    """
+    Скомпилированное описание столбца: выражение, признак необязательности,
+    цепочки форматирования и сериализованное описание для ответов
+    """
+    __slots__ = ('position', 'source', 'name', 'optional', 'regex', 'document', 'database',
+                 'combined', 'payload')
+
+    def __init__(self, position: int, column: Any):
+        self.position = position
+        # модель столбца, по которой построено описание
+        self.source = column
+        self.name: str = column.name
+        self.optional: bool = column.document.optional
+        self.regex: str = column.document.regex
+        self.document: FormatPipeline = compile_formats(column.document.format).memoized(self.name)
+        self.database: FormatPipeline = compile_formats(
+            column.database.format if column.database else None).memoized(self.name)
+        # Document.format и Database.format одной цепочкой с общим кэшем для загрузки в БД
+        self.combined: FormatPipeline = self.document
+        if self.database:
+            self.combined = FormatPipeline(
+                self.document.stages + self.database.stages).memoized(self.name)
+        self.payload: Dict[str, Any] = column.dict()
+
+    def moved(self, position: int) -> 'ColumnPlan':
+        """moved
+
+        Копия описания для другой позиции столбца без повторной компиляции
+        """
+        if position == self.position:
+            return self
+        plan = object.__new__(ColumnPlan)
+        for slot in ColumnPlan.__slots__:
+            setattr(plan, slot, getattr(self, slot))
+        plan.position = position
+        return plan
+
+    def describe(self, index: int) -> Dict[str, Any]:
+        """describe
+
+        Описание столбца с позицией заголовка в документе, модель столбца не изменяется
+        """
+        payload = dict(self.payload)
+        payload['document'] = {**payload['document'], 'index': index}
+        return payload
+
+
+class MatchResult(NamedTuple):
+    """
+    Результат проверки заголовков по схеме
+
+    positions - позиция столбца схемы для каждого заголовка (-1, если не найден),
+    indexes - номер заголовка (с 1) для каждого столбца схемы (0, если не найден)
+    """
+    scheme: str
+    positions: Tuple[int, ...]
+    indexes: Tuple[int, ...]
+    missing_required: Tuple[str, ...]
+    missing_optional: Tuple[str, ...]
+
+    @property
+    def matched(self) -> int:
+        return sum(1 for pos in self.positions if pos >= 0)
+
+    @property
+    def complete(self) -> bool:
+        """
+        Все заголовки соответствуют столбцам схемы
+        """
+        return self.matched == len(self.positions)
+
+    @property
+    def duplicates(self) -> List[int]:
+        """
+        Позиции столбцов схемы, которым соответствуют несколько заголовков
+        """
+        return [pos for pos, count in Counter(p for p in self.positions if p >= 0).items()
+                if count > 1]
+
+
+class SchemePlan:
+    """
+    Неизменяемый скомпилированный план схемы
+
+    Строится один раз для модели Workbook и разделяется запросами:
+    проверка заголовков возвращает отдельный результат MatchResult
+    и не изменяет модели схемы. При построении по измененной схеме
+    описания неизмененных столбцов берутся из предыдущего плана.
+
+    """
+    __slots__ = ('name', 'columns', 'matcher', 'formatters')
+
+    def __init__(self, workbook: Any, previous: Optional['SchemePlan'] = None):
+        self.name: str = workbook.name
+        # модели неизмененных столбцов разделяются новой и прежней схемой
+        reuse = {id(c.source): c for c in previous.columns} if previous else {}
+        columns = []
+        for pos, column in enumerate(workbook.columns):
+            compiled = reuse.get(id(column))
+            if compiled is not None and compiled.source is column:
+                columns.append(compiled.moved(pos))
+            else:
+                columns.append(ColumnPlan(pos, column))
+        self.columns: Tuple[ColumnPlan, ...] = tuple(columns)
+        self.matcher = HeaderMatcher([c.regex for c in self.columns])
+        self.formatters: Dict[str, Tuple[FormatPipeline, FormatPipeline]] = {
+            c.name: (c.document, c.database) for c in self.columns
+        }
+
+    def verify(self, source: Sequence[Any]) -> MatchResult:
+        """verify
+
+        Проверка наличия в заголовке наименований столбцов
+
+        Args:
+            source (Sequence[Any]): строка с ячейками заголовка
+
+        Returns:
+            MatchResult: результат проверки
+        """
+        started = perf_counter()
+        positions = tuple(self.matcher.classify(source))
+        costs.record((MATCH, self.name), len(positions), perf_counter() - started)
+        indexes = [0] * len(self.columns)
+        for idx, pos in enumerate(positions, start=1):
+            if pos >= 0:
+                indexes[pos] = idx
+        return MatchResult(
+            self.name, positions, tuple(indexes),
+            tuple(c.name for c in self.columns if not indexes[c.position] and not c.optional),
+            tuple(c.name for c in self.columns if not indexes[c.position] and c.optional))
+
+    def describe(self, result: MatchResult) -> List[Dict[str, Any]]:
+        """describe
+
+        Описания найденных столбцов в порядке заголовков документа
+        """
+        columns = self.columns
+        return [columns[pos].describe(idx)
+                for idx, pos in enumerate(result.positions, start=1) if pos >= 0]
+
+    def format_cache(self) -> List[Dict[str, Any]]:
+        """format_cache
+
+        Статистика кэшей цепочек форматирования по столбцам:
+        chain - document (Document.format), database (Database.format)
+        или combined (Document.format и Database.format при загрузке в БД)
+        """
+        return [{'chain': chain, **pipeline.memo.stats()}
+                for c in self.columns
+                for chain, pipeline in (('document', c.document), ('database', c.database),
+                                        ('combined', c.combined))
+                if pipeline.memo is not None and (chain != 'combined' or c.database)]
+
+
+__all__ = ['ColumnPlan', 'MatchResult', 'SchemePlan']
@@ -1,12 +1,23 @@
-from typing import List, Optional, Union, Tuple, Any, Dict
+from typing import List, Optional, Union, Tuple, Any, Dict, Sequence, Callable
 
-import re
+import time
+
+import asyncio
 
 from collections import Counter
 
-from pydantic import BaseModel, root_validator
+from pydantic import BaseModel, PrivateAttr, root_validator
 
 from src.api.handler import SchemeHandler
+from src.api.exceptions import (SchemeNameMismatch, SchemeNotFound, SchemeRegexRejected,
+                                SchemeVersionConflict)
+from src.api.registry import Encoded
+from src.api.scheme.matcher import HeaderMatcher
+from src.api.scheme.formatters import FormatPipeline
+from src.api.scheme.guard import MATCH, SCAN, RegexReport, costs, inspect
+from src.api.scheme.plan import MatchResult, SchemePlan
+from src.api.scheme.patch import apply_patch
+from src.api.scheme.classifier import Candidate, SchemeClassifier
 
 
 class Format(BaseModel):
@@ -32,6 +43,7 @@ class Mapping(BaseModel):
     """
     Описание соответствия значение <-> код
     """
+    source: Optional[str]
     input: str
     link: str
     output: str
@@ -71,6 +83,90 @@ class Workbook(BaseModel):
     header: Optional[List[HeaderAttribute]]
     columns: List[Column]
 
+    _plan: Optional[SchemePlan] = PrivateAttr(default=None)
+
+    @property
+    def plan(self) -> SchemePlan:
+        """
+        Скомпилированный план схемы, строится один раз для набора столбцов
+        """
+        if self._plan is None:
+            self._plan = SchemePlan(self)
+        return self._plan
+
+    @property
+    def matcher(self) -> HeaderMatcher:
+        """
+        Скомпилированный классификатор заголовков
+        """
+        return self.plan.matcher
+
+    @property
+    def formatters(self) -> Dict[str, Tuple[FormatPipeline, FormatPipeline]]:
+        """
+        Скомпилированные цепочки форматирования столбцов: (Document.format, Database.format)
+        """
+        return self.plan.formatters
+
+    def format_columns(self, columns: Dict[str, Sequence[Any]],
+                       database: bool = False) -> Dict[str, List[Any]]:
+        """
+        format_columns
+
+        Форматирование значений столбцов цепочками из схемы
+
+        Args:
+            columns (Dict[str, Sequence[Any]]): значения ячеек по наименованиям столбцов
+            database (bool, optional): применить также Database.format. Defaults to False.
+
+        Raises:
+            ValueError: столбец отсутствует в схеме
+
+        Returns:
+            Dict[str, List[Any]]: отформатированные значения по наименованиям столбцов
+        """
+        formatters = self.formatters
+        output = {}
+        for name, values in columns.items():
+            try:
+                document, db = formatters[name]
+            except KeyError:
+                raise ValueError(f'Столбец {name} не описан в схеме')
+            values = document.batch(values)
+            if database and db:
+                values = db.batch(values)
+            output[name] = values
+        return output
+
+    def map_columns(self, columns: Dict[str, Sequence[Any]],
+                    catalogues: Any) -> Dict[str, Dict[str, List[Any]]]:
+        """
+        map_columns
+
+        Сопоставление значений столбцов записям справочников по описаниям Mapping
+
+        Args:
+            columns (Dict[str, Sequence[Any]]): значения ячеек по наименованиям столбцов
+            catalogues (CatalogueSet): справочники
+
+        Raises:
+            ValueError: столбец отсутствует в схеме
+
+        Returns:
+            Dict[str, Dict[str, List[Any]]]: результат по наименованиям столбцов и ссылкам
+        """
+        described = {c.name: c for c in self.columns}
+        output = {}
+        for name, values in columns.items():
+            try:
+                column = described[name]
+            except KeyError:
+                raise ValueError(f'Столбец {name} не описан в схеме')
+            output[name] = {
+                m.link: catalogues.resolve(m, values, name)
+                for m in column.mapping or ()
+            }
+        return output
 
     def update_column(self, name: str, value: dict):
         """
@@ -85,13 +181,120 @@ class Workbook(BaseModel):
         """
         # поиск в массиве по name или index
         try:
-            column = next(c for c in self.columns if c.name == name)
+            idx, column = next((idx, c) for idx, c in enumerate(self.columns)
+                               if c.name == name)
         except StopIteration:
             raise ValueError('Не найдена запись для обновления')
         else:
-            column.dict().update(value)
+            self.columns[idx] = Column(**{**column.dict(), **value})
+            self._plan = None
             return self
 
+    def with_column(self, name: str, column: Optional[Column]) -> 'Workbook':
+        """
+        with_column
+
+        Новая схема с замененным, добавленным (если столбца нет) или удаленным (column=None)
+        столбцом. Остальные столбцы и их скомпилированные описания разделяются с исходной схемой,
+        компилируется только измененный столбец
+
+        Args:
+            name (str): наименование столбца
+            column (Optional[Column]): новое описание столбца
+
+        Raises:
+            ValueError: столбец для удаления не найден или наименование уже используется
+
+        Returns:
+            Workbook: новая схема
+        """
+        columns = list(self.columns)
+        idx = next((idx for idx, c in enumerate(columns) if c.name == name), None)
+        if column is None:
+            if idx is None:
+                raise ValueError('Не найдена запись для удаления')
+            columns.pop(idx)
+        else:
+            if any(c.name == column.name for pos, c in enumerate(columns) if pos != idx):
+                raise ValueError(f'Столбец {column.name} уже описан в схеме')
+            if idx is None:
+                columns.append(column)
+            else:
+                columns[idx] = column
+        workbook = self.copy(update={'columns': columns})
+        workbook._plan = SchemePlan(workbook, previous=self.plan)
+        return workbook
+
+    def patch_column(self, name: str, operations: Sequence[Dict[str, Any]]) -> 'Workbook':
+        """
+        patch_column
+
+        Новая схема с применением операций JSON Patch к описанию столбца
+
+        Args:
+            name (str): наименование столбца
+            operations (Sequence[Dict[str, Any]]): операции op/path/value/from, пути
+                указываются относительно столбца, например /document/regex
+
+        Raises:
+            ValueError: столбец не найден, операция не применима или описание некорректно
+
+        Returns:
+            Workbook: новая схема
+        """
+        column = next((c for c in self.columns if c.name == name), None)
+        if column is None:
+            raise ValueError('Не найдена запись для обновления')
+        return self.with_column(name, Column(**apply_patch(column.dict(), operations)))
+
+    def patch_attribute(self, name: str, operations: Sequence[Dict[str, Any]]) -> 'Workbook':
+        """
+        patch_attribute
+
+        Новая схема с применением операций JSON Patch к атрибуту заголовка
+
+        Raises:
+            ValueError: атрибут не найден, операция не применима или описание некорректно
+
+        Returns:
+            Workbook: новая схема
+        """
+        attribute = next((h for h in self.header or () if h.name == name), None)
+        if attribute is None:
+            raise ValueError('Не найдена запись для обновления')
+        return self.with_attribute(
+            name, HeaderAttribute(**apply_patch(attribute.dict(), operations)))
+
+    def with_attribute(self, name: str, attribute: Optional[HeaderAttribute]) -> 'Workbook':
+        """
+        with_attribute
+
+        Новая схема с замененным, добавленным или удаленным (attribute=None) атрибутом заголовка.
+        Атрибуты заголовка не участвуют в проверке столбцов, скомпилированный план сохраняется
+
+        Raises:
+            ValueError: атрибут для удаления не найден или наименование уже используется
+
+        Returns:
+            Workbook: новая схема
+        """
+        header = list(self.header or [])
+        idx = next((idx for idx, h in enumerate(header) if h.name == name), None)
+        if attribute is None:
+            if idx is None:
+                raise ValueError('Не найдена запись для удаления')
+            header.pop(idx)
+        else:
+            if any(h.name == attribute.name for pos, h in enumerate(header) if pos != idx):
+                raise ValueError(f'Атрибут {attribute.name} уже описан в схеме')
+            if idx is None:
+                header.append(attribute)
+            else:
+                header[idx] = attribute
+        workbook = self.copy(update={'header': header})
+        workbook._plan = self._plan
+        return workbook
+
     def delete_column(self, name: str):
         """
 
@@ -110,6 +313,7 @@ class Workbook(BaseModel):
             raise ValueError('Не найдена запись для удаления')
         else:
             self.columns.pop(idx)
+            self._plan = None
         return self
 
     def add_column(self, name: str, value: dict):
@@ -119,6 +323,7 @@ class Workbook(BaseModel):
             raise ValueError('Ошибка изменения записи')
         else:
             self.columns.append(column)
+            self._plan = None
 
     def delete_attribute(self, name:str):
         """
@@ -143,6 +348,101 @@ class Workbook(BaseModel):
 
 
 
+    def regexes(self) -> List[Tuple[str, str, Optional[str], str]]:
+        """regexes
+
+        Выражения схемы: выражения заголовков столбцов и выражения форматтеров
+
+        Returns:
+            List[Tuple[str, str, Optional[str], str]]: столбец, расположение
+                (document.regex, document.format, database.format), форматтер, выражение
+        """
+        result = []
+        for column in self.columns:
+            result.append((column.name, 'document.regex', None, column.document.regex))
+            for location, formats in (('document.format', column.document.format),
+                                      ('database.format', column.database.format
+                                       if column.database else None)):
+                for fmt in formats or ():
+                    if fmt.options:
+                        result.append((column.name, location, fmt.formatter, fmt.options[0]))
+        return result
+
+    def inspect_regexes(self, budget: float = 0.05,
+                        known: Sequence[Tuple[str, Optional[str], str]] = ()
+                        ) -> List[Tuple[str, str, Optional[str], RegexReport]]:
+        """inspect_regexes
+
+        Проверка выражений схемы на экспоненциальный возврат и время выполнения.
+        Выражения заголовков проверяются как match, выражения форматтеров - по всей строке
+
+        Args:
+            budget (float, optional): допустимое время одного вызова, сек. Defaults to 0.05.
+            known (Sequence, optional): ранее проверенные выражения
+                (расположение, форматтер, выражение), которые не проверяются повторно
+
+        Returns:
+            List[Tuple[str, str, Optional[str], RegexReport]]: столбец, расположение,
+                форматтер и результат проверки
+        """
+        known = set(known)
+        result = []
+        for column, location, formatter, regex in self.regexes():
+            if (location, formatter, regex) in known:
+                continue
+            if formatter is None:
+                report = inspect(regex, MATCH, budget, (column,))
+            else:
+                report = inspect(regex, SCAN, budget)
+            result.append((column, location, formatter, report))
+        return result
+
+    def regex_report(self, budget: float = 0.05) -> Dict[str, Any]:
+        """regex_report
+
+        Результат проверки выражений схемы и время их выполнения в текущем процессе:
+        классификатор заголовков учитывается по схеме, форматтеры - по выражению
+        """
+        return {
+            'scheme': self.name,
+            'matcher': costs.get((MATCH, self.name)),
+            'regexes': [{
+                'column': column,
+                'location': location,
+                'formatter': formatter,
+                'regex': report.regex,
+                'accepted': report.accepted,
+                'issues': list(report.issues),
+                'seconds': report.seconds,
+                'length': report.length,
+                'cost': costs.get((formatter, report.regex)) if formatter else None,
+            } for column, location, formatter, report in self.inspect_regexes(budget)],
+            'format_cache': self.format_cache(),
+        }
+
+    def format_cache(self) -> List[Dict[str, Any]]:
+        """format_cache
+
+        Статистика кэшей цепочек форматирования по столбцам в текущем процессе,
+        для схемы без скомпилированного плана - пустой список
+        """
+        return self._plan.format_cache() if self._plan is not None else []
+
+    def verify(self, source: Sequence[Any]) -> MatchResult:
+        """
+        verify
+
+        Проверка наличия в заголовке наименований столбцов по скомпилированному плану.
+        Модели схемы не изменяются, результат возвращается отдельным объектом
+
+        Args:
+            source (Sequence[Any]): строка с ячейками
+
+        Returns:
+            MatchResult: позиции столбцов для заголовков и отсутствующие столбцы
+        """
+        return self.plan.verify(source)
+
     def verify_columns(
         self, source: Tuple[Any, ...]
     ) -> Tuple[Union['Workbook', None], List[Any], List[Any], List[Any]]:
@@ -154,30 +454,23 @@ class Workbook(BaseModel):
             source (tuple): строка с ячейками
 
         Returns:
-            [type]: [description]
+            Tuple: схема (None, если найдены не все заголовки), копии найденных столбцов
+                с позицией заголовка в document.index, отсутствующие обязательные
+                и необязательные столбцы
         """
-        schema = None
+        result = self.verify(source)
         matched = []
-        for idx, value in enumerate(source, start=1):
-            # поиск по совпадению регулярного значения и исходного заголовка. Возвращает None если не найдено значение
-            match:Union[Column, None] = next((c for c in self.columns
-                          if re.match(c.document.regex, value)), None)
-            if match:
-                match.document.index = idx 
-                matched.append(match)
-        missing_required = [
-            c.name for c in self.columns
-            if not c in matched and not c.document.optional
-        ]
-        missing_optional = [
-            c.name for c in self.columns
-            if not c in matched and c.document.optional
-        ]
+        for idx, pos in enumerate(result.positions, start=1):
+            if pos < 0:
+                continue
+            # копия столбца, разделяемая модель схемы не изменяется
+            column: Column = self.columns[pos]
+            matched.append(column.copy(
+                update={'document': column.document.copy(update={'index': idx})}))
         # если количество совпадений соответствует кол-ву аргументов, то считать, что схема найдена
         # в ином случае полагать что, схема документа не описана
-        if len(matched) == len(source):
-            schema = self
-        return schema, matched, missing_required, missing_optional
+        schema = self if result.complete else None
+        return schema, matched, list(result.missing_required), list(result.missing_optional)
 
     def validate_columns(self, schema: Union[str, None], matched: list,
                          missing_required: list, missing_optional: list):
@@ -221,21 +514,390 @@ class Workbook(BaseModel):
         }
         return output
 
+    def validate_match(self, result: MatchResult) -> Dict[str, Any]:
+        """
+        validate_match
+
+        Валидация результата verify с проверкой на дубли, формирует то же описание,
+        что и validate_columns, без копирования моделей столбцов
+
+        Args:
+            result (MatchResult): результат проверки заголовков
+
+        Raises:
+            ValueError: схема не найдена или столбцы дублируются
+
+        Returns:
+            Dict[str, Any]: наименование схемы, найденные и отсутствующие столбцы
+        """
+        if not result.complete:
+            raise ValueError('Схема документа не найдена')
+        duplicates = result.duplicates
+        if duplicates:
+            raise ValueError(
+                'Дублирование столбцов, документ не отвечает требованиям схемы. '
+                f'{[self.columns[pos].name for pos in duplicates]}'
+            )
+        return {
+            'schema': self.name,
+            'columns': self.plan.describe(result),
+            'missing': {
+                'required': list(result.missing_required),
+                'optional': list(result.missing_optional)
+            }
+        }
+
 
 class WorkbookSchemes(SchemeHandler):
 
     SOURCE = 'documents'
 
+    MODEL = Workbook
+
+    CLASSIFIER: Optional[SchemeClassifier] = None
+
+    # проверка выражений при сохранении: reject, flag или off
+    REGEX_POLICY = 'reject'
+    # допустимое время одного вызова выражения при проверке, сек.
+    REGEX_BUDGET = 0.05
+    # ключ подписи снимка реестра, без ключа снимок не сохраняется и не загружается
+    SNAPSHOT_KEY: Optional[bytes] = None
+
+    @classmethod
+    def read(cls) -> List[Workbook]:
+        cls.REGISTRY.refresh()
+        return cls.REGISTRY.all()
+
+    @classmethod
+    def snapshot_filename(cls) -> str:
+        """
+        Файл снимка разобранных и скомпилированных схем, хранится рядом с директорией схем
+        """
+        return f'{cls.PATH}/.{cls.SOURCE}.snapshot'
+
+    @classmethod
+    def warm(cls) -> Dict[str, Any]:
+        """warm
+
+        Подготовка реестра при запуске процесса: загрузка снимка, разбор только
+        измененных файлов, компиляция планов и классификатора. Снимок перезаписывается,
+        если какие-либо файлы пришлось разобрать. Снимок используется, только если
+        задан SNAPSHOT_KEY.
+
+        Returns:
+            Dict[str, Any]: признак использования снимка, количество восстановленных
+                и разобранных схем, длительность подготовки в секундах
+        """
+        started = time.perf_counter()
+        parsed, restored = cls.REGISTRY.parsed, cls.REGISTRY.restored
+        snapshot = cls.REGISTRY.restore(cls.snapshot_filename(), cls.SNAPSHOT_KEY)
+        cls.REGISTRY.refresh()
+        for workbook in cls.REGISTRY.all():
+            workbook.plan
+        cls.classifier()
+        parsed = cls.REGISTRY.parsed - parsed
+        if cls.SNAPSHOT_KEY and (parsed or not snapshot):
+            try:
+                cls.REGISTRY.snapshot(cls.snapshot_filename(), cls.SNAPSHOT_KEY)
+            except OSError:
+                pass
+        return {
+            'snapshot': snapshot,
+            'restored': cls.REGISTRY.restored - restored,
+            'parsed': parsed,
+            'seconds': time.perf_counter() - started,
+        }
+
+    @classmethod
+    def index(cls, fields: Optional[Sequence[str]] = None, cursor: Optional[str] = None,
+              limit: int = 100) -> Tuple[List[Dict[str, Any]], Optional[str], int]:
+        """index
+
+        Список метаданных схем из индекса, модели схем не разбираются
+
+        Raises:
+            ValueError: неизвестный атрибут или некорректный курсор
+        """
+        cls.INDEX.refresh()
+        return cls.INDEX.page(fields, cursor, limit)
+
+    @classmethod
+    def get(cls, name: str) -> Workbook:
+        """get
+
+        Получение схемы по наименованию из реестра
+
+        Raises:
+            SchemeNotFound: схема не найдена
+        """
+        cls.REGISTRY.refresh()
+        return cls.REGISTRY.get(name)
+
+    @classmethod
+    def version(cls) -> int:
+        """version
+
+        Версия реестра после сверки с директорией схем, изменяется при изменении любой схемы
+        """
+        cls.REGISTRY.refresh()
+        return cls.REGISTRY.version
+
+    @classmethod
+    def encoded(cls, name: Optional[str] = None) -> Encoded:
+        """encoded
+
+        Сериализованная схема или список всех схем для ответов HTTP.
+        Представление сохраняется в реестре до изменения схемы.
+
+        Args:
+            name (Optional[str], optional): наименование схемы, None - все схемы. Defaults to None.
+
+        Raises:
+            SchemeNotFound: схема не найдена
+        """
+        cls.REGISTRY.refresh()
+        if name is None:
+            return cls.REGISTRY.encoded()
+        return cls.REGISTRY.entry(name).encoded
+
+    @classmethod
+    def classify(cls, source: Sequence[Any], limit: int = 3) -> List[Candidate]:
+        """classify
+
+        Ранжирование всех известных схем для набора заголовков.
+        Индекс классификатора перестраивается только при изменении реестра.
+
+        Args:
+            source (Sequence[Any]): заголовки
+            limit (int, optional): количество кандидатов. Defaults to 3.
+
+        Returns:
+            List[Candidate]: кандидаты, лучший - первый
+        """
+        cls.REGISTRY.refresh()
+        return cls.classifier().classify(source, limit)
+
+    @classmethod
+    def classify_batch(cls, items: Sequence[Tuple[Sequence[Any], Optional[str]]],
+                       limit: int = 3) -> List[List[Candidate]]:
+        """classify_batch
+
+        Ранжирование схем для нескольких наборов заголовков после одной сверки реестра
+
+        Args:
+            items (Sequence[Tuple[Sequence[Any], Optional[str]]]): заголовки
+                и наименование листа
+            limit (int, optional): количество кандидатов. Defaults to 3.
+
+        Returns:
+            List[List[Candidate]]: кандидаты для каждого набора в исходном порядке
+        """
+        cls.REGISTRY.refresh()
+        return cls.classifier().classify_batch(items, limit)
+
+    @classmethod
+    def classifier(cls) -> SchemeClassifier:
+        classifier = cls.CLASSIFIER
+        if classifier is None or classifier.version != cls.REGISTRY.version:
+            classifier = cls.CLASSIFIER = SchemeClassifier(cls.REGISTRY.all(),
+                                                           cls.REGISTRY.version)
+        return classifier
+
+    @classmethod
+    def update(cls, scheme: str, data: dict, expected: Optional[str] = None) -> int:
+        """update
+
+        Сохранение существующей схемы
+
+        Args:
+            scheme (str): наименование схемы
+            data (dict): данные схемы
+            expected (Optional[str], optional): значение If-Match. Defaults to None.
+
+        Raises:
+            FileNotFoundError: схема не найдена
+            SchemeVersionConflict: схема изменена после получения ETag
+            SchemeNameMismatch: атрибут name не совпадает с наименованием scheme
+
+        Returns:
+            int: новый номер версии схемы
+        """
+        return cls._save(scheme, data, True, expected)
+
+    @classmethod
+    def write(cls, scheme: str, data: dict, expected: Optional[str] = None) -> int:
+        """write
+
+        Сохранение новой или существующей схемы
+
+        Raises:
+            SchemeVersionConflict: схема изменена после получения ETag
+            SchemeNameMismatch: атрибут name не совпадает с наименованием scheme
+
+        Returns:
+            int: новый номер версии схемы
+        """
+        return cls._save(scheme, data, False, expected)
+
+    @classmethod
+    def modify(cls, scheme: str, change: Callable[[Workbook], Workbook],
+               expected: Optional[str] = None, attempts: int = 3) -> int:
+        """modify
+
+        Изменение схемы функцией change над текущей моделью реестра.
+        Без If-Match условием записи служит хэш изменяемой версии: если схему
+        одновременно изменил другой запрос, изменение применяется к новой версии повторно.
+
+        Args:
+            scheme (str): наименование схемы
+            change (Callable[[Workbook], Workbook]): функция, возвращающая новую схему
+            expected (Optional[str], optional): значение If-Match. Defaults to None.
+            attempts (int, optional): количество попыток. Defaults to 3.
+
+        Raises:
+            SchemeNotFound: схема не найдена
+            SchemeVersionConflict: схема изменена после получения ETag
+            ValueError: изменение не применимо к схеме
+
+        Returns:
+            int: новый номер версии схемы
+        """
+        for attempt in range(attempts):
+            cls.REGISTRY.refresh()
+            entry = cls.REGISTRY.entry(scheme)
+            workbook = change(entry.model)
+            try:
+                return cls.save(workbook, expected or f'"{entry.digest}"')
+            except SchemeVersionConflict:
+                if expected or attempt == attempts - 1:
+                    raise
+
+    @classmethod
+    def check(cls, workbook: Workbook) -> List[str]:
+        """check
+
+        Проверка новых и измененных выражений схемы перед сохранением.
+        Выражения, совпадающие с выражениями сохраненной версии схемы, не проверяются.
+        REGEX_POLICY: reject - отклонить сохранение, flag - сохранить схему
+        и вернуть найденные проблемы, off - не проверять
+
+        Raises:
+            SchemeRegexRejected: выражение отклонено (REGEX_POLICY=reject)
+
+        Returns:
+            List[str]: найденные проблемы
+        """
+        if cls.REGEX_POLICY == 'off':
+            return []
+        try:
+            previous = cls.REGISTRY.get(workbook.name)
+        except SchemeNotFound:
+            known = []
+        else:
+            known = [item[1:] for item in previous.regexes()]
+        issues = [
+            f'{column} ({formatter or location}): {issue}'
+            for column, location, formatter, report
+            in workbook.inspect_regexes(cls.REGEX_BUDGET, known)
+            for issue in report.issues
+        ]
+        if issues and cls.REGEX_POLICY == 'reject':
+            raise SchemeRegexRejected('; '.join(issues))
+        return issues
+
+    @classmethod
+    def save(cls, workbook: Workbook, expected: Optional[str] = None) -> int:
+        """save
+
+        Сохранение модели схемы без повторной валидации и компиляции.
+        В файл записываются заданные атрибуты, поэтому модель совпадает
+        с результатом последующего чтения файла
+
+        Raises:
+            SchemeVersionConflict: схема изменена после получения ETag
+
+        Returns:
+            int: новый номер версии схемы
+        """
+        cls.check(workbook)
+        data = workbook.dict(exclude_unset=True)
+        content, version = super().dump(workbook.name, data, True, expected)
+        cls.REGISTRY.store(f'{workbook.name}.json', content.encode('utf8'), workbook)
+        cls.INDEX.update(f'{workbook.name}.json', content.encode('utf8'), data)
+        return version
+
+    @classmethod
+    def _save(cls, scheme: str, data: dict, ensure_exists: bool,
+              expected: Optional[str]) -> int:
+        model = Workbook(**data)
+        if model.name != scheme:
+            # реестр и маршруты определяют файл схемы по атрибуту name
+            raise SchemeNameMismatch(
+                f'Наименование схемы {model.name} не совпадает с адресом {scheme}')
+        cls.check(model)
+        content, version = super().dump(scheme, data, ensure_exists, expected)
+        cls.REGISTRY.store(f'{scheme}.json', content.encode('utf8'), model)
+        cls.INDEX.update(f'{scheme}.json', content.encode('utf8'), data)
+        return version
+
+    # асинхронные варианты: сверка реестра и запись не блокируют цикл событий
+
+    @classmethod
+    async def aread(cls) -> List[Workbook]:
+        await cls.REGISTRY.arefresh()
+        return cls.REGISTRY.all()
+
+    @classmethod
+    async def aget(cls, name: str) -> Workbook:
+        """aget
+
+        Raises:
+            SchemeNotFound: схема не найдена
+        """
+        await cls.REGISTRY.arefresh()
+        return cls.REGISTRY.get(name)
+
+    @classmethod
+    async def aindex(cls, fields: Optional[Sequence[str]] = None, cursor: Optional[str] = None,
+                     limit: int = 100) -> Tuple[List[Dict[str, Any]], Optional[str], int]:
+        return await asyncio.to_thread(cls.index, fields, cursor, limit)
+
+    @classmethod
+    async def aversion(cls) -> int:
+        await cls.REGISTRY.arefresh()
+        return cls.REGISTRY.version
+
+    @classmethod
+    async def aencoded(cls, name: Optional[str] = None) -> Encoded:
+        """aencoded
+
+        Raises:
+            SchemeNotFound: схема не найдена
+        """
+        await cls.REGISTRY.arefresh()
+        if name is None:
+            # сериализация списка выполняется только после изменения реестра
+            return await asyncio.to_thread(cls.REGISTRY.encoded)
+        return cls.REGISTRY.entry(name).encoded
+
+    @classmethod
+    async def aclassify(cls, source: Sequence[Any], limit: int = 3) -> List[Candidate]:
+        await cls.REGISTRY.arefresh()
+        return cls.classifier().classify(source, limit)
+
     @classmethod
-    def read(cls):
-        return [Workbook(**data) for data in super().load()]
+    async def aclassify_batch(cls, items: Sequence[Tuple[Sequence[Any], Optional[str]]],
+                              limit: int = 3) -> List[List[Candidate]]:
+        await cls.REGISTRY.arefresh()
+        # проверка большого количества наборов не блокирует цикл событий
+        return await asyncio.to_thread(cls.classifier().classify_batch, items, limit)
 
     @classmethod
-    def update(cls, scheme: str, data: dict) -> None:
-        return super().dump(scheme, data, ensure_exists=True)
+    async def aupdate(cls, scheme: str, data: dict, expected: Optional[str] = None) -> int:
+        return await asyncio.to_thread(cls.update, scheme, data, expected)
 
     @classmethod
-    def write(cls, scheme: str, data: dict) -> None:
-        return super().dump(scheme, data, ensure_exists=False)
+    async def awrite(cls, scheme: str, data: dict, expected: Optional[str] = None) -> int:
+        return await asyncio.to_thread(cls.write, scheme, data, expected)
 
 __all__ =['WorkbookSchemes', 'Workbook', 'Column', 'HeaderAttribute']
\ No newline at end of file
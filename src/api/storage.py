@@ -0,0 +1,122 @@
+import os
+
+import tempfile
+
+from typing import Optional, Union
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - блокировка недоступна вне POSIX
+    fcntl = None
+
+# ширина записи номера версии, файл версии перезаписывается одной операцией
+VERSION_FORMAT = '{:020d}\n'
+
+
+def current_umask() -> int:
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+# права новых файлов; umask процесса считывается один раз, так как его изменение
+# не является потокобезопасным
+FILE_MODE = 0o666 & ~current_umask()
+
+
+def atomic_write(filename: str, content: Union[str, bytes]) -> None:
+    """atomic_write
+
+    Запись во временный файл в той же директории с заменой целевого файла.
+    Читатели получают либо прежнее, либо новое содержимое целиком.
+    Права доступа целевого файла сохраняются, новый файл создается с правами
+    по umask процесса (mkstemp создает файл с правами 0600).
+
+    Args:
+        filename (str): путь к файлу
+        content (Union[str, bytes]): содержимое, строки записываются в utf8
+    """
+    directory, name = os.path.split(filename)
+    fd, temp = tempfile.mkstemp(dir=directory or '.', prefix=f'.{name}.', suffix='.tmp')
+    try:
+        try:
+            mode = os.stat(filename).st_mode & 0o7777
+        except FileNotFoundError:
+            mode = FILE_MODE
+        os.fchmod(fd, mode)
+        with (os.fdopen(fd, 'wb') if isinstance(content, bytes)
+              else os.fdopen(fd, 'w', encoding='utf8')) as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, filename)
+    except BaseException:
+        try:
+            os.unlink(temp)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def etag_matches(header: str, etag: Optional[str]) -> bool:
+    """etag_matches
+
+    Проверка заголовка If-Match/If-None-Match: список значений, слабые ETag и *
+
+    Args:
+        header (str): значение заголовка
+        etag (Optional[str]): текущий ETag, None - ресурс отсутствует
+    """
+    if etag is None:
+        return False
+    for value in header.split(','):
+        value = value.strip()
+        if value == '*' or value.removeprefix('W/').strip('"') == etag:
+            return True
+    return False
+
+
+def read_version(filename: str) -> int:
+    """read_version
+
+    Номер версии схемы из файла версии, 0 - версия не записывалась
+    """
+    try:
+        with open(filename, 'r') as f:
+            return int(f.read().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+class VersionLock:
+    """
+    Монопольная блокировка схемы на время проверки и записи
+
+    Блокировка устанавливается на файл версии схемы (flock), поэтому действует
+    между процессами. Номер версии увеличивается методом bump.
+
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.fd: Optional[int] = None
+        self.version = 0
+
+    def __enter__(self) -> 'VersionLock':
+        self.fd = os.open(self.filename, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+        content = os.pread(self.fd, 64, 0).decode().strip()
+        self.version = int(content) if content.isdigit() else 0
+        return self
+
+    def bump(self) -> int:
+        self.version += 1
+        os.pwrite(self.fd, VERSION_FORMAT.format(self.version).encode(), 0)
+        return self.version
+
+    def __exit__(self, *exc) -> None:
+        if fcntl:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        os.close(self.fd)
+        self.fd = None
@@ -0,0 +1,322 @@
+from typing import IO, Any, Callable, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import json
+
+from collections import deque
+
+from concurrent.futures import Executor, Future
+
+from src.api.readers import XlsxReader, detect_format, is_empty, read_csv
+from src.api.scheme.formatters import FormatPipeline
+
+# количество строк от начала листа, в которых ищется строка заголовка
+HEADER_SEARCH_ROWS = 50
+
+
+class TransformPlan:
+    """
+    Скомпилированный план преобразования строк документа
+
+    Содержит наименования столбцов схемы, позиции соответствующих ячеек в строке документа
+    и цепочки форматирования. Объект сериализуется pickle и может передаваться в другие процессы.
+
+    """
+    __slots__ = ('names', 'positions', 'pipelines')
+
+    def __init__(self, names: Sequence[str], positions: Sequence[int],
+                 pipelines: Sequence[FormatPipeline]):
+        self.names: Tuple[str, ...] = tuple(names)
+        self.positions: Tuple[int, ...] = tuple(positions)
+        self.pipelines: Tuple[FormatPipeline, ...] = tuple(pipelines)
+
+    @classmethod
+    def build(cls, workbook: Any, found: Sequence[int], cells: Sequence[int],
+              database: bool = False) -> 'TransformPlan':
+        """build
+
+        Построение плана по результату классификации строки заголовка
+
+        Args:
+            workbook (Workbook): схема документа
+            found (Sequence[int]): позиции столбцов схемы для ячеек заголовка
+            cells (Sequence[int]): позиции ячеек заголовка в строке
+            database (bool, optional): применять Database.format. Defaults to False.
+        """
+        positions = dict(zip(found, cells))
+        # цепочки скомпилированы в плане схемы один раз и разделяются запросами
+        pipelines = [c.combined if database else c.document for c in workbook.plan.columns]
+        return cls([c.name for c in workbook.columns],
+                   [positions.get(pos, -1) for pos in range(len(workbook.columns))],
+                   pipelines)
+
+    def columns(self, rows: Sequence[Sequence[Any]]) -> List[List[Any]]:
+        """columns
+
+        Выборка значений по столбцам плана с форматированием цепочками целиком
+
+        Args:
+            rows (Sequence[Sequence[Any]]): строки документа
+
+        Returns:
+            List[List[Any]]: значения столбцов в порядке names
+        """
+        columns = []
+        for position, pipeline in zip(self.positions, self.pipelines):
+            if position < 0:
+                columns.append([None] * len(rows))
+                continue
+            values = [row[position] if position < len(row) else None for row in rows]
+            columns.append(pipeline.batch(values) if pipeline else values)
+        return columns
+
+    def transform(self, rows: Sequence[Sequence[Any]]) -> List[Dict[str, Any]]:
+        """transform
+
+        Преобразование набора строк в записи по наименованиям столбцов
+
+        Args:
+            rows (Sequence[Sequence[Any]]): строки документа
+
+        Returns:
+            List[Dict[str, Any]]: записи со значениями по наименованиям столбцов
+        """
+        names = self.names
+        return [dict(zip(names, values)) for values in zip(*self.columns(rows))]
+
+    def __getstate__(self):
+        return self.names, self.positions, self.pipelines
+
+    def __setstate__(self, state):
+        self.names, self.positions, self.pipelines = state
+
+
+def header_cells(row: Sequence[Any]) -> Tuple[List[int], List[str]]:
+    """header_cells
+
+    Непустые текстовые ячейки строки-кандидата в заголовок
+
+    Returns:
+        Tuple[List[int], List[str]]: позиции ячеек и их значения
+    """
+    cells, values = [], []
+    for idx, value in enumerate(row):
+        if isinstance(value, str) and value.strip():
+            cells.append(idx)
+            values.append(value.strip())
+    return cells, values
+
+
+def match_header(workbook: Any, row: Sequence[Any]) -> Optional[Tuple[List[int], List[int]]]:
+    """match_header
+
+    Проверка строки как заголовка документа по схеме: все непустые ячейки
+    соответствуют разным столбцам схемы, обязательные столбцы присутствуют
+
+    Returns:
+        Optional[Tuple[List[int], List[int]]]: позиции столбцов схемы и ячеек или None
+    """
+    cells, values = header_cells(row)
+    if not values:
+        return None
+    found = workbook.matcher.classify(values)
+    unique = set(found)
+    if -1 in unique or len(unique) != len(found):
+        return None
+    if any(not c.document.optional and pos not in unique
+           for pos, c in enumerate(workbook.columns)):
+        return None
+    return found, cells
+
+
+class DocumentSource:
+    """
+    Загруженный документ xlsx или csv
+    """
+
+    def __init__(self, file: IO[bytes], encoding: str = 'utf-8-sig',
+                 delimiter: Optional[str] = None):
+        self.file = file
+        self.encoding = encoding
+        self.delimiter = delimiter
+        head = file.read(4)
+        file.seek(0)
+        self.format = detect_format(head)
+        self.reader = XlsxReader(file) if self.format == 'xlsx' else None
+
+    @property
+    def sheets(self) -> List[str]:
+        return list(self.reader.sheets) if self.reader else []
+
+    def rows(self, sheet: Optional[str] = None) -> Iterator[Sequence[Any]]:
+        """rows
+
+        Построчное чтение документа, для csv наименование листа не учитывается
+
+        Raises:
+            KeyError: лист не найден в документе
+        """
+        if self.reader:
+            return self.reader.rows(sheet)
+        self.file.seek(0)
+        return read_csv(self.file, self.encoding, self.delimiter)
+
+    def close(self) -> None:
+        if self.reader:
+            self.reader.close()
+        self.file.close()
+
+
+def locate(source: DocumentSource, workbooks: Sequence[Any],
+           classify: Optional[Callable[[Sequence[str]], Any]] = None,
+           database: bool = False,
+           limit: int = HEADER_SEARCH_ROWS) -> Tuple[Any, int, TransformPlan, Iterator[Sequence[Any]]]:
+    """locate
+
+    Поиск листа Workbook.sheet и строки заголовка документа
+
+    Args:
+        source (DocumentSource): документ
+        workbooks (Sequence[Workbook]): схемы-кандидаты
+        classify (Optional[Callable], optional): определение схемы по заголовкам,
+            используется, если кандидатов несколько. Defaults to None.
+        database (bool, optional): применять Database.format. Defaults to False.
+        limit (int, optional): количество просматриваемых строк. Defaults to HEADER_SEARCH_ROWS.
+
+    Raises:
+        ValueError: лист или строка заголовка не найдены
+
+    Returns:
+        Tuple[Workbook, int, TransformPlan, Iterator]: схема, номер строки заголовка,
+            план преобразования и итератор по строкам после заголовка
+    """
+    sheets = {}
+    for workbook in workbooks:
+        if source.reader and workbook.sheet not in source.reader.sheets:
+            continue
+        sheets.setdefault(workbook.sheet, []).append(workbook)
+    if not sheets:
+        raise ValueError('Лист документа, описанный в схеме, не найден')
+    for sheet, candidates in sheets.items():
+        rows = source.rows(sheet)
+        for number, row in enumerate(rows, start=1):
+            if len(candidates) > 1 and classify:
+                _, values = header_cells(row)
+                matched = classify(values) if values else None
+                candidates_row = [c for c in candidates if c is matched]
+            else:
+                candidates_row = candidates
+            for workbook in candidates_row:
+                result = match_header(workbook, row)
+                if result:
+                    plan = TransformPlan.build(workbook, *result, database=database)
+                    return workbook, number, plan, rows
+            if number >= limit:
+                break
+    raise ValueError('Строка заголовка документа не найдена')
+
+
+def chunks(rows: Iterator[Sequence[Any]], start: int,
+           size: int = 1000) -> Iterator[Tuple[List[int], List[Sequence[Any]]]]:
+    """chunks
+
+    Разбиение строк документа на блоки с пропуском пустых строк
+
+    Args:
+        rows (Iterator): строки документа
+        start (int): номер первой строки
+        size (int, optional): размер блока. Defaults to 1000.
+
+    Yields:
+        Tuple[List[int], List[Sequence[Any]]]: номера строк и строки блока
+    """
+    numbers: List[int] = []
+    block: List[Sequence[Any]] = []
+    for number, row in enumerate(rows, start=start):
+        if is_empty(row):
+            continue
+        numbers.append(number)
+        block.append(row)
+        if len(block) >= size:
+            yield numbers, block
+            numbers, block = [], []
+    if block:
+        yield numbers, block
+
+
+def transform_block(plan: TransformPlan, numbers: List[int],
+                    block: List[Sequence[Any]]) -> List[Tuple[int, Dict[str, Any]]]:
+    """transform_block
+
+    Преобразование блока строк
+
+    Returns:
+        List[Tuple[int, Dict[str, Any]]]: номера строк и записи блока
+    """
+    return list(zip(numbers, plan.transform(block)))
+
+
+def ndjson_block(plan: TransformPlan, numbers: List[int],
+                 block: List[Sequence[Any]]) -> bytes:
+    """ndjson_block
+
+    Преобразование блока строк с кодированием в NDJSON
+
+    Returns:
+        bytes: строки NDJSON вида {"row": номер, "data": запись}
+    """
+    return ''.join(
+        json.dumps({'row': number, 'data': record}, ensure_ascii=False) + '\n'
+        for number, record in zip(numbers, plan.transform(block))).encode('utf8')
+
+
+def process(func: Callable[[TransformPlan, List[int], List[Sequence[Any]]], Any],
+            plan: TransformPlan, rows: Iterator[Sequence[Any]], start: int,
+            size: int = 1000, executor: Optional[Executor] = None,
+            window: int = 2) -> Iterator[Any]:
+    """process
+
+    Обработка строк документа блоками. При наличии пула процессов блоки
+    вместе с планом передаются в пул, результаты выдаются в исходном порядке.
+    Количество одновременно обрабатываемых блоков ограничено, поэтому
+    потребление памяти не зависит от размера документа.
+
+    Args:
+        func (Callable): функция обработки блока, должна быть доступна для pickle
+        plan (TransformPlan): план преобразования
+        rows (Iterator): строки документа
+        start (int): номер первой строки
+        size (int, optional): размер блока. Defaults to 1000.
+        executor (Optional[Executor], optional): пул процессов. Defaults to None.
+        window (int, optional): количество блоков в обработке. Defaults to 2.
+
+    Yields:
+        Any: результаты обработки блоков
+    """
+    if executor is None:
+        for numbers, block in chunks(rows, start, size):
+            yield func(plan, numbers, block)
+        return
+    pending: Deque[Future] = deque()
+    try:
+        for numbers, block in chunks(rows, start, size):
+            pending.append(executor.submit(func, plan, numbers, block))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def transform(plan: TransformPlan, rows: Iterator[Sequence[Any]], start: int,
+              size: int = 1000, executor: Optional[Executor] = None,
+              window: int = 2) -> Iterator[List[Tuple[int, Dict[str, Any]]]]:
+    """transform
+
+    Преобразование строк документа блоками
+
+    Yields:
+        List[Tuple[int, Dict[str, Any]]]: номера строк и записи блока
+    """
+    return process(transform_block, plan, rows, start, size, executor, window)
@@ -1,5 +1,10 @@
 
 from typing import Dict, List, Any, Optional
+
+import os
+
+import tempfile
+
 from pydantic import BaseSettings, validator
 
 """"
@@ -16,6 +21,25 @@ class Settings(BaseSettings):
     cors_allow_origins: Optional[List[str]] = ["*"]
     cors_allow_credentials: Optional[bool] = True
     cors_allow_headers: Optional[List[str]]= ["*"]
+    ingest_chunk_size: int = 1000
+    ingest_workers: int = 1
+    ingest_spool_size: int = 8 * 1024 * 1024
+    validation_cache_size: int = 4096
+    validation_batch_size: int = 1000
+    regex_policy: str = 'reject'
+    regex_budget: float = 0.05
+    request_profiling: bool = False
+    # директория результатов профилирования, не должна раздаваться как статические файлы
+    profiles_path: str = os.path.join(tempfile.gettempdir(), 'schemes-profiles')
+    formatter_cache_size: int = 4096
+    formatter_cache_exclude: List[str] = []
+    # ключ подписи снимка реестра схем; без ключа снимок не используется
+    snapshot_key: Optional[str] = None
+    jobs_path: str = os.path.join(tempfile.gettempdir(), 'schemes-jobs')
+    jobs_workers: int = 1
+    jobs_poll_interval: float = 1.0
+    jobs_stale: float = 300
+    jobs_retention: float = 86400
 
     class Config:
 
@@ -1,4 +1,10 @@
-from fastapi import FastAPI
+import time
+
+import asyncio
+
+import logging
+
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.openapi.docs import (
@@ -8,7 +14,20 @@ from fastapi.openapi.docs import (
 
 from src.config.service import Settings
 
-from src.service.routes.workbooks import router as r_documents
+from src.api.scheme.workbook import WorkbookSchemes
+from src.api.scheme.catalogue import Catalogues
+from src.api.scheme.classifier import extract_tokens
+from src.api.scheme.dates import parse_date
+from src.api.scheme.guard import structure
+from src.service.metrics import CONTENT_TYPE, Metrics, MetricsMiddleware, lru_stats
+from src.service.routes.workbooks import router as r_documents, validation_cache
+from src.service.routes.documents import router as r_ingest, shutdown_executor
+from src.service.routes.jobs import router as r_jobs, start_jobs, shutdown_jobs
+
+# момент импорта приложения, от него отсчитывается готовность процесса
+STARTED = time.perf_counter()
+
+logger = logging.getLogger(__name__)
 
 settings = Settings()
 
@@ -36,13 +55,53 @@ app.add_middleware(
     allow_headers=settings.cors_allow_headers,
 )
 
+metrics = Metrics()
+metrics.state = app.state
+metrics.registry(WorkbookSchemes.SOURCE, WorkbookSchemes)
+metrics.registry(Catalogues.SOURCE, Catalogues)
+metrics.cache('validation', validation_cache.stats)
+metrics.cache('catalogue', lambda: Catalogues.CATALOGUES.stats() if Catalogues.CATALOGUES else {})
+metrics.cache('regex_inspect', lru_stats(structure))
+metrics.cache('regex_tokens', lru_stats(extract_tokens))
+metrics.cache('date_parse', lru_stats(parse_date))
+
+# добавляется последним, чтобы учитывать время остальных промежуточных слоев
+app.add_middleware(
+    MetricsMiddleware,
+    metrics=metrics,
+    profiles=settings.profiles_path if settings.request_profiling else None,
+)
+
 app.include_router(r_documents)
+app.include_router(r_ingest)
+app.include_router(r_jobs)
+
+
+@app.on_event("startup")
+async def startup():
+    # реестр схем подготавливается до первого запроса из снимка и измененных файлов
+    warm = await asyncio.to_thread(WorkbookSchemes.warm)
+    warm['ready'] = time.perf_counter() - STARTED
+    app.state.startup = warm
+    start_jobs()
+    logger.info('schemes ready in %.3fs (registry %.3fs, snapshot=%s, restored=%d, parsed=%d)',
+                warm['ready'], warm['seconds'], warm['snapshot'], warm['restored'], warm['parsed'])
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    shutdown_jobs()
+    shutdown_executor()
 
 
 @app.get("/api/health", include_in_schema=False)
 async def get_status():
    return 1
 
+@app.get("/api/metrics", include_in_schema=False)
+async def get_metrics():
+    return Response(metrics.render(), media_type=CONTENT_TYPE)
+
 @app.get("/api/docs", include_in_schema=False)
 async def custom_swagger_ui_html():
     return get_swagger_ui_html(
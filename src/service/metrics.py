@@ -0,0 +1,349 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import os
+
+import time
+
+import cProfile
+
+import pstats
+
+import threading
+
+from itertools import count
+
+from src.api.scheme.guard import MATCH, costs
+
+# тип содержимого текстового формата Prometheus
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# границы гистограммы времени обработки запроса, сек.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# маршрут запроса, не соответствующего ни одному маршруту приложения
+UNMATCHED = '<unmatched>'
+# заголовок запроса, включающий профилирование, и заголовок ответа с путем к результату
+PROFILE_HEADER = b'x-profile'
+PROFILE_OUTPUT_HEADER = b'x-profile-output'
+
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def family(name: str, kind: str, description: str, samples: Iterable[Sample]) -> List[str]:
+    """family
+
+    Строки семейства метрик в текстовом формате Prometheus
+
+    Args:
+        name (str): наименование метрики
+        kind (str): counter, gauge или histogram
+        description (str): описание метрики
+        samples (Iterable[Sample]): суффикс наименования, метки и значение
+    """
+    lines = [f'# HELP {name} {description}', f'# TYPE {name} {kind}']
+    for suffix, labels, value in samples:
+        label = ','.join(f'{k}="{escape(v)}"' for k, v in labels.items())
+        lines.append(f'{name}{suffix}{{{label}}} {number(value)}' if label
+                     else f'{name}{suffix} {number(value)}')
+    return lines
+
+
+class Histogram:
+    """
+    Гистограмма с накопленными значениями по границам корзин
+    """
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: Sequence[float] = DURATION_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def samples(self, labels: Dict[str, str]) -> List[Sample]:
+        result = []
+        total = 0
+        for bound, observed in zip(self.buckets, self.counts):
+            total += observed
+            result.append(('_bucket', {**labels, 'le': number(bound)}, total))
+        result.append(('_bucket', {**labels, 'le': '+Inf'}, self.count))
+        result.append(('_sum', labels, self.sum))
+        result.append(('_count', labels, self.count))
+        return result
+
+
+class Metrics:
+    """
+    Метрики сервиса: время обработки запросов по маршрутам, состояние реестров схем,
+    время выполнения выражений и форматтеров, статистика кэшей
+
+    Время запросов накапливается промежуточным слоем, остальные значения
+    собираются из реестров и кэшей в момент запроса метрик.
+
+    """
+
+    def __init__(self):
+        self.requests: Dict[Tuple[str, str, str], Histogram] = {}
+        self.in_flight = 0
+        self.handlers: Dict[str, Any] = {}
+        self.caches: Dict[str, Callable[[], Dict[str, Any]]] = {}
+        self.state: Optional[Any] = None
+        self._lock = threading.Lock()
+
+    def observe(self, method: str, route: str, status: int, seconds: float) -> None:
+        key = (method, route, str(status))
+        with self._lock:
+            histogram = self.requests.get(key)
+            if histogram is None:
+                histogram = self.requests[key] = Histogram()
+            histogram.observe(seconds)
+
+    def registry(self, source: str, handler: Any) -> None:
+        """registry
+
+        Учет реестра схем обработчика, реестр читается из обработчика при сборе метрик
+        """
+        self.handlers[source] = handler
+
+    def cache(self, name: str, stats: Callable[[], Dict[str, Any]]) -> None:
+        """cache
+
+        Учет кэша по функции статистики с ключами hits, misses, size
+        """
+        self.caches[name] = stats
+
+    def families(self) -> List[str]:
+        lines: List[str] = []
+        with self._lock:
+            requests = [(key, h.samples(dict(zip(('method', 'route', 'status'), key))))
+                        for key, h in sorted(self.requests.items())]
+        lines += family('schemes_http_request_duration_seconds', 'histogram',
+                        'Время обработки запроса по маршруту',
+                        (s for _, samples in requests for s in samples))
+        lines += family('schemes_http_requests_in_flight', 'gauge',
+                        'Количество обрабатываемых запросов', [('', {}, self.in_flight)])
+        lines += self.registries()
+        lines += self.startup()
+        lines += self.regexes()
+        lines += self.format_caches()
+        lines += self.cache_families()
+        return lines
+
+    def registries(self) -> List[str]:
+        registries = [(source, handler.REGISTRY) for source, handler in self.handlers.items()]
+        lines: List[str] = []
+        for name, attribute, kind, description in (
+                ('schemes_registry_schemes', None, 'gauge', 'Количество схем в реестре'),
+                ('schemes_registry_version', 'version', 'gauge', 'Версия реестра в процессе'),
+                ('schemes_registry_parsed_total', 'parsed', 'counter', 'Разобрано файлов схем'),
+                ('schemes_registry_parse_seconds_total', 'parse_seconds', 'counter',
+                 'Время разбора файлов схем'),
+                ('schemes_registry_restored_total', 'restored', 'counter',
+                 'Схем восстановлено из снимка'),
+                ('schemes_registry_scans_total', 'scans', 'counter',
+                 'Обходов директории схем')):
+            lines += family(name, kind, description, [
+                ('', {'source': source},
+                 len(registry.all()) if attribute is None else getattr(registry, attribute))
+                for source, registry in registries])
+        return lines
+
+    def startup(self) -> List[str]:
+        startup = getattr(self.state, 'startup', None) if self.state is not None else None
+        if not startup:
+            return []
+        return family('schemes_startup_seconds', 'gauge',
+                      'Время подготовки процесса: registry - реестр схем, ready - с момента импорта',
+                      [('', {'stage': stage}, startup[key])
+                       for stage, key in (('registry', 'seconds'), ('ready', 'ready'))
+                       if key in startup])
+
+    def regexes(self) -> List[str]:
+        matchers, formatters = [], []
+        for key, stats in sorted(costs.items(), key=lambda item: str(item[0])):
+            kind, subject = key
+            if kind == MATCH:
+                matchers.append(({'scheme': subject}, stats))
+            else:
+                formatters.append(({'formatter': kind, 'regex': subject}, stats))
+        lines: List[str] = []
+        lines += family('schemes_verify_calls_total', 'counter',
+                        'Проверок строки заголовка по схеме',
+                        [('', labels, s['calls']) for labels, s in matchers])
+        lines += family('schemes_regex_evaluations_total', 'counter',
+                        'Заголовков, проверенных выражениями схемы',
+                        [('', labels, s['values']) for labels, s in matchers])
+        lines += family('schemes_verify_seconds_total', 'counter',
+                        'Время проверки заголовков по схеме',
+                        [('', labels, s['seconds']) for labels, s in matchers])
+        lines += family('schemes_formatter_values_total', 'counter',
+                        'Значений, обработанных форматтером',
+                        [('', labels, s['values']) for labels, s in formatters])
+        lines += family('schemes_formatter_seconds_total', 'counter',
+                        'Время работы форматтера',
+                        [('', labels, s['seconds']) for labels, s in formatters])
+        lines += family('schemes_formatter_rows_per_second', 'gauge',
+                        'Средняя производительность форматтера, значений в секунду',
+                        [('', labels, s['values'] / s['seconds'])
+                         for labels, s in formatters if s['seconds']])
+        lines += family('schemes_regex_worst_value_seconds', 'gauge',
+                        'Наибольшее время выражения на одно значение',
+                        [('', labels, s['worst']) for labels, s in matchers + formatters])
+        return lines
+
+    def format_caches(self) -> List[str]:
+        stats = [({'scheme': workbook.name, 'column': s['column'], 'chain': s['chain']}, s)
+                 for handler in self.handlers.values()
+                 for workbook in handler.REGISTRY.all() if hasattr(workbook, 'format_cache')
+                 for s in workbook.format_cache()]
+        lines: List[str] = []
+        for name, key, kind, description in (
+                ('schemes_format_cache_hits_total', 'hits', 'counter',
+                 'Значений, взятых из кэша цепочки форматирования'),
+                ('schemes_format_cache_misses_total', 'misses', 'counter',
+                 'Значений, отформатированных цепочкой'),
+                ('schemes_format_cache_size', 'size', 'gauge', 'Количество значений в кэше столбца'),
+                ('schemes_format_cache_hit_ratio', 'ratio', 'gauge',
+                 'Доля попаданий в кэш цепочки форматирования'),
+                ('schemes_format_cache_enabled', 'enabled', 'gauge',
+                 'Кэш столбца используется (0 - отключен по доле попаданий)')):
+            lines += family(name, kind, description,
+                            [('', labels, int(s[key]) if key == 'enabled' else s[key])
+                             for labels, s in stats])
+        return lines
+
+    def cache_families(self) -> List[str]:
+        stats = [(name, collect()) for name, collect in self.caches.items()]
+        lines: List[str] = []
+        for name, key, kind, description in (
+                ('schemes_cache_hits_total', 'hits', 'counter', 'Попаданий в кэш'),
+                ('schemes_cache_misses_total', 'misses', 'counter', 'Промахов кэша'),
+                ('schemes_cache_size', 'size', 'gauge', 'Количество записей кэша'),
+                ('schemes_cache_hit_ratio', 'ratio', 'gauge', 'Доля попаданий в кэш')):
+            lines += family(name, kind, description,
+                            [('', {'cache': cache}, s[key]) for cache, s in stats if key in s])
+        return lines
+
+    def render(self) -> bytes:
+        """render
+
+        Метрики в текстовом формате Prometheus
+        """
+        return ('\n'.join(self.families()) + '\n').encode('utf8')
+
+
+def lru_stats(function: Any) -> Callable[[], Dict[str, Any]]:
+    """lru_stats
+
+    Функция статистики кэша functools.lru_cache
+    """
+    def stats() -> Dict[str, Any]:
+        info = function.cache_info()
+        total = info.hits + info.misses
+        return {'hits': info.hits, 'misses': info.misses, 'size': info.currsize,
+                'ratio': info.hits / total if total else 0.0}
+    return stats
+
+
+class MetricsMiddleware:
+    """
+    Промежуточный слой ASGI: время обработки запроса по шаблону маршрута
+    и профилирование отдельных запросов
+
+    Профилирование включается заголовком запроса X-Profile, если разрешено настройкой.
+    Результат cProfile сохраняется в директорию profiles, которая не раздается
+    сервисом, путь к файлу на сервере передается в заголовке ответа X-Profile-Output. Профилируется поток цикла событий:
+    синхронные обработчики, выполняемые в пуле потоков, в результат не попадают.
+
+    """
+    _sequence = count()
+
+    def __init__(self, app: Any, metrics: Metrics, profiles: Optional[str] = None):
+        self.app = app
+        self.metrics = metrics
+        self.profiles = profiles
+        self.routes: Optional[Dict[Any, str]] = None
+
+    def route(self, scope: Dict[str, Any]) -> str:
+        """route
+
+        Шаблон маршрута по обработчику, выбранному маршрутизатором
+        """
+        if self.routes is None and 'app' in scope:
+            self.routes = {
+                getattr(route, 'endpoint', None) or getattr(route, 'app', None): route.path
+                for route in getattr(scope['app'], 'routes', ())
+            }
+        return (self.routes or {}).get(scope.get('endpoint'), UNMATCHED)
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        profiler, filename = self.profiler(scope)
+        status = 500
+
+        async def wrapped(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                if filename:
+                    message = {**message, 'headers': [
+                        *message.get('headers', ()),
+                        (PROFILE_OUTPUT_HEADER,
+                         os.path.join(self.profiles, filename).encode('latin-1'))]}
+            await send(message)
+
+        self.metrics.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, wrapped)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.metrics.in_flight -= 1
+            if profiler is not None:
+                profiler.disable()
+                self.dump(profiler, filename)
+            self.metrics.observe(scope['method'], self.route(scope), status, elapsed)
+
+    def profiler(self, scope: Dict[str, Any]) -> Tuple[Optional[cProfile.Profile], Optional[str]]:
+        if self.profiles is None or not any(k == PROFILE_HEADER for k, _ in scope['headers']):
+            return None, None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # профилирование другого запроса еще не завершено
+            return None, None
+        return profiler, f'profile-{int(time.time())}-{next(self._sequence)}.prof'
+
+    def dump(self, profiler: cProfile.Profile, filename: str) -> None:
+        path = os.path.join(self.profiles, filename)
+        try:
+            os.makedirs(self.profiles, mode=0o700, exist_ok=True)
+            profiler.dump_stats(path)
+            with open(f'{path}.txt', 'w', encoding='utf8') as f:
+                pstats.Stats(profiler, stream=f).sort_stats('cumulative').print_stats(50)
+        except OSError:
+            pass
+
+
+__all__ = ['CONTENT_TYPE', 'Metrics', 'MetricsMiddleware', 'lru_stats']
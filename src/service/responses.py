@@ -0,0 +1,50 @@
+from email.utils import formatdate, parsedate_to_datetime
+
+from fastapi import Request, Response, status
+
+from src.api.registry import Encoded
+from src.api.storage import etag_matches
+
+# минимальный размер ответа, который передается сжатым
+GZIP_MIN_SIZE = 1024
+
+
+def not_modified(request: Request, encoded: Encoded) -> bool:
+    header = request.headers.get('if-none-match')
+    if header is not None:
+        return etag_matches(header, encoded.etag)
+    since = request.headers.get('if-modified-since')
+    if since is not None:
+        try:
+            return int(encoded.modified) <= parsedate_to_datetime(since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def cached_response(request: Request, encoded: Encoded) -> Response:
+    """cached_response
+
+    Ответ из сериализованного представления с ETag и Last-Modified.
+    Для совпадающего If-None-Match (If-Modified-Since) возвращается 304 без тела,
+    при поддержке клиентом gzip передается заранее сжатое представление.
+
+    Args:
+        request (Request): запрос
+        encoded (Encoded): сериализованное представление
+
+    Returns:
+        Response: ответ
+    """
+    headers = {
+        'ETag': f'"{encoded.etag}"',
+        'Last-Modified': formatdate(encoded.modified, usegmt=True),
+        'Vary': 'Accept-Encoding',
+    }
+    if not_modified(request, encoded):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    body = encoded.body
+    if len(body) >= GZIP_MIN_SIZE and 'gzip' in request.headers.get('accept-encoding', ''):
+        body = encoded.compressed
+        headers['Content-Encoding'] = 'gzip'
+    return Response(body, media_type='application/json', headers=headers)
@@ -0,0 +1,162 @@
+from typing import Optional, Iterator
+
+import csv
+
+import zipfile
+
+from tempfile import SpooledTemporaryFile
+
+from concurrent.futures import ProcessPoolExecutor
+
+from fastapi.routing import APIRouter
+from fastapi import HTTPException, status, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+
+from xml.etree.ElementTree import ParseError
+from xml.parsers.expat import ExpatError
+
+from src.api import exceptions
+from src.api.scheme.workbook import WorkbookSchemes
+from src.api.encoders import StreamEncoder, negotiate, stream_encoder
+from src.api.transform import DocumentSource, TransformPlan, locate, process
+from src.config.service import Settings
+
+settings = Settings()
+
+router = APIRouter(prefix='/documents', tags=['Загрузка документов'])
+
+executor: Optional[ProcessPoolExecutor] = None
+
+# ошибки разбора документа, возвращаемые клиенту как 422; остальные - ошибки сервиса (500)
+READ_ERRORS = (ValueError, LookupError, UnicodeError, zipfile.BadZipFile,
+               csv.Error, ParseError, ExpatError)
+
+
+def get_executor() -> Optional[ProcessPoolExecutor]:
+    """get_executor
+
+    Пул процессов для параллельного преобразования документов,
+    создается при первом обращении, если ingest_workers больше 1
+    """
+    global executor
+    if executor is None and settings.ingest_workers > 1:
+        executor = ProcessPoolExecutor(max_workers=settings.ingest_workers)
+    return executor
+
+
+def shutdown_executor() -> None:
+    global executor
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+        executor = None
+
+
+async def spool(request: Request) -> SpooledTemporaryFile:
+    """spool
+
+    Сохранение тела запроса во временный файл: в памяти хранится не больше
+    ingest_spool_size байт, остальное записывается на диск. Запись на диск
+    выполняется в пуле потоков, чтобы не блокировать цикл событий
+    """
+    file = SpooledTemporaryFile(max_size=settings.ingest_spool_size)
+    try:
+        async for chunk in request.stream():
+            if file.tell() + len(chunk) > settings.ingest_spool_size:
+                await run_in_threadpool(file.write, chunk)
+            else:
+                file.write(chunk)
+        file.seek(0)
+    except BaseException:
+        file.close()
+        raise
+    return file
+
+
+def encoded(source: DocumentSource, encoder: StreamEncoder, plan: TransformPlan,
+            rows: Iterator, start: int) -> Iterator[bytes]:
+    """encoded
+
+    Потоковая выдача преобразованных строк, блок строк - одна запись в поток
+    """
+    try:
+        if encoder.header:
+            yield encoder.header
+        yield from process(encoder.block, plan, rows, start,
+                           settings.ingest_chunk_size, get_executor(),
+                           window=2 * settings.ingest_workers)
+        if encoder.footer:
+            yield encoder.footer
+    finally:
+        source.close()
+
+
+def accepted(request: Request) -> str:
+    """accepted
+
+    Формат результата по заголовку Accept: NDJSON, MessagePack или Arrow IPC
+
+    Raises:
+        HTTPException: формат не поддерживается или пакет для него не установлен (406)
+    """
+    media_type = negotiate(request.headers.get('accept'))
+    if media_type is None:
+        raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE,
+                            detail='Поддерживаемые форматы: application/x-ndjson, '
+                                   'application/x-msgpack, application/vnd.apache.arrow.stream')
+    return media_type
+
+
+def classify(headers):
+    candidates = WorkbookSchemes.classify(headers)
+    return candidates[0].workbook if candidates and candidates[0].complete else None
+
+
+async def ingest(request: Request, workbooks: list, encoding: str,
+                 delimiter: Optional[str], database: bool) -> StreamingResponse:
+    media_type = accepted(request)
+    file = await spool(request)
+    try:
+        source = DocumentSource(file, encoding, delimiter)
+        workbook, number, plan, rows = await run_in_threadpool(
+            locate, source, workbooks, classify, database)
+        encoder = stream_encoder(media_type, workbook, plan)
+    except READ_ERRORS as e:
+        file.close()
+        detail = str(e) if isinstance(e, ValueError) else 'Ошибка чтения документа'
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                            detail=detail)
+    except BaseException:
+        file.close()
+        raise
+    return StreamingResponse(encoded(source, encoder, plan, rows, number + 1),
+                             media_type=encoder.media_type,
+                             headers={'X-Scheme-Name': workbook.name})
+
+
+@router.post('/schemes/{schema_name}/ingest',
+             description='Преобразовать документ xlsx/csv по схеме, результат в формате NDJSON, '
+                         'MessagePack или Arrow IPC по заголовку Accept',
+             status_code=status.HTTP_200_OK)
+async def ingest_document(schema_name: str,
+                          request: Request,
+                          encoding: str = Query('utf-8-sig'),
+                          delimiter: Optional[str] = Query(None, max_length=1),
+                          database: bool = Query(False)):
+    try:
+        workbook = await WorkbookSchemes.aget(schema_name)
+    except exceptions.SchemeNotFound:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail='Схема не найдена')
+    return await ingest(request, [workbook], encoding, delimiter, database)
+
+
+@router.post('/ingest',
+             description='Определить схему документа xlsx/csv и преобразовать его, результат в формате '
+                         'NDJSON, MessagePack или Arrow IPC по заголовку Accept',
+             status_code=status.HTTP_200_OK)
+async def ingest_detect(request: Request,
+                        encoding: str = Query('utf-8-sig'),
+                        delimiter: Optional[str] = Query(None, max_length=1),
+                        database: bool = Query(False)):
+    return await ingest(request, await WorkbookSchemes.aread(), encoding, delimiter, database)
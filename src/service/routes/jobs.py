@@ -0,0 +1,164 @@
+from typing import Callable, Optional
+
+import json
+
+import asyncio
+
+import aiofiles
+
+from functools import partial
+
+from fastapi.routing import APIRouter
+from fastapi import HTTPException, status, Query, Request, Response
+from fastapi.responses import FileResponse
+
+from src.api import exceptions
+from src.api.jobs import DONE, Job, JobQueue, JobRunner
+from src.api.scheme.workbook import WorkbookSchemes
+from src.api.encoders import NDJSON, counted, stream_encoder
+from src.api.transform import DocumentSource, locate, process
+from src.config.service import Settings
+from src.service.routes.documents import accepted, classify, get_executor
+from src.service.schema.jobs import JobStatus
+
+settings = Settings()
+
+router = APIRouter(prefix='/documents', tags=['Фоновая обработка документов'])
+
+
+def execute(job: Job, progress: Callable[..., None]) -> None:
+    """execute
+
+    Преобразование документа задания в формате, выбранном при добавлении задания,
+    аналогично /documents/ingest.
+    Результат записывается в файл Job.part, который заменяет файл результата
+    при завершении задания, количество обработанных строк учитывается после каждого блока.
+
+    Raises:
+        ValueError: схема, лист или строка заголовка не найдены
+    """
+    params = json.loads(job.params)
+    try:
+        workbooks = ([WorkbookSchemes.get(params['scheme'])] if params['scheme']
+                     else WorkbookSchemes.read())
+    except exceptions.SchemeNotFound:
+        raise ValueError('Схема не найдена')
+    with open(job.upload, 'rb') as file:
+        source = DocumentSource(file, params['encoding'], params['delimiter'])
+        try:
+            workbook, number, plan, rows = locate(source, workbooks, classify, params['database'])
+            encoder = stream_encoder(params.get('media_type', NDJSON), workbook, plan)
+            progress(0, workbook.name)
+            processed = 0
+            with open(job.part, 'wb') as result:
+                result.write(encoder.header)
+                for count, block in process(partial(counted, encoder.block), plan, rows,
+                                            number + 1, settings.ingest_chunk_size, get_executor(),
+                                            window=2 * settings.ingest_workers):
+                    result.write(block)
+                    processed += count
+                    progress(processed)
+                result.write(encoder.footer)
+        finally:
+            source.close()
+
+
+runner = JobRunner(JobQueue(settings.jobs_path), execute,
+                   workers=settings.jobs_workers,
+                   poll=settings.jobs_poll_interval,
+                   stale=settings.jobs_stale,
+                   retention=settings.jobs_retention)
+
+
+def start_jobs() -> None:
+    runner.start()
+
+
+def shutdown_jobs() -> None:
+    runner.stop(timeout=5)
+
+
+def job_status(job: Job) -> JobStatus:
+    result = f'{router.prefix}/jobs/{job.id}/result' if job.state == DONE else None
+    return JobStatus(**job.dict(), result=result)
+
+
+async def submit(request: Request, response: Response, scheme: Optional[str], encoding: str,
+                 delimiter: Optional[str], database: bool) -> JobStatus:
+    """submit
+
+    Запись тела запроса в файл задания и добавление задания в очередь,
+    формат результата выбирается по заголовку Accept запроса
+    """
+    job = runner.queue.new(json.dumps({'scheme': scheme, 'encoding': encoding,
+                                       'delimiter': delimiter, 'database': database,
+                                       'media_type': accepted(request)}))
+    try:
+        async with aiofiles.open(job.upload, 'wb') as f:
+            async for chunk in request.stream():
+                await f.write(chunk)
+        await asyncio.to_thread(runner.queue.submit, job)
+    except BaseException:
+        await asyncio.to_thread(runner.queue.remove, job)
+        raise
+    runner.notify()
+    response.headers['Location'] = f'{router.prefix}/jobs/{job.id}'
+    return job_status(job)
+
+
+@router.post('/jobs/schemes/{schema_name}',
+             response_model=JobStatus,
+             description='Поставить в очередь преобразование документа xlsx/csv по схеме',
+             status_code=status.HTTP_202_ACCEPTED)
+async def submit_document(schema_name: str,
+                          request: Request,
+                          response: Response,
+                          encoding: str = Query('utf-8-sig'),
+                          delimiter: Optional[str] = Query(None, max_length=1),
+                          database: bool = Query(False)):
+    try:
+        await WorkbookSchemes.aget(schema_name)
+    except exceptions.SchemeNotFound:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail='Схема не найдена')
+    return await submit(request, response, schema_name, encoding, delimiter, database)
+
+
+@router.post('/jobs',
+             response_model=JobStatus,
+             description='Поставить в очередь определение схемы и преобразование документа xlsx/csv',
+             status_code=status.HTTP_202_ACCEPTED)
+async def submit_detect(request: Request,
+                        response: Response,
+                        encoding: str = Query('utf-8-sig'),
+                        delimiter: Optional[str] = Query(None, max_length=1),
+                        database: bool = Query(False)):
+    return await submit(request, response, None, encoding, delimiter, database)
+
+
+def get_job(job_id: str) -> Job:
+    job = runner.queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail='Задание не найдено')
+    return job
+
+
+@router.get('/jobs/{job_id}',
+            response_model=JobStatus,
+            description='Состояние задания: обработано строк, производительность, ошибка',
+            status_code=status.HTTP_200_OK)
+def fetch_job(job_id: str):
+    return job_status(get_job(job_id))
+
+
+@router.get('/jobs/{job_id}/result',
+            description='Результат задания в формате, выбранном при добавлении задания',
+            status_code=status.HTTP_200_OK)
+def fetch_job_result(job_id: str):
+    job = get_job(job_id)
+    if job.state != DONE:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail=job.error or 'Задание не завершено')
+    return FileResponse(job.result, media_type=json.loads(job.params).get('media_type', NDJSON),
+                        headers={'X-Scheme-Name': job.scheme})
@@ -1,29 +1,83 @@
 from pydoc import describe
-from typing import List, Optional, Union, Dict
+from typing import List, Optional, Union, Dict, Sequence, Callable
+
+import json
+
+import asyncio
+
+import hashlib
 
 from pydantic import BaseModel
 
 from fastapi.routing import APIRouter
-from fastapi import HTTPException, status, Query
+from fastapi import HTTPException, status, Query, Request, Response, Header, Body
+from fastapi.encoders import jsonable_encoder
 
 from src.api.scheme.workbook import *
 from src.api import exceptions
+from src.api.cache import ResultCache, fingerprint, normalize_headers
+from src.api.registry import Encoded
+from src.config.service import Settings
 
 from src.api.scheme.workbook import WorkbookSchemes, Workbook
+from src.api.scheme.catalogue import Catalogues
+from src.api.scheme.classifier import Candidate
+from src.api.scheme.formatters import ValueMemo
 from src.service.schema.scheme import *
 from src.service.schema.validation import *
+from src.service.responses import cached_response
+
+settings = Settings()
 
 router = APIRouter(prefix='/documents', tags=['Схемы документов/excel'])
 
+# результаты проверки заголовков в виде готового JSON по отпечатку набора заголовков
+validation_cache = ResultCache(settings.validation_cache_size)
+
+WorkbookSchemes.REGEX_POLICY = settings.regex_policy
+WorkbookSchemes.REGEX_BUDGET = settings.regex_budget
+WorkbookSchemes.SNAPSHOT_KEY = settings.snapshot_key.encode('utf8') if settings.snapshot_key else None
+# кэши цепочек форматирования создаются при компиляции схем
+ValueMemo.SIZE = settings.formatter_cache_size
+ValueMemo.EXCLUDE = frozenset(settings.formatter_cache_exclude)
+
 
 @router.get('/schemes',
             response_model=List[Workbook],
             response_model_exclude_unset=True,
             description='Получить все известные схемы',
             status_code=status.HTTP_200_OK)
-async def fetch_all():
-    document_schemes = WorkbookSchemes.load()
-    return document_schemes
+async def fetch_all(request: Request):
+    return cached_response(request, await WorkbookSchemes.aencoded())
+
+
+@router.get('/index',
+            response_model=SchemeIndexPage,
+            description='Метаданные схем: наименование, заголовок, лист, количество столбцов, '
+                        'версия и хэш. fields - выводимые атрибуты через запятую, '
+                        'cursor - значение next из предыдущего ответа',
+            status_code=status.HTTP_200_OK)
+async def fetch_index(request: Request,
+                      fields: Optional[str] = Query(None),
+                      cursor: Optional[str] = Query(None),
+                      limit: int = Query(100, ge=1, le=1000)):
+    """fetch_index
+
+    Список схем из индекса метаданных, модели схем не разбираются
+
+    Returns:
+        JSON: часть списка схем, для совпадающего If-None-Match - 304
+    """
+    try:
+        items, following, total = await WorkbookSchemes.aindex(
+            [f.strip() for f in fields.split(',') if f.strip()] if fields else None,
+            cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    body = json.dumps({'items': items, 'next': following, 'total': total},
+                      ensure_ascii=False, separators=(',', ':')).encode('utf8')
+    return cached_response(request, Encoded(body, hashlib.sha1(body).hexdigest(),
+                                            max((i.get('modified', 0) for i in items), default=0)))
 
 
 @router.get(
@@ -32,7 +86,7 @@ async def fetch_all():
     response_model_exclude_unset=True,
     description='Получить схему в соответствие с типом источника и названием',
     status_code=status.HTTP_200_OK)
-async def fetch_scheme(schema_name: str):
+async def fetch_scheme(schema_name: str, request: Request):
     """
 
     Получение схемы по типу источника и имени
@@ -41,24 +95,47 @@ async def fetch_scheme(schema_name: str):
         name (str): наименование схемы
 
     Returns:
-        JSON: Возвращает схему в формате JSON
+        JSON: Возвращает схему в формате JSON, для совпадающего If-None-Match - 304
     """
-    workbook_schemes = WorkbookSchemes.read()
     try:
-        wb_scheme_match = next(s for s in workbook_schemes
-                               if s.name == schema_name)
-    except StopIteration:
+        encoded = await WorkbookSchemes.aencoded(schema_name)
+    except exceptions.SchemeNotFound:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail='Схема не найдена')
     else:
-        return wb_scheme_match
+        return cached_response(request, encoded)
+
+
+def saved(response: Response, name: str, version: int) -> None:
+    """saved
+
+    Заголовки ответа после сохранения схемы: новый ETag и номер версии
+    """
+    response.headers['ETag'] = f'"{WorkbookSchemes.REGISTRY.entry(name).digest}"'
+    response.headers['X-Scheme-Version'] = str(version)
+
+
+def conflict() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED,
+                         detail='Схема изменена другим запросом')
+
+
+def rejected(response: Response, error: Exception) -> SchemeResponse:
+    """rejected
+
+    Ответ на отклоненное изменение схемы: код 422 и описание ошибки
+    """
+    response.status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    return SchemeResponse(error=str(error))
 
 
 @router.put('/schemes/{schema_name}',
             description='Обновить элемент в схеме документа по названию',
             status_code=200)
 async def modify_scheme_element(schema_name: str,
-                                scheme_request: SchemeColumnRequest):
+                                scheme_request: SchemeColumnRequest,
+                                response: Response,
+                                if_match: Optional[str] = Header(None)):
     """modify_scheme 
 
     Args:
@@ -72,27 +149,125 @@ async def modify_scheme_element(schema_name: str,
         HTTPException
     """
 
-    schemes = WorkbookSchemes.read()
     try:
-        scheme_match: Workbook = next(s for s in schemes
-                                      if s.name == schema_name)
-    except StopIteration:
+        # схема из реестра разделяется между запросами, изменения вносятся в копию
+        scheme_match: Workbook = (await WorkbookSchemes.aget(schema_name)).copy(deep=True)
+    except exceptions.SchemeNotFound:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail='Схема не найдена')
     else:
         data = scheme_match.update_column(
             scheme_request.name,
             scheme_request.dict(exclude_unset=True, exclude={'name'}))
-        WorkbookSchemes.update(scheme_match.name, data.dict())
+        try:
+            version = await WorkbookSchemes.aupdate(scheme_match.name, data.dict(), if_match)
+        except exceptions.SchemeVersionConflict:
+            raise conflict()
+        except exceptions.SchemeRegexRejected as e:
+            return rejected(response, e)
+        saved(response, scheme_match.name, version)
         return
 
 
+def modify_element(schema_name: str, change: Callable[[Workbook], Workbook],
+                   response: Response, if_match: Optional[str]) -> Optional[SchemeResponse]:
+    """modify_element
+
+    Сохранение схемы, измененной функцией change, с заголовками ETag и X-Scheme-Version
+
+    Raises:
+        HTTPException: схема не найдена (404) или изменена другим запросом (412)
+    """
+    try:
+        version = WorkbookSchemes.modify(schema_name, change, if_match)
+    except (exceptions.SchemeNotFound, FileNotFoundError):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail='Схема не найдена')
+    except exceptions.SchemeVersionConflict:
+        raise conflict()
+    except ValueError as e:
+        return rejected(response, e)
+    saved(response, schema_name, version)
+    return None
+
+
+@router.patch('/schemes/{schema_name}/columns/{column_name:path}',
+              description='Изменить столбец схемы операциями JSON Patch',
+              status_code=200,
+              response_model=SchemeResponse,
+              response_model_exclude_unset=True)
+def patch_column(schema_name: str, column_name: str, operations: List[PatchOperation],
+                 response: Response, if_match: Optional[str] = Header(None)):
+    patch = [o.operation() for o in operations]
+    return modify_element(schema_name, lambda wb: wb.patch_column(column_name, patch),
+                          response, if_match)
+
+
+@router.put('/schemes/{schema_name}/columns/{column_name:path}',
+            description='Заменить или добавить столбец схемы',
+            status_code=200,
+            response_model=SchemeResponse,
+            response_model_exclude_unset=True)
+def put_column(schema_name: str, column_name: str, column: SchemeColumnRequest,
+               response: Response, if_match: Optional[str] = Header(None)):
+    column = Column(**column.dict(exclude_unset=True))
+    return modify_element(schema_name, lambda wb: wb.with_column(column_name, column),
+                          response, if_match)
+
+
+@router.delete('/schemes/{schema_name}/columns/{column_name:path}',
+               description='Удалить столбец схемы',
+               status_code=200,
+               response_model=SchemeResponse,
+               response_model_exclude_unset=True)
+def delete_column(schema_name: str, column_name: str, response: Response,
+                  if_match: Optional[str] = Header(None)):
+    return modify_element(schema_name, lambda wb: wb.with_column(column_name, None),
+                          response, if_match)
+
+
+@router.patch('/schemes/{schema_name}/header/{attribute_name:path}',
+              description='Изменить атрибут заголовка схемы операциями JSON Patch',
+              status_code=200,
+              response_model=SchemeResponse,
+              response_model_exclude_unset=True)
+def patch_attribute(schema_name: str, attribute_name: str, operations: List[PatchOperation],
+                    response: Response, if_match: Optional[str] = Header(None)):
+    patch = [o.operation() for o in operations]
+    return modify_element(schema_name, lambda wb: wb.patch_attribute(attribute_name, patch),
+                          response, if_match)
+
+
+@router.put('/schemes/{schema_name}/header/{attribute_name:path}',
+            description='Заменить или добавить атрибут заголовка схемы',
+            status_code=200,
+            response_model=SchemeResponse,
+            response_model_exclude_unset=True)
+def put_attribute(schema_name: str, attribute_name: str, attribute: SchemeHeaderRequest,
+                  response: Response, if_match: Optional[str] = Header(None)):
+    attribute = HeaderAttribute(**attribute.dict(exclude_unset=True))
+    return modify_element(schema_name, lambda wb: wb.with_attribute(attribute_name, attribute),
+                          response, if_match)
+
+
+@router.delete('/schemes/{schema_name}/header/{attribute_name:path}',
+               description='Удалить атрибут заголовка схемы',
+               status_code=200,
+               response_model=SchemeResponse,
+               response_model_exclude_unset=True)
+def delete_attribute(schema_name: str, attribute_name: str, response: Response,
+                     if_match: Optional[str] = Header(None)):
+    return modify_element(schema_name, lambda wb: wb.with_attribute(attribute_name, None),
+                          response, if_match)
+
+
 @router.delete('/schemes/{schema_name}/{element_type}/{element_name}',
                description='Удалить элемент в схеме документа по названию',
                status_code=200,
                response_model=SchemeResponse)
 def delete_scheme_element(element_type: SchemeElementType, schema_name: str,
-                          element_name: str):
+                          element_name: str, response: Response,
+                          if_match: Optional[str] = Header(None)):
     """
     
     Удаление элемента из массива 
@@ -107,33 +282,36 @@ def delete_scheme_element(element_type: SchemeElementType, schema_name: str,
         HTTPException: код ошибки в формате HTTP с описанием
 
     """
-    schemes = WorkbookSchemes.read()
-    if not schemes:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
-                            detail='Схема не найдена')
     try:
-        scheme_match: Workbook = next(s for s in schemes
-                                      if s.name == schema_name)
-    except StopIteration:
+        scheme_match: Workbook = WorkbookSchemes.get(schema_name).copy(deep=True)
+    except exceptions.SchemeNotFound:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail='Схема не найдена')
     else:
-        if element_type.column:
+        if element_type == SchemeElementType.column:
             try:
                 data = scheme_match.delete_column(element_name)
             except (AttributeError, ValueError) as e:
-                return SchemeResponse(error=str(e))
+                return rejected(response, e)
             else:
-                WorkbookSchemes.write(scheme_match.name, data.dict())
+                try:
+                    version = WorkbookSchemes.write(scheme_match.name, data.dict(), if_match)
+                except exceptions.SchemeVersionConflict:
+                    raise conflict()
+                saved(response, scheme_match.name, version)
                 return
-        elif element_type.header:
+        elif element_type == SchemeElementType.header:
             try:
                 data = scheme_match.delete_attribute(element_name)
             except (AttributeError, ValueError) as e:
-                return SchemeResponse(error=str(e))
+                return rejected(response, e)
             else:
                 if data:
-                    WorkbookSchemes.write(scheme_match.name, data.dict())
+                    try:
+                        version = WorkbookSchemes.write(scheme_match.name, data.dict(), if_match)
+                    except exceptions.SchemeVersionConflict:
+                        raise conflict()
+                    saved(response, scheme_match.name, version)
                     return
 
 
@@ -141,21 +319,94 @@ def delete_scheme_element(element_type: SchemeElementType, schema_name: str,
              description='Создать новую схему',
              status_code=201,
              response_model=SchemeResponse)
-def add_new_scheme(scheme_name: str, data: Workbook):
+def add_new_scheme(scheme_name: str, data: Workbook, response: Response,
+                   if_match: Optional[str] = Header(None)):
     try:
-        WorkbookSchemes.update(scheme_name, data.dict())
-    except:
+        version = WorkbookSchemes.write(scheme_name, data.dict(), if_match)
+    except exceptions.SchemeVersionConflict:
+        raise conflict()
+    except (exceptions.SchemeRegexRejected, exceptions.SchemeNameMismatch) as e:
+        return rejected(response, e)
+    except OSError:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                             detail='Ошибка сохранения данных')
     else:
+        saved(response, data.name, version)
         return
 
+@router.get('/schemes/{schema_name}/regex',
+            status_code=status.HTTP_200_OK,
+            description='Проверка выражений схемы и время их выполнения')
+async def regex_report(schema_name: str):
+    try:
+        scheme_match = await WorkbookSchemes.aget(schema_name)
+    except exceptions.SchemeNotFound:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail='Схема не найдена')
+    # замеры выполняются вне цикла событий
+    return await asyncio.to_thread(scheme_match.regex_report, WorkbookSchemes.REGEX_BUDGET)
+
+
+@router.post('/schemes/{schema_name}/format',
+             description='Отформатировать значения столбцов цепочками форматтеров схемы',
+             status_code=status.HTTP_200_OK,
+             response_model=FormatResponse,
+             response_model_exclude_unset=True)
+def format_columns(schema_name: str, format_request: FormatRequest):
+    try:
+        scheme_match = WorkbookSchemes.get(schema_name)
+    except exceptions.SchemeNotFound:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail='Схема не найдена')
+    try:
+        data = scheme_match.format_columns(format_request.columns,
+                                           database=format_request.database)
+    except ValueError as e:
+        return FormatResponse(error=str(e))
+    else:
+        return FormatResponse(data=data)
+
+
+@router.post('/schemes/{schema_name}/map',
+             description='Сопоставить значения столбцов записям справочников',
+             status_code=status.HTTP_200_OK,
+             response_model=MappingResponse,
+             response_model_exclude_unset=True)
+def map_columns(schema_name: str, mapping_request: MappingRequest):
+    try:
+        scheme_match = WorkbookSchemes.get(schema_name)
+    except exceptions.SchemeNotFound:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail='Схема не найдена')
+    try:
+        data = scheme_match.map_columns(mapping_request.columns, Catalogues.current())
+    except ValueError as e:
+        return MappingResponse(error=str(e))
+    else:
+        return MappingResponse(data=data)
+
+
 @router.get('/json', description='Получить JSON schema')
 def get_json_schema():
     return Workbook.schema_json(ensure_ascii=False, indent=2)
     
 
 
+async def validate_headers(headers: Sequence[str]) -> ValidationResponse:
+    return validation_result(await WorkbookSchemes.aclassify(headers))
+
+
+def validation_result(candidates: Sequence[Candidate]) -> ValidationResponse:
+    if not candidates or not candidates[0].complete:
+        return ValidationResponse(error="Схема не найдена")
+    try:
+        data = candidates[0].workbook.validate_match(candidates[0].verified)
+    except ValueError as e:
+        return ValidationResponse(error=str(e))
+    else:
+        return ValidationResponse(data=data)
+
+
 @router.get('/validate',
             status_code=status.HTTP_200_OK,
             response_model=ValidationResponse,
@@ -164,12 +415,96 @@ async def validate_schema(headers: List[str] = Query(...)):
     if not headers:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail='Не переданы параметы запроса')
-    schemes = WorkbookSchemes.read()
-    if not schemes:
+    headers = normalize_headers(headers)
+    key = fingerprint(headers)
+    try:
+        version = await WorkbookSchemes.aversion()
+        body = validation_cache.get(key, version)
+        if body is None:
+            body = encoded(await validate_headers(headers))
+            validation_cache.put(key, version, body)
+    except (OSError, ValueError):
         return ValidationResponse(error="Ошибка загрузки данных")
-    result = [s.verify_columns(tuple(headers)) for s in schemes]
-    for r in result:
-        if r[0]:
-            return ValidationResponse(data=r[0].validate_columns(r[0].name, r[1], r[2], r[3]))
-        else:
-            return ValidationResponse(error="Схема не найдена")
+    return Response(body, media_type='application/json')
+
+
+def encoded(response: ValidationResponse) -> bytes:
+    return json.dumps(jsonable_encoder(response, exclude_unset=True),
+                      ensure_ascii=False, separators=(',', ':')).encode('utf8')
+
+
+@router.post('/validate/batch',
+             status_code=status.HTTP_200_OK,
+             response_model=List[ValidationResponse],
+             response_model_exclude_unset=True,
+             description='Проверить несколько наборов заголовков (листов документа) за один запрос')
+async def validate_batch(items: List[Union[ValidationItem, List[str]]] = Body(...)):
+    """validate_batch
+
+    Результаты возвращаются в порядке наборов. Результаты наборов без листа
+    разделяются с GET /validate через кэш результатов проверки.
+
+    Raises:
+        HTTPException: количество наборов превышает validation_batch_size (413)
+    """
+    if len(items) > settings.validation_batch_size:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail='Превышено количество наборов заголовков')
+    requests = [
+        (normalize_headers(item.headers), item.sheet) if isinstance(item, ValidationItem)
+        else (normalize_headers(item), None)
+        for item in items
+    ]
+    keys = [fingerprint(headers if sheet is None else (*headers, f'\x1e{sheet}'))
+            for headers, sheet in requests]
+    try:
+        version = await WorkbookSchemes.aversion()
+        bodies = [validation_cache.get(key, version) if headers else
+                  encoded(ValidationResponse(error='Не переданы заголовки'))
+                  for key, (headers, _) in zip(keys, requests)]
+        pending = [pos for pos, body in enumerate(bodies) if body is None]
+        if pending:
+            results = await WorkbookSchemes.aclassify_batch([requests[pos] for pos in pending])
+            for pos, candidates in zip(pending, results):
+                bodies[pos] = encoded(validation_result(candidates))
+                validation_cache.put(keys[pos], version, bodies[pos])
+    except (OSError, ValueError):
+        return [ValidationResponse(error="Ошибка загрузки данных")] * len(items)
+    return Response(b'[' + b','.join(bodies) + b']', media_type='application/json')
+
+
+@router.get('/validate/cache',
+            status_code=status.HTTP_200_OK,
+            description='Статистика кэша результатов проверки заголовков')
+async def validation_cache_stats():
+    return validation_cache.stats()
+
+
+@router.get('/classify',
+            status_code=status.HTTP_200_OK,
+            response_model=ClassificationResponse,
+            response_model_exclude_unset=True,
+            description='Ранжировать известные схемы для набора заголовков')
+async def classify_schema(headers: List[str] = Query(...),
+                          limit: int = Query(3, ge=1, le=50)):
+    if not headers:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail='Не переданы параметы запроса')
+    try:
+        candidates = await WorkbookSchemes.aclassify(headers, limit)
+    except (OSError, ValueError):
+        return ClassificationResponse(error="Ошибка загрузки данных")
+    result = [
+        SchemeCandidate(name=c.workbook.name,
+                        title=c.workbook.title,
+                        score=c.score,
+                        verified=c.verified is not None,
+                        complete=c.complete,
+                        matched=c.matched,
+                        missing={
+                            'required': list(c.verified.missing_required),
+                            'optional': list(c.verified.missing_optional)
+                        } if c.verified else None) for c in candidates
+    ]
+    best = result[0] if result and result[0].complete else None
+    return ClassificationResponse(data=ClassificationData(best=best, candidates=result))
@@ -0,0 +1,21 @@
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class JobStatus(BaseModel):
+    """
+    Состояние задания фоновой обработки документа: queued, running, done, failed
+    """
+    id: str
+    state: str
+    scheme: Optional[str]
+    size: int
+    rows: int
+    seconds: Optional[float]
+    throughput: Optional[float]
+    error: Optional[str]
+    created: float
+    started: Optional[float]
+    finished: Optional[float]
+    result: Optional[str]
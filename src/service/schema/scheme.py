@@ -1,5 +1,5 @@
-from typing import Optional, Union, List
-from pydantic import BaseModel
+from typing import Optional, Union, List, Dict, Any
+from pydantic import BaseModel, Field
 
 from enum import Enum
 from src.api.scheme.workbook import HeaderAttribute
@@ -25,8 +25,57 @@ class SchemeHeaderRequest(HeaderAttribute):
     class Meta:
         arbitrary_type_allowed = True
 
+class PatchOperationType(Enum):
+    add = 'add'
+    remove = 'remove'
+    replace = 'replace'
+    move = 'move'
+    copy = 'copy'
+    test = 'test'
+
+
+class PatchOperation(BaseModel):
+    """
+    Операция JSON Patch (RFC 6902), путь указывается относительно элемента схемы
+    """
+    op: PatchOperationType
+    path: str
+    value: Optional[Any]
+    from_: Optional[str] = Field(None, alias='from')
+
+    def operation(self) -> Dict[str, Any]:
+        data = self.dict(by_alias=True, exclude_unset=True)
+        data['op'] = self.op.value
+        return data
+
 class SchemeResponse(BaseModel):
     data:Optional[Union[Workbook, List[Workbook]]]
     error:Optional[str]
 
-__all__ = ['SchemeElementType', 'SchemeHeaderRequest', 'SchemeResponse', 'SchemeColumnRequest']
\ No newline at end of file
+class FormatRequest(BaseModel):
+    columns: Dict[str, List[Any]]
+    database: bool = False
+
+class FormatResponse(BaseModel):
+    data:Optional[Dict[str, List[Any]]]
+    error:Optional[str]
+
+class MappingRequest(BaseModel):
+    columns: Dict[str, List[Any]]
+
+class MappingResponse(BaseModel):
+    data:Optional[Dict[str, Dict[str, List[Any]]]]
+    error:Optional[str]
+
+class SchemeIndexPage(BaseModel):
+    """
+    Часть списка метаданных схем: записи с выбранными атрибутами,
+    курсор следующей части (None - последняя часть) и общее количество схем
+    """
+    items: List[Dict[str, Any]]
+    next: Optional[str]
+    total: int
+
+
+__all__ = ['SchemeElementType', 'PatchOperation', 'PatchOperationType', 'SchemeHeaderRequest', 'SchemeResponse', 'SchemeColumnRequest',
+           'FormatRequest', 'FormatResponse', 'MappingRequest', 'MappingResponse', 'SchemeIndexPage']
@@ -1,4 +1,4 @@
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 
 from pydantic import BaseModel
 
@@ -6,4 +6,32 @@ from pydantic import BaseModel
 
 class ValidationResponse(BaseModel):
     data:Optional[Dict]
-    error:Optional[str]
\ No newline at end of file
+    error:Optional[str]
+
+
+class ValidationItem(BaseModel):
+    """
+    Набор заголовков листа документа, наименование листа сравнивается с Workbook.sheet
+    """
+    headers: List[str]
+    sheet: Optional[str]
+
+
+class SchemeCandidate(BaseModel):
+    name: str
+    title: str
+    score: float
+    verified: bool
+    complete: bool
+    matched: int
+    missing: Optional[Dict[str, List[str]]]
+
+
+class ClassificationData(BaseModel):
+    best: Optional[SchemeCandidate]
+    candidates: List[SchemeCandidate]
+
+
+class ClassificationResponse(BaseModel):
+    data:Optional[ClassificationData]
+    error:Optional[str]
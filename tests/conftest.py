@@ -0,0 +1,8 @@
+import os
+
+import pytest
+
+
+@pytest.fixture(autouse=True, scope='session')
+def mock_test_env():
+    os.environ['SCHEMES_PATH'] = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
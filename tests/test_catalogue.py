@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+
+@pytest.fixture
+def catalogues(tmp_path, mock_test_env):
+    from src.api.registry import SchemeRegistry
+    from src.api.scheme.catalogue import Catalogue, CatalogueSet
+
+    (tmp_path / 'organizations.json').write_text(json.dumps({
+        'name': 'organizations',
+        'link': '/references/organizations',
+        'items': [
+            {'code': 'MCHS', 'title': 'МЧС России'},
+            {'code': 'FNS', 'title': 'Федеральная налоговая служба'},
+        ]
+    }, ensure_ascii=False), encoding='utf8')
+    registry = SchemeRegistry(str(tmp_path), Catalogue)
+    registry.refresh()
+    return CatalogueSet(registry.all(), registry.version)
+
+
+def test_resolve_bulk(catalogues):
+    resolver = catalogues.resolver('/references/organizations/title', 'code')
+    assert resolver.batch(['мчс  России.', 'Федеральная налоговая служба', 'Неизвестно', None,
+                           ['МЧС России', 'ФНС']]) == ['MCHS', 'FNS', None, None, ['MCHS', None]]
+    assert resolver.cache['Неизвестно'] is None
+    assert catalogues.resolver('/references/missing/title', 'code') is None
+
+
+def test_workbook_map_columns(catalogues):
+    from src.api.scheme.workbook import WorkbookSchemes
+
+    erot_scheme = WorkbookSchemes.get('erot')
+    result = erot_scheme.map_columns({
+        'Орган, ответственный за внесение сведений': ['МЧС России', 'ФНС'],
+        'Содержание обязательного требования': ['текст'],
+    }, catalogues)
+    assert result['Орган, ответственный за внесение сведений'] == {
+        '/references/organizations/title': ['MCHS', None]
+    }
+    assert result['Содержание обязательного требования'] == {}
+
+
+def test_resolver_concurrent(catalogues):
+    from concurrent.futures import ThreadPoolExecutor
+    from src.api.scheme.catalogue import CatalogueResolver
+
+    index = catalogues.links['/references/organizations'].index('title')
+    resolver = CatalogueResolver(index, 'code', maxsize=8)
+    values = ['МЧС России', 'ФНС'] + [f'значение {i}' for i in range(50)]
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(resolver.batch, [values] * 64))
+    assert all(r[:2] == ['MCHS', None] for r in results)
+    assert resolver.hits + resolver.misses == 64 * len(values)
+
+
+def test_catalogues_reload(tmp_path, monkeypatch):
+    from src.api.registry import SchemeRegistry
+    from src.api.scheme.catalogue import Catalogue, Catalogues
+
+    path = tmp_path / 'organizations.json'
+
+    def write(code):
+        path.write_text(json.dumps({
+            'name': 'organizations',
+            'link': '/references/organizations',
+            'items': [{'code': code, 'title': 'МЧС России'}],
+        }, ensure_ascii=False), encoding='utf8')
+
+    # справочники сверяются с директорией без учета счетчика поколений
+    assert Catalogues.REGISTRY.generation is None
+    write('MCHS')
+    monkeypatch.setattr(Catalogues, 'REGISTRY', SchemeRegistry(str(tmp_path), Catalogue))
+    monkeypatch.setattr(Catalogues, 'CATALOGUES', None)
+    resolver = Catalogues.current().resolver('/references/organizations/title', 'code')
+    assert resolver.one('МЧС России') == 'MCHS'
+    write('EMERCOM')
+    resolver = Catalogues.current().resolver('/references/organizations/title', 'code')
+    assert resolver.one('МЧС России') == 'EMERCOM'
@@ -0,0 +1,41 @@
+import pytest
+
+from tests.test_scheme import EROT_HEADERS
+
+
+def test_extract_tokens():
+    from src.api.scheme.classifier import extract_tokens
+
+    assert extract_tokens('(?i)^id\\sтребовани[а-я]+$') == ('требовани',)
+    assert extract_tokens('(?i)^стату[а-я]+\\s+публикац[а-я]+') == ('стату', 'публикац')
+    assert extract_tokens('(?i)^№\\s*п\\S+п$') == ()
+
+
+def test_classify_ranks_later_scheme(mock_test_env):
+    from src.api.scheme.classifier import SchemeClassifier
+    from src.api.scheme.workbook import Workbook, WorkbookSchemes
+
+    erot = WorkbookSchemes.get('erot')
+    other = Workbook(title='Другая схема', name='other', sheet='Лист1', columns=[
+        {'name': 'Номер', 'document': {'regex': '(?i)^номер\\s+строки$', 'optional': False}}
+    ])
+    classifier = SchemeClassifier([other, erot])
+    candidates = classifier.classify(EROT_HEADERS)
+    assert candidates[0].workbook is erot
+    assert candidates[0].complete
+    assert classifier.best(['Номер строки']).workbook is other
+    assert classifier.best(['Неизвестный столбец']) is None
+
+
+def test_classify_without_prefilter_hits(mock_test_env):
+    from src.api.scheme.classifier import SchemeClassifier
+    from src.api.scheme.workbook import Workbook, WorkbookSchemes
+
+    erot = WorkbookSchemes.get('erot')
+    # литерал выражения встречается только внутри слова заголовка
+    other = Workbook(title='Другая схема', name='other', sheet='Лист1', columns=[
+        {'name': 'Номер', 'document': {'regex': '(?i)^\\d+\\s*номер', 'optional': False}}
+    ])
+    classifier = SchemeClassifier([erot, other])
+    assert other not in [classifier.workbooks[sid] for sid in classifier.scores(['12номер'])]
+    assert classifier.best(['12номер'], limit=1).workbook is other
@@ -0,0 +1,119 @@
+import pickle
+
+import pytest
+
+
+def test_erot_formatters(mock_test_env):
+    from src.api.scheme.workbook import WorkbookSchemes
+
+    erot_scheme = WorkbookSchemes.get('erot')
+    result = erot_scheme.format_columns({
+        'Содержание обязательного требования': ['  Требование  <b>   №1 ', None],
+        'Дата публикации': ['05.03.2021', '2021'],
+        'Категории лиц, обязанных соблюдать обязательное требование': ['ЮЛ; ИП;  ФЛ'],
+    })
+    assert result['Содержание обязательного требования'] == ['Требование b №1', None]
+    assert result['Дата публикации'] == ['2021-03-05', None]
+    assert result['Категории лиц, обязанных соблюдать обязательное требование'] == [['ЮЛ', 'ИП', 'ФЛ']]
+    with pytest.raises(ValueError):
+        erot_scheme.format_columns({'Неизвестный столбец': ['']})
+
+
+def test_database_format(mock_test_env):
+    from src.api.scheme.workbook import WorkbookSchemes
+
+    erot_scheme = WorkbookSchemes.get('erot')
+    result = erot_scheme.format_columns(
+        {'Размер/длительность санкции для физического лица': ['от 100 до 500 рублей']},
+        database=True)
+    assert result['Размер/длительность санкции для физического лица'] == [[{
+        'snct_min': '100', 'snct_max': '500', 'snct_measure': 'рублей'
+    }]]
+
+
+def test_combined_pipeline(mock_test_env):
+    from src.api.scheme.workbook import WorkbookSchemes
+    from src.api.transform import TransformPlan, match_header
+    from tests.test_scheme import EROT_HEADERS
+
+    erot_scheme = WorkbookSchemes.get('erot')
+    name = 'Размер/длительность санкции для физического лица'
+    found = match_header(erot_scheme, EROT_HEADERS)
+    first = TransformPlan.build(erot_scheme, *found, database=True)
+    second = TransformPlan.build(erot_scheme, *found, database=True)
+    position = first.names.index(name)
+    # цепочка строится один раз в плане схемы и разделяется запросами
+    assert first.pipelines[position] is second.pipelines[position]
+    assert first.pipelines[position].batch(['от 100 до 500 рублей'] * 2)[1] == [{
+        'snct_min': '100', 'snct_max': '500', 'snct_measure': 'рублей'
+    }]
+    stats = [s for s in erot_scheme.format_cache() if s['column'] == name and s['chain'] == 'combined']
+    assert stats and stats[0]['misses'] == 1 and stats[0]['hits'] == 1
+    document = TransformPlan.build(erot_scheme, *found)
+    assert document.pipelines[position] is erot_scheme.formatters[name][0]
+
+
+def test_pipeline_pickle(mock_test_env):
+    from src.api.scheme.workbook import WorkbookSchemes
+
+    document, _ = WorkbookSchemes.get('erot').formatters['Дата публикации']
+    restored = pickle.loads(pickle.dumps(document))
+    assert restored.batch(['01.02.2020']) == document.batch(['01.02.2020'])
+    assert restored.memo is not document.memo and restored.memo.name == 'Дата публикации'
+
+
+def test_pipeline_memo(mock_test_env):
+    from src.api.scheme.formatters import FormatPipeline, TextSplit, TextTrim, ValueMemo
+
+    pipeline = FormatPipeline([TextTrim(['\\s{2,}', ' ']), TextSplit([';'])]).memoized('Перечень')
+    values = ['ЮЛ;  ИП', 'ЮЛ;  ИП', None, 5, 'ФЛ']
+    result = pipeline.batch(values)
+    assert result == [['ЮЛ', 'ИП'], ['ЮЛ', 'ИП'], None, ['5'], ['ФЛ']]
+    # повторы форматируются один раз, результаты из кэша передаются копиями
+    assert pipeline.memo.stats()['misses'] == 2
+    assert result[0] is not result[1] and result[0][0] is result[1][0]
+    result[0].append('изменено')
+    assert pipeline.batch(['ЮЛ;  ИП']) == [['ЮЛ', 'ИП']]
+    assert pipeline.memo.stats()['hits'] == 2
+
+    class Probe(ValueMemo):
+        PROBE = 100
+
+    memo = Probe('Текст акта', size=16)
+    unique = [f'текст {i}' for i in range(100)]
+    assert memo.batch(lambda v: [s.upper() for s in v], unique)[99] == 'ТЕКСТ 99'
+    assert not memo.stats()['enabled'] and memo.stats()['size'] == 0
+
+    ValueMemo.EXCLUDE = frozenset({'Текст акта'})
+    try:
+        assert pipeline.memoized('Текст акта').memo is None
+    finally:
+        ValueMemo.EXCLUDE = frozenset()
+
+
+@pytest.mark.parametrize('value,expected', [
+    ('05.03.2021', '2021-03-05'),
+    ('2021-03-05', '2021-03-05'),
+    ('5/3/21', '2021-03-05'),
+    ('03.25.2021', '2021-03-25'),
+    ('31.02.2021', None),
+    ('5 марта 2021 г.', '2021-03-05'),
+    ('«05» Марта 2021 года', '2021-03-05'),
+    ('в сентябре 2020', '2020-09-01'),
+    ('12 сент. 2019', '2019-09-12'),
+    ('декабрём 2018', '2018-12-01'),
+    ('Mar 5 2021', '2021-03-05'),
+    ('нет даты', None),
+])
+def test_parse_date(value, expected):
+    from src.api.scheme.dates import parse_date
+
+    assert parse_date(value) == expected
+
+
+def test_date_input_batch(mock_test_env):
+    from src.api.scheme.workbook import WorkbookSchemes
+
+    document, _ = WorkbookSchemes.get('erot').formatters['Дата публикации']
+    values = ['05.03.2021', ' 7 апреля 2020 г.', None, '05.03.2021', 'текст']
+    assert document.batch(values) == ['2021-03-05', '2020-04-07', None, '2021-03-05', None]
@@ -0,0 +1,111 @@
+import pytest
+
+from tests.test_storage import schemes, client
+
+
+@pytest.mark.parametrize('regex', [
+    r'(a+)+b',
+    r'(?:\s*\w+)+$',
+    r'^(a\w|\wa)+$',
+    r'(?i)^(?:[а-я]+\s?)+$',
+])
+def test_inspect_hazards(regex):
+    from src.api.scheme.guard import inspect
+
+    report = inspect(regex)
+    assert not report.accepted
+    # выражения с экспоненциальным возвратом не выполняются
+    assert report.length == 0
+
+
+@pytest.mark.parametrize('regex', [
+    r'(?i)^стату[а-я]+\s*работ[а-я]+\s*с\s*требовани[а-я]+',
+    r'(\d{2})+',
+    r'^(ab|a\w)+$',
+    r'(?:ab)+b',
+])
+def test_inspect_accepted(regex):
+    from src.api.scheme.guard import inspect
+
+    assert inspect(regex).accepted
+
+
+def test_inspect_budget():
+    from src.api.scheme.guard import SCAN, inspect
+
+    report = inspect(r'\s*\s*\s*x', SCAN, budget=0.001)
+    assert not report.accepted
+    assert report.seconds > 0.001
+
+
+def test_inspect_pause(monkeypatch):
+    from src.api.scheme import guard
+
+    calls = []
+
+    def paused(evaluate, probe, repeat=1):
+        calls.append(repeat)
+        # однократная пауза при первом измерении
+        return 1.0 if len(calls) == 1 else 0.0
+
+    monkeypatch.setattr(guard, 'elapsed', paused)
+    assert guard.inspect(r'(?:ab)+b', budget=0.05).accepted
+    assert calls[1] == guard.CONFIRM_REPEAT
+
+
+def test_inspect_not_cached(monkeypatch):
+    from src.api.scheme import guard
+
+    # превышение подтверждено повторными измерениями
+    monkeypatch.setattr(guard, 'elapsed', lambda evaluate, probe, repeat=1: 1.0)
+    assert not guard.inspect(r'(?:cd)+e', budget=0.05).accepted
+    # после паузы то же выражение проверяется заново и принимается
+    monkeypatch.setattr(guard, 'elapsed', lambda evaluate, probe, repeat=1: 0.0)
+    assert guard.inspect(r'(?:cd)+e', budget=0.05).accepted
+
+
+def test_regex_costs_bounded():
+    from src.api.scheme.guard import RegexCosts
+
+    costs = RegexCosts(maxsize=2)
+    for regex in ('a', 'b', 'c'):
+        costs.record(('TextSplit', regex), 1, 1e-6)
+    assert [key for key, _ in costs.items()] == [('TextSplit', 'b'), ('TextSplit', 'c')]
+
+
+def test_scheme_regex_guard(schemes, client):
+    from src.api.exceptions import SchemeRegexRejected
+
+    data = schemes.get('erot').dict()
+    # выражения сохраненной схемы принимаются
+    assert schemes.write('erot', data) == 1
+    data['columns'][0]['document']['regex'] = r'(?i)^(№\s*)+п\S+п$'
+    with pytest.raises(SchemeRegexRejected):
+        schemes.write('erot', data)
+    response = client.patch('/documents/schemes/erot/columns/ID требования', json=[
+        {'op': 'replace', 'path': '/document/format', 'value': [
+            {'formatter': 'TextSplit', 'options': [r'(\s*,)+']}]},
+    ])
+    assert response.status_code == 422 and 'TextSplit' in response.json()['error']
+    data['name'] = 'erot_copy'
+    assert client.post('/documents/schemes/erot_copy', json=data).status_code == 422
+    schemes.REGEX_POLICY = 'flag'
+    data['name'] = 'erot'
+    assert schemes.write('erot', data) == 2
+
+
+def test_regex_costs(client, schemes):
+    from src.api.scheme.guard import MATCH, costs
+
+    costs.clear()
+    scheme = schemes.get('erot')
+    scheme.verify([c.name for c in scheme.columns])
+    scheme.format_columns({'Ссылка': [' a  b ']})
+    assert costs.get((MATCH, 'erot'))['values'] == len(scheme.columns)
+    report = client.get('/documents/schemes/erot/regex').json()
+    assert report['matcher']['calls'] == 1
+    assert all(r['accepted'] for r in report['regexes'])
+    # время форматтеров учитывается по выражению, общему для нескольких столбцов
+    used = {r['regex'] for r in report['regexes'] if r['column'] == 'Ссылка' and r['formatter']}
+    assert used
+    assert {r['regex'] for r in report['regexes'] if r['cost']} == used
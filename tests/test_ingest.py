@@ -0,0 +1,191 @@
+import io
+
+import json
+
+import zipfile
+
+from xml.sax.saxutils import escape
+
+import pytest
+
+from tests.test_scheme import EROT_HEADERS
+
+
+def column_letters(number: int) -> str:
+    letters = ''
+    number += 1
+    while number:
+        number, rest = divmod(number - 1, 26)
+        letters = chr(65 + rest) + letters
+    return letters
+
+
+def make_xlsx(sheet: str, rows: list) -> bytes:
+    """
+    Минимальный документ xlsx с общей таблицей строк
+    """
+    strings = []
+    index = {}
+    xml_rows = []
+    for r, row in enumerate(rows, start=1):
+        cells = []
+        for c, value in enumerate(row):
+            ref = f'{column_letters(c)}{r}'
+            if value is None:
+                continue
+            if isinstance(value, str):
+                if value not in index:
+                    index[value] = len(strings)
+                    strings.append(value)
+                cells.append(f'<c r="{ref}" t="s"><v>{index[value]}</v></c>')
+            else:
+                cells.append(f'<c r="{ref}"><v>{value}</v></c>')
+        xml_rows.append(f'<row r="{r}">{"".join(cells)}</row>')
+    ns = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as z:
+        z.writestr('xl/workbook.xml',
+                   f'<workbook {ns} xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+                   f'<sheets><sheet name="{escape(sheet)}" sheetId="1" r:id="rId1"/></sheets></workbook>')
+        z.writestr('xl/_rels/workbook.xml.rels',
+                   '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                   '<Relationship Id="rId1" Target="worksheets/sheet1.xml"/></Relationships>')
+        z.writestr('xl/sharedStrings.xml',
+                   f'<sst {ns}>' + ''.join(f'<si><t>{escape(s)}</t></si>' for s in strings) + '</sst>')
+        z.writestr('xl/worksheets/sheet1.xml',
+                   f'<worksheet {ns}><sheetData>{"".join(xml_rows)}</sheetData></worksheet>')
+    return buffer.getvalue()
+
+
+def erot_rows(count: int) -> list:
+    row = ['1', '100', '  Требование   №1 ', 'Опубликовано', '05.03.2021']
+    row += ['значение'] * (len(EROT_HEADERS) - len(row))
+    return [row for _ in range(count)]
+
+
+@pytest.fixture
+def client(mock_test_env):
+    from fastapi.testclient import TestClient
+    from src.service.asgi import app
+
+    return TestClient(app)
+
+
+def test_ingest_xlsx(client):
+    content = make_xlsx('Реестр обязательных требований',
+                        [['Дата и время формирования отчета', '01.01.2022'], [], EROT_HEADERS] + erot_rows(3))
+    response = client.post('/documents/schemes/erot/ingest', data=content)
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line['row'] for line in lines] == [4, 5, 6]
+    record = lines[0]['data']
+    assert record['Содержание обязательного требования'] == 'Требование №1'
+    assert record['Дата публикации'] == '2021-03-05'
+
+
+def test_ingest_csv_detect(client):
+    content = '\n'.join(';'.join(row) for row in [EROT_HEADERS] + erot_rows(2)).encode('utf8')
+    response = client.post('/documents/ingest', data=content)
+    assert response.status_code == 200
+    assert response.headers['X-Scheme-Name'] == 'erot'
+    assert len(response.text.splitlines()) == 2
+
+
+def test_ingest_header_not_found(client):
+    response = client.post('/documents/schemes/erot/ingest', data='a;b\n1;2\n'.encode('utf8'))
+    assert response.status_code == 422
+
+
+def test_ingest_broken_xlsx(client):
+    response = client.post('/documents/schemes/erot/ingest', data=b'PK\x03\x04' + b'\x00' * 64)
+    assert response.status_code == 422
+
+
+def test_ingest_internal_error(client, monkeypatch):
+    from fastapi.testclient import TestClient
+    from src.service.asgi import app
+    from src.service.routes import documents
+
+    def locate(*args):
+        raise AttributeError('locate')
+
+    monkeypatch.setattr(documents, 'locate', locate)
+    response = TestClient(app, raise_server_exceptions=False).post(
+        '/documents/schemes/erot/ingest', data=b'a;b\n1;2\n')
+    assert response.status_code == 500
+
+
+def test_ingest_spooled_to_disk(client, monkeypatch):
+    from src.service.routes import documents
+
+    monkeypatch.setattr(documents.settings, 'ingest_spool_size', 64)
+    content = '\n'.join(';'.join(row) for row in [EROT_HEADERS] + erot_rows(20)).encode('utf8')
+    response = client.post('/documents/schemes/erot/ingest', data=content)
+    assert response.status_code == 200
+    assert len(response.text.splitlines()) == 20
+
+
+def test_transform_process_pool(mock_test_env):
+    from concurrent.futures import ProcessPoolExecutor
+
+    from src.api.scheme.workbook import WorkbookSchemes
+    from src.api.transform import TransformPlan, match_header, transform
+
+    workbook = WorkbookSchemes.get('erot')
+    plan = TransformPlan.build(workbook, *match_header(workbook, EROT_HEADERS))
+    rows = [[f'{value} {i}' for value in row] for i, row in enumerate(erot_rows(50))]
+    expected = [r for block in transform(plan, iter(rows), 2, size=7) for r in block]
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        result = [r for block in transform(plan, iter(rows), 2, size=7,
+                                           executor=executor, window=4) for r in block]
+    assert result == expected
+    assert [number for number, _ in result] == list(range(2, 52))
+
+
+def test_negotiate():
+    from src.api.encoders import ARROW, MSGPACK, NDJSON, available, negotiate
+
+    assert negotiate(None) == NDJSON
+    assert negotiate('*/*') == NDJSON
+    assert negotiate('text/csv') is None
+    assert negotiate('application/x-ndjson;q=0.5, application/msgpack') == (
+        MSGPACK if available(MSGPACK) else NDJSON)
+    assert negotiate(f'{ARROW}, {NDJSON};q=0.1') == (ARROW if available(ARROW) else NDJSON)
+
+
+def test_ingest_not_acceptable(client):
+    content = '\n'.join(';'.join(row) for row in [EROT_HEADERS] + erot_rows(2)).encode('utf8')
+    response = client.post('/documents/ingest', data=content, headers={'Accept': 'text/csv'})
+    assert response.status_code == 406
+
+
+def test_ingest_msgpack(client):
+    msgpack = pytest.importorskip('msgpack')
+
+    content = '\n'.join(';'.join(row) for row in [EROT_HEADERS] + erot_rows(3)).encode('utf8')
+    response = client.post('/documents/ingest', data=content,
+                           headers={'Accept': 'application/x-msgpack'})
+    assert response.headers['content-type'] == 'application/x-msgpack'
+    header, *rows = msgpack.Unpacker(io.BytesIO(response.content), raw=False)
+    assert header['scheme'] == 'erot' and len(header['columns']) == len(rows[0][1])
+    assert [number for number, _ in rows] == [2, 3, 4]
+    record = dict(zip(header['columns'], rows[0][1]))
+    assert record['Содержание обязательного требования'] == 'Требование №1'
+
+
+def test_ingest_arrow(client):
+    pa = pytest.importorskip('pyarrow')
+
+    content = make_xlsx('Реестр обязательных требований', [EROT_HEADERS] + erot_rows(3))
+    response = client.post('/documents/schemes/erot/ingest', data=content,
+                           params={'database': True},
+                           headers={'Accept': 'application/vnd.apache.arrow.stream'})
+    assert response.status_code == 200
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.column('row').to_pylist() == [2, 3, 4]
+    assert table.column('Дата публикации').to_pylist()[0] == '2021-03-05'
+    groups = json.loads(table.schema.metadata[b'groups'])
+    # столбцы сгруппированы по модели ORM
+    names = [name for columns in groups.values() for name in columns]
+    assert table.schema.names[1:] == names
+    assert table.schema.field(names[0]).metadata[b'orm'].decode() == next(iter(groups))
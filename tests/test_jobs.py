@@ -0,0 +1,146 @@
+import os
+
+import json
+
+import time
+
+import pytest
+
+from tests.test_scheme import EROT_HEADERS
+from tests.test_ingest import client, erot_rows, make_xlsx
+
+
+@pytest.fixture
+def runner(tmp_path, monkeypatch):
+    from src.api.jobs import JobQueue, JobRunner
+    from src.service.routes import jobs
+
+    runner = JobRunner(JobQueue(str(tmp_path)), jobs.execute, workers=2, poll=0.05)
+    monkeypatch.setattr(jobs, 'runner', runner)
+    runner.start()
+    yield runner
+    runner.stop()
+
+
+def wait(client, location: str, timeout: float = 10) -> dict:
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get(location).json()
+        if job['state'] in ('done', 'failed') or time.monotonic() > deadline:
+            return job
+        time.sleep(0.02)
+
+
+def test_job_xlsx(client, runner):
+    content = make_xlsx('Реестр обязательных требований', [EROT_HEADERS] + erot_rows(25))
+    response = client.post('/documents/jobs/schemes/erot', data=content)
+    assert response.status_code == 202
+    assert response.json()['state'] == 'queued'
+    job = wait(client, response.headers['Location'])
+    assert job['state'] == 'done'
+    assert job['scheme'] == 'erot'
+    assert job['rows'] == 25
+    assert job['size'] == len(content)
+    result = client.get(job['result'])
+    assert result.headers['X-Scheme-Name'] == 'erot'
+    lines = [json.loads(line) for line in result.text.splitlines()]
+    assert [line['row'] for line in lines] == list(range(2, 27))
+    assert lines[0]['data']['Дата публикации'] == '2021-03-05'
+
+
+def test_job_failed(client, runner):
+    response = client.post('/documents/jobs', data='a;b\n1;2\n'.encode('utf8'))
+    job = wait(client, response.headers['Location'])
+    assert job['state'] == 'failed'
+    assert job['error'] == 'Строка заголовка документа не найдена'
+    assert client.get(f'/documents/jobs/{job["id"]}/result').status_code == 409
+    assert client.get('/documents/jobs/unknown').status_code == 404
+    assert client.post('/documents/jobs/schemes/unknown', data=b'').status_code == 404
+
+
+def test_job_queue_recover(tmp_path):
+    from src.api.jobs import QUEUED, RUNNING, JobQueue
+
+    queue = JobQueue(str(tmp_path))
+    jobs = []
+    for i in range(2):
+        job = queue.new(json.dumps({'n': i}))
+        with open(job.upload, 'wb') as f:
+            f.write(b'data')
+        jobs.append(queue.submit(job))
+    claimed = queue.claim()
+    assert claimed.id == jobs[0].id and claimed.state == RUNNING
+    # задание выбирается одним исполнителем
+    assert queue.claim().id == jobs[1].id
+    assert queue.claim() is None
+    assert queue.recover(stale=60) == 0
+    assert queue.recover() == 2
+    assert queue.get(jobs[0].id).state == QUEUED
+    queue.finish(queue.claim())
+    assert queue.purge(retention=-1) == 1
+    assert queue.get(jobs[0].id) is None
+    assert not (tmp_path / f'{jobs[0].id}.upload').exists()
+
+
+def test_job_lease(tmp_path):
+    from src.api.jobs import DONE, JobQueue, JobRunner, LeaseLost
+
+    queue = JobQueue(str(tmp_path))
+    job = queue.new('{}')
+    with open(job.upload, 'wb') as f:
+        f.write(b'data')
+    queue.submit(job)
+    first = queue.claim()
+    # выполнение дольше stale: задание возвращено в очередь и выбрано повторно
+    assert queue.recover() == 1
+    second = queue.claim()
+    assert second.lease != first.lease and second.part != first.part
+    with pytest.raises(LeaseLost):
+        queue.progress(first, 10)
+    with open(first.part, 'wb') as f:
+        f.write(b'first')
+    assert not queue.finish(first)
+    with open(second.part, 'wb') as f:
+        f.write(b'second')
+    assert queue.finish(second)
+    assert queue.get(job.id).state == DONE
+    assert (tmp_path / f'{job.id}.result').read_bytes() == b'second'
+
+    # прежний исполнитель не удаляет документ, нужный новому
+    runs = []
+
+    def execute(job, progress):
+        runs.append(job.lease)
+        if len(runs) == 1:
+            queue.recover()
+        with open(job.part, 'wb') as f:
+            f.write(b'ok')
+        progress(1)
+
+    runner = JobRunner(queue, execute, stale=60)
+    job = queue.new('{}')
+    with open(job.upload, 'wb') as f:
+        f.write(b'data')
+    queue.submit(job)
+    runner.run(queue.claim())
+    assert os.path.exists(job.upload) and not os.path.exists(os.path.join(
+        str(tmp_path), f'{job.id}.{runs[0]}.part'))
+    runner.run(queue.claim())
+    assert queue.get(job.id).state == DONE and not os.path.exists(job.upload)
+
+
+def test_job_runner_maintain(tmp_path, monkeypatch):
+    from src.api.jobs import JobQueue, JobRunner
+
+    queue = JobQueue(str(tmp_path))
+    calls = []
+    monkeypatch.setattr(queue, 'recover', lambda stale: calls.append('recover') or 0)
+    monkeypatch.setattr(queue, 'purge', lambda retention: calls.append('purge') or 0)
+    runner = JobRunner(queue, lambda job, progress: None, stale=60)
+    for _ in range(5):
+        runner.maintain()
+    # очередь проверяется не на каждой итерации ожидания
+    assert calls == ['recover', 'purge']
+    runner._maintained -= 31
+    runner.maintain()
+    assert calls == ['recover', 'purge'] * 2
@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+from tests.test_scheme import EROT_HEADERS
+
+
+@pytest.fixture
+def metrics_client(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    from src.service.asgi import app, metrics
+    from src.service.metrics import MetricsMiddleware
+
+    # профилирование включается для промежуточного слоя уже собранного приложения
+    app.middleware_stack = app.build_middleware_stack()
+    layer = app.middleware_stack
+    while not isinstance(layer, MetricsMiddleware):
+        layer = layer.app
+    monkeypatch.setattr(layer, 'profiles', str(tmp_path))
+    monkeypatch.setattr(metrics, 'requests', {})
+    return TestClient(app)
+
+
+def test_metrics(metrics_client):
+    assert metrics_client.get('/documents/validate', params={'headers': EROT_HEADERS}).status_code == 200
+    assert metrics_client.get('/documents/schemes/erot').status_code == 200
+    assert metrics_client.get('/unknown').status_code == 404
+    response = metrics_client.get('/api/metrics')
+    assert response.headers['content-type'].startswith('text/plain; version=0.0.4')
+    text = response.text
+    assert ('schemes_http_request_duration_seconds_count'
+            '{method="GET",route="/documents/schemes/{schema_name}",status="200"} 1') in text
+    assert 'route="<unmatched>",status="404"' in text
+    assert 'schemes_registry_parsed_total{source="documents"}' in text
+    assert 'schemes_regex_evaluations_total{scheme="erot"}' in text
+    assert 'schemes_cache_misses_total{cache="validation"}' in text
+    # каждая строка значения содержит наименование и число
+    for line in text.splitlines():
+        if not line.startswith('#'):
+            float(line.rsplit(' ', 1)[1].replace('+Inf', 'inf'))
+
+
+def test_metrics_profile(metrics_client, tmp_path):
+    response = metrics_client.get('/documents/schemes/erot', headers={'X-Profile': '1'})
+    output = response.headers['x-profile-output']
+    name = os.path.basename(output)
+    assert output == str(tmp_path / name) and name.startswith('profile-')
+    assert os.path.exists(tmp_path / name)
+    # профили не раздаются как статические файлы
+    assert metrics_client.get(f'/tmp/{name}').status_code == 404
+    assert 'cumulative' in (tmp_path / f'{name}.txt').read_text(encoding='utf8')
+    assert 'x-profile-output' not in metrics_client.get('/documents/schemes/erot').headers
@@ -0,0 +1,66 @@
+import pickle
+
+import pytest
+
+from tests.test_scheme import EROT_HEADERS
+
+
+@pytest.fixture
+def record_plan(mock_test_env):
+    from src.api.scheme.workbook import WorkbookSchemes
+    from src.api.transform import TransformPlan
+    from src.api.records import RecordPlan
+
+    erot_scheme = WorkbookSchemes.get('erot')
+    found = erot_scheme.matcher.classify(EROT_HEADERS)
+    plan = TransformPlan.build(erot_scheme, found, list(range(len(found))))
+    return RecordPlan.build(erot_scheme, plan)
+
+
+def erot_row(sanction: str = 'от 100 до 500 рублей') -> list:
+    row = ['1', '100', 'Требование', 'Опубликовано', '05.03.2021']
+    row += [None] * (len(EROT_HEADERS) - len(row))
+    row[33], row[34] = 'Штраф', sanction
+    row[39] = 'Штраф'
+    return row
+
+
+def test_record_groups(record_plan):
+    sanctions = [g for g in record_plan.groups if g.orm == 'Sanction']
+    assert len(sanctions) == 4
+    assert record_plan.tables['Sanction'] == (
+        'snct_title', 'snct_subject', 'snct_content', 'snct_min', 'snct_max',
+        'snct_measure', 'snct_comments')
+    batches = {b.orm: b for b in pickle.loads(pickle.dumps(record_plan)).records([4], [erot_row()])}
+    assert list(batches) == ['Base', 'Description', 'Sanction']
+    sanction = batches['Sanction']
+    assert [dict(zip(sanction.fields, r)) for r in sanction.rows()] == [
+        {'row': 4, 'snct_title': ['Штраф'], 'snct_subject': 'Ответственность для физического лица',
+         'snct_content': ['от 100 до 500 рублей'], 'snct_min': ['100'], 'snct_max': ['500'],
+         'snct_measure': ['рублей'], 'snct_comments': None},
+        {'row': 4, 'snct_title': ['Штраф'], 'snct_subject': 'Ответственность для юридического лица',
+         'snct_content': None, 'snct_min': None, 'snct_max': None,
+         'snct_measure': None, 'snct_comments': None},
+    ]
+
+
+def test_sqlite_sink(record_plan):
+    from src.api.records import SQLiteSink, load
+
+    class CountingSink(SQLiteSink):
+        def __init__(self):
+            super().__init__()
+            self.batches = []
+
+        def write(self, batches):
+            self.batches.extend((b.orm, len(b)) for b in batches)
+            return super().write(batches)
+
+    sink = CountingSink()
+    assert load(record_plan, iter([erot_row()] * 2500), 4, sink, size=1000) == 2500 * 4
+    # по одному пакету на модель для каждого блока строк
+    assert sink.batches[:3] == [('Base', 1000), ('Description', 1000), ('Sanction', 2000)]
+    assert len(sink.batches) == 9
+    count, = sink.connection.execute('SELECT count(*) FROM "Sanction"').fetchone()
+    assert count == 5000
+    sink.close()
@@ -0,0 +1,159 @@
+import os
+
+import json
+
+import shutil
+
+import pytest
+
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'documents')
+
+
+@pytest.fixture
+def registry(tmp_path):
+    from src.api.registry import SchemeRegistry
+    from src.api.scheme.workbook import Workbook
+
+    shutil.copy(os.path.join(DATA_PATH, 'erot.json'), tmp_path / 'erot.json')
+    return SchemeRegistry(str(tmp_path), Workbook)
+
+
+def test_registry_cached(registry):
+    registry.refresh()
+    scheme = registry.get('erot')
+    registry.refresh()
+    assert registry.get('erot') is scheme
+    assert registry.all() == [scheme]
+
+
+def test_registry_reload_changed(registry, tmp_path):
+    registry.refresh()
+    scheme = registry.get('erot')
+    data = json.loads((tmp_path / 'erot.json').read_text(encoding='utf8'))
+    data['title'] = 'Обновленная схема'
+    (tmp_path / 'erot.json').write_text(json.dumps(data, ensure_ascii=False), encoding='utf8')
+    registry.refresh()
+    assert registry.get('erot') is not scheme
+    assert registry.get('erot').title == 'Обновленная схема'
+
+
+def test_registry_store_and_remove(registry, tmp_path):
+    from src.api.exceptions import SchemeNotFound
+    from src.api.scheme.workbook import Workbook
+
+    registry.refresh()
+    data = registry.get('erot').dict()
+    data['name'] = 'erot_copy'
+    content = json.dumps(data, ensure_ascii=False).encode('utf8')
+    (tmp_path / 'erot_copy.json').write_bytes(content)
+    model = Workbook(**data)
+    registry.store('erot_copy.json', content, model)
+    registry.refresh()
+    assert registry.get('erot_copy') is model
+    os.remove(tmp_path / 'erot.json')
+    registry.refresh()
+    with pytest.raises(SchemeNotFound):
+        registry.get('erot')
+
+
+def test_registry_encoded_invalidated(registry, tmp_path):
+    registry.refresh()
+    encoded, collection = registry.entry('erot').encoded, registry.encoded()
+    assert registry.entry('erot').encoded is encoded
+    assert json.loads(collection.body)[0]['name'] == 'erot'
+    data = json.loads(encoded.body)
+    data['title'] = 'Обновленная схема'
+    content = json.dumps(data, ensure_ascii=False).encode('utf8')
+    (tmp_path / 'erot.json').write_bytes(content)
+    registry.store('erot.json', content, registry.factory(**data))
+    assert registry.entry('erot').encoded.etag != encoded.etag
+    assert registry.encoded().etag != collection.etag
+
+
+def test_registry_generation(tmp_path):
+    from src.api.generation import Generation
+    from src.api.registry import SchemeRegistry
+    from src.api.scheme.workbook import Workbook
+
+    documents = tmp_path / 'documents'
+    documents.mkdir()
+    shutil.copy(os.path.join(DATA_PATH, 'erot.json'), documents / 'erot.json')
+    # два процесса с общим файлом счетчика
+    writer, reader = Generation(str(tmp_path / '.generation')), Generation(str(tmp_path / '.generation'))
+    registry = SchemeRegistry(str(documents), Workbook, reader)
+    registry.refresh()
+    data = json.loads((documents / 'erot.json').read_text(encoding='utf8'))
+    data['title'] = 'Обновленная схема'
+    (documents / 'erot.json').write_text(json.dumps(data, ensure_ascii=False), encoding='utf8')
+    # без изменения счетчика директория не сверяется
+    registry.refresh()
+    assert registry.get('erot').title != 'Обновленная схема'
+    assert writer.bump() == reader.value() == 1
+    registry.refresh()
+    assert registry.get('erot').title == 'Обновленная схема'
+    # схема, добавленная без API сервиса, учитывается по mtime директории
+    data['name'] = 'erot_copy'
+    (documents / 'erot_copy.json').write_text(json.dumps(data, ensure_ascii=False), encoding='utf8')
+    registry.refresh()
+    assert [s.name for s in registry.all()] == ['erot', 'erot_copy']
+    # изменение файла на месте учитывается после интервала принудительной сверки
+    registry.rescan = 1e9
+    registry.refresh()
+    data['title'] = 'Изменена вручную'
+    (documents / 'erot_copy.json').write_text(json.dumps(data, ensure_ascii=False), encoding='utf8')
+    registry.refresh()
+    assert registry.get('erot_copy').title != 'Изменена вручную'
+    registry.rescan = 1e-9
+    registry.refresh()
+    assert registry.get('erot_copy').title == 'Изменена вручную'
+    writer.close()
+    reader.close()
+
+
+def test_registry_async_refresh(registry, tmp_path):
+    import asyncio
+
+    asyncio.run(registry.arefresh())
+    scheme = registry.get('erot')
+    data = json.loads((tmp_path / 'erot.json').read_text(encoding='utf8'))
+    data['name'] = 'erot_copy'
+    (tmp_path / 'erot_copy.json').write_text(json.dumps(data, ensure_ascii=False), encoding='utf8')
+    asyncio.run(registry.arefresh())
+    assert registry.get('erot') is scheme
+    assert [s.name for s in registry.all()] == ['erot', 'erot_copy']
+    (tmp_path / 'erot_copy.json').unlink()
+    asyncio.run(registry.arefresh())
+    assert registry.all() == [scheme]
+
+
+def test_registry_snapshot(registry, tmp_path):
+    from src.api.registry import SchemeRegistry
+    from src.api.scheme.workbook import Workbook
+
+    registry.refresh()
+    snapshot = str(tmp_path / '.snapshot')
+    registry.snapshot(snapshot, b'key')
+    restored = SchemeRegistry(str(tmp_path), Workbook)
+    assert restored.restore(snapshot, b'key')
+    restored.refresh()
+    assert (restored.restored, restored.parsed) == (1, 0)
+    assert restored.get('erot') == registry.get('erot')
+    # измененный файл разбирается, снимок для него не используется
+    data = json.loads((tmp_path / 'erot.json').read_text(encoding='utf8'))
+    data['title'] = 'Обновленная схема'
+    (tmp_path / 'erot.json').write_text(json.dumps(data, ensure_ascii=False), encoding='utf8')
+    changed = SchemeRegistry(str(tmp_path), Workbook)
+    assert changed.restore(snapshot, b'key')
+    changed.refresh()
+    assert (changed.restored, changed.parsed) == (0, 1)
+    assert changed.get('erot').title == 'Обновленная схема'
+    (tmp_path / '.broken').write_bytes(b'not a snapshot')
+    assert not changed.restore(str(tmp_path / '.broken'), b'key')
+    # снимок без ключа, с другим ключом или измененный не распаковывается
+    assert not SchemeRegistry(str(tmp_path), Workbook).restore(snapshot, None)
+    assert not SchemeRegistry(str(tmp_path), Workbook).restore(snapshot, b'other')
+    content = bytearray((tmp_path / '.snapshot').read_bytes())
+    content[-1] ^= 1
+    (tmp_path / '.snapshot').write_bytes(bytes(content))
+    assert not SchemeRegistry(str(tmp_path), Workbook).restore(snapshot, b'key')
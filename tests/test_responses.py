@@ -0,0 +1,82 @@
+import pytest
+
+
+@pytest.fixture
+def client(mock_test_env):
+    from fastapi.testclient import TestClient
+    from src.service.asgi import app
+
+    return TestClient(app)
+
+
+@pytest.mark.parametrize('url', ['/documents/schemes/erot', '/documents/schemes'])
+def test_conditional_get(client, url):
+    response = client.get(url, headers={'Accept-Encoding': 'identity'})
+    assert response.status_code == 200
+    etag = response.headers['etag']
+    assert response.headers['last-modified']
+    assert 'content-encoding' not in response.headers
+    cached = client.get(url, headers={'If-None-Match': f'W/{etag}'})
+    assert cached.status_code == 304
+    assert cached.content == b''
+    assert client.get(url, headers={'If-None-Match': '"other"'}).status_code == 200
+
+
+def test_gzip_response(client):
+    response = client.get('/documents/schemes/erot', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['content-encoding'] == 'gzip'
+    assert response.json()['name'] == 'erot'
+    assert client.get('/documents/schemes/unknown').status_code == 404
+
+
+def test_validation_cache(client):
+    from src.service.routes.workbooks import validation_cache
+    from tests.test_scheme import EROT_HEADERS
+
+    validation_cache.clear()
+    before = validation_cache.stats()
+    first = client.get('/documents/validate', params={'headers': EROT_HEADERS})
+    # пробелы по краям и повторяющиеся пробелы не влияют на ключ кэша
+    second = client.get('/documents/validate', params={'headers': [f' {h}  ' for h in EROT_HEADERS]})
+    assert first.json()['data']['schema'] == 'erot'
+    assert second.content == first.content
+    stats = client.get('/documents/validate/cache').json()
+    assert stats['misses'] - before['misses'] == 1
+    assert stats['hits'] - before['hits'] == 1
+
+
+def test_validate_batch(client):
+    from src.service.routes.workbooks import validation_cache
+    from tests.test_scheme import EROT_HEADERS
+
+    validation_cache.clear()
+    single = client.get('/documents/validate', params={'headers': EROT_HEADERS}).json()
+    response = client.post('/documents/validate/batch', json=[
+        EROT_HEADERS,
+        {'headers': EROT_HEADERS, 'sheet': ' Отчет '},
+        {'headers': ['Неизвестный столбец']},
+        {'headers': []},
+    ])
+    assert response.status_code == 200
+    result = response.json()
+    assert len(result) == 4
+    # результаты совпадают с проверкой отдельных наборов и возвращаются в порядке запроса
+    assert result[0] == single
+    assert result[1]['data']['schema'] == 'erot'
+    assert result[2]['error'] and result[3]['error']
+
+
+def test_classify_sheet():
+    from src.api.scheme.classifier import SchemeClassifier
+    from src.api.scheme.workbook import WorkbookSchemes
+    from tests.test_scheme import EROT_HEADERS
+
+    erot = WorkbookSchemes.get('erot')
+    other = erot.copy(update={'name': 'other', 'sheet': 'Другой лист'})
+    classifier = SchemeClassifier([erot, other])
+    # при совпадении наименования листа первой проверяется схема этого листа
+    assert classifier.classify(EROT_HEADERS, limit=1, sheet='другой  лист')[0].workbook is other
+    batch = classifier.classify_batch([(EROT_HEADERS, None), (EROT_HEADERS, 'Другой лист'),
+                                       (EROT_HEADERS, None)], limit=1)
+    assert batch[0] is batch[2]
+    assert batch[1][0].workbook is other
@@ -1,67 +1,62 @@
-import os 
-
 import pytest
 
 
-@pytest.fixture(autouse=True, scope='session') 
-def mock_test_env():
-    os.environ['SCHEMES_PATH'] = "/home/rost/Development/GIS_OK/schemes/data"
+EROT_HEADERS = [
+    '№ п/п', 'ID требования', 'Содержание обязательного требования',
+    'Статус публикации', 'Дата публикации', 'Статус работы с требованием',
+    'Уровень регулирования',
+    'Реквизиты структурной единицы акта, содержащего обязательное требование',
+    'Текст структурной единицы акта, содержащей обязательное требование',
+    'Срок действия обязательного требования',
+    'Статус обязательного требования',
+    'Объект, к которому предъявляются обязательные требования',
+    'Категории лиц, обязанных соблюдать обязательное требование',
+    'Иные категории лиц, обязанных соблюдать обязательное требование',
+    'Форма оценки соблюдения обязательного требования',
+    'Вид государственного контроля (надзора) или разрешительной деятельности',
+    'Орган, ответственный за внесение сведений',
+    'Орган, проверяющий соответствие обязательному требованию',
+    'Проверочный вопрос', 'Вид акта', 'Название акта', 'Текст акта',
+    'Утвердивший орган', 'Дата утверждения акта', 'Номер акта', 'ID акта',
+    'Гиперссылка на текст акта (www.pravo.gov.ru)',
+    'Наименование акта, устанавливающего ответственность за несоблюдение обязательного требования',
+    'Статья акта, устанавливающая ответственность за несоблюдение обязательного требования',
+    'Часть статьи акта, устанавливающей ответственность за несоблюдение обязательного требования',
+    'Текст структурной единицы акта, устанавливающей ответственность за несоблюдение обязательного требования',
+    'Органы власти, привлекающие к ответственности за несоблюдение обязательного требования',
+    'Субъект ответственности за несоблюдение обязательного требования',
+    'Ответственность для физического лица',
+    'Размер/длительность санкции для физического лица',
+    'Комментарии для физического лица',
+    'Ответственность для индивидуального предпринимателя',
+    'Размер/длительность санкции для индивидуального предпринимателя',
+    'Комментарии для индивидуального предпринимателя',
+    'Ответственность для юридического лица',
+    'Размер/длительность санкции для юридического лица',
+    'Комментарии для юридического лица',
+    'Ответственность для должностного лица',
+    'Размер/длительность санкции для должностного лица',
+    'Комментарии для должностного лица',
+    'Сферы общественных отношений, затрагиваемые обязательным требованием',
+    'Виды экономической деятельности лиц, обязанных соблюдать обязательное требование',
+    'Оценка затрат лиц, в отношении которых устанавливается обязательное требование, на его исполнение, а также информация об уровне причиненного охраняемым законом ценностям вреда (ущерба)',
+    'Перечень документов (сведений), подтверждающих соответствие субъекта (объекта) обязательному требованию',
+    'Орган, осуществляющий выдачу документов или предоставление сведений, подтверждающих соответствие субъекта (объекта) обязательному требованию',
+    'Иные органы, осуществляющие выдачу документов или предоставление сведений, подтверждающих соответствие субъекта (объекта) обязательному требованию',
+    'Гиперссылки на утвержденные проверочные листы (при наличии)',
+    'Гиперссылки на руководства по соблюдению обязательных требований (при наличии)',
+    'Гиперссылки на доклады о достижении целей введения обязательных требований (при наличии)',
+    'GUID', 'Ссылка'
+]
 
 
 def test_erot_match(mock_test_env):
     from src.api.scheme.workbook import WorkbookSchemes
 
-    headers = [
-        '№ п/п', 'ID требования', 'Содержание обязательного требования',
-        'Статус публикации', 'Дата публикации', 'Статус работы с требованием',
-        'Уровень регулирования',
-        'Реквизиты структурной единицы акта, содержащего обязательное требование',
-        'Текст структурной единицы акта, содержащей обязательное требование',
-        'Срок действия обязательного требования',
-        'Статус обязательного требования',
-        'Объект, к которому предъявляются обязательные требования',
-        'Категории лиц, обязанных соблюдать обязательное требование',
-        'Иные категории лиц, обязанных соблюдать обязательное требование',
-        'Форма оценки соблюдения обязательного требования',
-        'Вид государственного контроля (надзора) или разрешительной деятельности',
-        'Орган, ответственный за внесение сведений',
-        'Орган, проверяющий соответствие обязательному требованию',
-        'Проверочный вопрос', 'Вид акта', 'Название акта', 'Текст акта',
-        'Утвердивший орган', 'Дата утверждения акта', 'Номер акта', 'ID акта',
-        'Гиперссылка на текст акта (www.pravo.gov.ru)',
-        'Наименование акта, устанавливающего ответственность за несоблюдение обязательного требования',
-        'Статья акта, устанавливающая ответственность за несоблюдение обязательного требования',
-        'Часть статьи акта, устанавливающей ответственность за несоблюдение обязательного требования',
-        'Текст структурной единицы акта, устанавливающей ответственность за несоблюдение обязательного требования',
-        'Органы власти, привлекающие к ответственности за несоблюдение обязательного требования',
-        'Субъект ответственности за несоблюдение обязательного требования',
-        'Ответственность для физического лица',
-        'Размер/длительность санкции для физического лица',
-        'Комментарии для физического лица',
-        'Ответственность для индивидуального предпринимателя',
-        'Размер/длительность санкции для индивидуального предпринимателя',
-        'Комментарии для индивидуального предпринимателя',
-        'Ответственность для юридического лица',
-        'Размер/длительность санкции для юридического лица',
-        'Комментарии для юридического лица',
-        'Ответственность для должностного лица',
-        'Размер/длительность санкции для должностного лица',
-        'Комментарии для должностного лица',
-        'Сферы общественных отношений, затрагиваемые обязательным требованием',
-        'Виды экономической деятельности лиц, обязанных соблюдать обязательное требование',
-        'Оценка затрат лиц, в отношении которых устанавливается обязательное требование, на его исполнение, а также информация об уровне причиненного охраняемым законом ценностям вреда (ущерба)',
-        'Перечень документов (сведений), подтверждающих соответствие субъекта (объекта) обязательному требованию',
-        'Орган, осуществляющий выдачу документов или предоставление сведений, подтверждающих соответствие субъекта (объекта) обязательному требованию',
-        'Иные органы, осуществляющие выдачу документов или предоставление сведений, подтверждающих соответствие субъекта (объекта) обязательному требованию',
-        'Гиперссылки на утвержденные проверочные листы (при наличии)',
-        'Гиперссылки на руководства по соблюдению обязательных требований (при наличии)',
-        'Гиперссылки на доклады о достижении целей введения обязательных требований (при наличии)',
-        'GUID', 'Ссылка'
-    ]
     schemes = WorkbookSchemes.read()
     erot_scheme = next(scheme for scheme in schemes if scheme.name =='erot')
     assert erot_scheme.name == 'erot'
-    result_verified = erot_scheme.verify_columns(tuple(headers))
+    result_verified = erot_scheme.verify_columns(tuple(EROT_HEADERS))
     assert len(result_verified) == 4
     assert result_verified[0] 
     assert result_verified[0].name == 'erot'
@@ -73,3 +68,40 @@ def test_erot_match(mock_test_env):
     assert isinstance(result_validated['columns'], list)
     assert all([col['document']['index'] > 0 for col in result_validated['columns']])
 
+
+def test_matcher_equivalent(mock_test_env):
+    import re
+
+    from src.api.scheme.workbook import WorkbookSchemes
+
+    erot_scheme = WorkbookSchemes.get('erot')
+    headers = EROT_HEADERS + ['Неизвестный столбец', 'ID акта']
+    expected = [
+        next((pos for pos, c in enumerate(erot_scheme.columns)
+              if re.match(c.document.regex, value)), -1)
+        for value in headers
+    ]
+    assert erot_scheme.matcher.combined is not None
+    assert erot_scheme.matcher.classify(headers) == expected
+
+
+def test_verify_immutable(mock_test_env):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from src.api.scheme.workbook import WorkbookSchemes
+
+    erot_scheme = WorkbookSchemes.get('erot')
+    reversed_headers = list(reversed(EROT_HEADERS))
+    with ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(erot_scheme.verify, [EROT_HEADERS, reversed_headers] * 50))
+    assert results[0].complete and results[1].complete
+    assert all(r == results[i % 2] for i, r in enumerate(results))
+    assert results[0].indexes[1] == 2
+    assert results[1].indexes[1] == len(EROT_HEADERS) - 1
+    # модели столбцов не изменяются проверкой
+    assert all(c.document.index == 0 for c in erot_scheme.columns)
+    erot_scheme.verify_columns(tuple(EROT_HEADERS))
+    assert all(c.document.index == 0 for c in erot_scheme.columns)
+    data = erot_scheme.validate_match(results[1])
+    assert data['columns'][0]['document']['index'] == 1
+    assert data['columns'][0]['name'] == erot_scheme.columns[-1].name
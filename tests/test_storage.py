@@ -0,0 +1,159 @@
+import os
+
+import json
+
+import shutil
+
+import pytest
+
+from tests.test_registry import DATA_PATH
+
+
+@pytest.fixture
+def schemes(tmp_path, monkeypatch):
+    from src.api.scheme.workbook import WorkbookSchemes
+
+    (tmp_path / 'documents').mkdir()
+    shutil.copy(os.path.join(DATA_PATH, 'erot.json'), tmp_path / 'documents' / 'erot.json')
+    monkeypatch.setenv('SCHEMES_PATH', str(tmp_path))
+
+    class TemporarySchemes(WorkbookSchemes):
+        pass
+
+    return TemporarySchemes
+
+
+def test_write_if_match(schemes, tmp_path):
+    from src.api.exceptions import SchemeVersionConflict
+
+    etag = schemes.encoded('erot').etag
+    data = json.loads(schemes.encoded('erot').body)
+    data['title'] = 'Обновленная схема'
+    with pytest.raises(SchemeVersionConflict):
+        schemes.update('erot', data, expected='"other"')
+    assert schemes.update('erot', data, expected=f'"{etag}"') == 1
+    assert schemes.get('erot').title == 'Обновленная схема'
+    # повторная запись с устаревшим ETag отклоняется
+    with pytest.raises(SchemeVersionConflict):
+        schemes.update('erot', data, expected=f'W/"{etag}"')
+    assert schemes.update('erot', data, expected='*') == 2
+    assert schemes.scheme_version('erot') == 2
+    data['name'] = 'erot_copy'
+    with pytest.raises(SchemeVersionConflict):
+        schemes.write('erot_copy', data, expected='*')
+    assert schemes.write('erot_copy', data) == 1
+    assert sorted(os.listdir(tmp_path / 'documents')) == [
+        'erot.json', 'erot.version', 'erot_copy.json', 'erot_copy.version']
+
+
+@pytest.fixture
+def client(schemes, monkeypatch):
+    from fastapi.testclient import TestClient
+    from src.api.scheme.workbook import WorkbookSchemes
+    from src.service.asgi import app
+
+    # маршруты используют реестр во временной директории
+    for attribute in ('PATH', 'REGISTRY', 'GENERATION', 'INDEX'):
+        monkeypatch.setattr(WorkbookSchemes, attribute, getattr(schemes, attribute))
+    return TestClient(app)
+
+
+def test_patch_column(client, schemes):
+    url = '/documents/schemes/erot/columns/ID требования'
+    before = schemes.get('erot')
+    etag = client.get('/documents/schemes/erot').headers['etag']
+    response = client.patch(url, json=[
+        {'op': 'test', 'path': '/document/optional', 'value': False},
+        {'op': 'replace', 'path': '/document/optional', 'value': True},
+    ], headers={'If-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['x-scheme-version'] == '1'
+    after = schemes.get('erot')
+    assert after.columns[1].document.optional is True
+    # перекомпилирован только измененный столбец
+    assert after.plan.columns[1] is not before.plan.columns[1]
+    assert all(a is b for a, b in zip(after.plan.columns[2:], before.plan.columns[2:]))
+    assert client.patch(url, json=[{'op': 'replace', 'path': '/document/optional', 'value': False}],
+                        headers={'If-Match': etag}).status_code == 412
+    failed = client.patch(url, json=[{'op': 'test', 'path': '/document/optional', 'value': False}])
+    assert failed.status_code == 422 and failed.json()['error']
+    assert client.patch('/documents/schemes/unknown/columns/x', json=[]).status_code == 404
+
+
+def test_element_routes(client, schemes, tmp_path):
+    os.chmod(tmp_path / 'documents' / 'erot.json', 0o644)
+    column = schemes.get('erot').columns[0].dict()
+    # наименования столбцов могут содержать /
+    assert client.delete('/documents/schemes/erot/columns/№ п/п').status_code == 200
+    failed = client.delete('/documents/schemes/erot/columns/№ п/п')
+    assert failed.status_code == 422 and failed.json()['error']
+    assert client.delete('/documents/schemes/erot/columns/GUID').status_code == 200
+    assert client.put('/documents/schemes/erot/columns/GUID',
+                      json={**column, 'name': 'GUID'}).status_code == 200
+    assert schemes.get('erot').columns[-1].name == 'GUID'
+    assert client.delete('/documents/schemes/erot/header/Дата и время формирования отчета').json() is None
+    assert [h.name for h in schemes.get('erot').header] == [
+        'Орган, проверяющий соответствие  обязательному требованию']
+    # старый маршрут удаления столбца
+    assert client.delete('/documents/schemes/erot/column/Ссылка').status_code == 200
+    assert 'Ссылка' not in [c.name for c in schemes.get('erot').columns]
+    saved = json.loads((tmp_path / 'documents' / 'erot.json').read_text(encoding='utf8'))
+    assert [c['name'] for c in saved['columns']] == [c.name for c in schemes.get('erot').columns]
+    # права доступа файла схемы сохраняются при замене
+    assert (tmp_path / 'documents' / 'erot.json').stat().st_mode & 0o777 == 0o644
+
+    # наименование схемы в теле запроса должно совпадать с адресом
+    response = client.post('/documents/schemes/newfile', json={**saved, 'name': 'other'})
+    assert response.status_code == 422 and response.json()['error']
+    assert not (tmp_path / 'documents' / 'newfile.json').exists()
+    assert client.delete('/documents/schemes/other/columns/GUID').status_code == 404
+
+
+def test_scheme_index(client, schemes, tmp_path):
+    from src.api.index import SchemeIndex
+
+    with open(tmp_path / 'documents' / 'erot.json', encoding='utf8') as f:
+        data = json.load(f)
+    data.update(name='aaa', title='Копия')
+    with open(tmp_path / 'documents' / 'aaa.json', 'w', encoding='utf8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    response = client.get('/documents/index', params={'fields': 'name,title', 'limit': 1})
+    page = response.json()
+    assert page['items'] == [{'name': 'aaa', 'title': 'Копия'}] and page['total'] == 2
+    page = client.get('/documents/index', params={'cursor': page['next']}).json()
+    assert [i['name'] for i in page['items']] == ['erot'] and page['next'] is None
+    # список строится без разбора моделей схем
+    assert schemes.REGISTRY.parsed == 0
+    erot = schemes.get('erot')
+    item = page['items'][0]
+    assert item['columns'] == len(erot.columns)
+    assert item['required'] == sum(1 for c in erot.columns if not c.document.optional)
+    assert item['version'] == 0
+
+    schemes.save(erot)
+    item = client.get('/documents/index', params={'fields': 'name,version,hash'}).json()['items'][1]
+    assert item['version'] == 1
+    assert f'"{item["hash"]}"' == client.get('/documents/schemes/erot').headers['etag']
+    assert client.get('/documents/index', params={'fields': 'regex'}).status_code == 422
+    assert client.get('/documents/index', params={'cursor': '%%%'}).status_code == 422
+
+    # сохраненный индекс используется другим процессом без чтения файлов схем
+    index = SchemeIndex(schemes.INDEX.pathname, schemes.INDEX.filename)
+    index.refresh()
+    assert index.summarized == 0 and index.page(['name'])[2] == 2
+
+    # номер версии записан после сверки индекса другим процессом
+    with open(tmp_path / 'documents' / 'erot.version', 'w') as f:
+        f.write('7')
+    index.refresh()
+    assert index.page(['name', 'version'])[0][1] == {'name': 'erot', 'version': 7}
+
+
+def test_atomic_write_mode(tmp_path):
+    from src.api.storage import FILE_MODE, atomic_write
+
+    atomic_write(str(tmp_path / 'new.json'), '{}')
+    assert (tmp_path / 'new.json').stat().st_mode & 0o777 == FILE_MODE
+    os.chmod(tmp_path / 'new.json', 0o640)
+    atomic_write(str(tmp_path / 'new.json'), b'[]')
+    assert (tmp_path / 'new.json').stat().st_mode & 0o777 == 0o640